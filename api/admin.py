@@ -1,28 +1,114 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from . import cache, events, stats
 from .models import DogReport, DogStatus, Comment
 
 
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that reads the planner's row estimate (pg_class.reltuples) instead
+    of running COUNT(*) over an unfiltered Postgres table. Small tables,
+    filtered changelists and other databases still get an exact count.
+    """
+    estimate_threshold = 100_000  # Below this an exact COUNT(*) is cheap enough
+
+    @cached_property
+    def count(self):
+        estimate = self.estimated_count()
+        if estimate is not None and estimate >= self.estimate_threshold:
+            return estimate
+        return super().count
+
+    def estimated_count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is None or query.where or query.distinct:
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                           [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        if row is None or row[0] < 0:  # -1 until the table has been analyzed
+            return None
+        return row[0]
+
+
+class ScalableAdminMixin:
+    """Changelist settings that stay fast on tables with millions of rows."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # Skips the second COUNT(*) of filtered changelists
+    list_per_page = 50
+
+
+def _update_statuses(modeladmin, request, statuses, message, **changes):
+    """One UPDATE for every selected status; signals don't fire, so rollups and caches are updated here."""
+    updated = stats.update_statuses(statuses, updated_at=timezone.now(), **changes)
+    events.statuses_updated(statuses)
+    cache.invalidate(cache.REPORTS)
+    modeladmin.message_user(request, message.format(count=updated), messages.SUCCESS)
+
+
 @admin.register(DogReport)
-class DogReportAdmin(admin.ModelAdmin):
+class DogReportAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'condition', 'latitude', 'longitude',
                     'location', 'created_at')  # Columns in the admin panel
+    list_select_related = ('user',)
     search_fields = ('condition', 'user__username',
                      'location')  # Enable search
     list_filter = ('condition', 'created_at')  # Add filters
+    date_hierarchy = 'created_at'  # Range lookups on api_dogreport_created_idx
+    raw_id_fields = ('user',)  # A <select> of every user doesn't scale
+    actions = ['mark_rescued', 'mark_vaccinated']
+
+    @admin.action(description="Mark selected reports' dogs as rescued")
+    def mark_rescued(self, request, queryset):
+        _update_statuses(self, request, DogStatus.objects.filter(dog_report__in=queryset.values('pk')),
+                         "{count} dog(s) marked as rescued.", rescued=True)
+
+    @admin.action(description="Mark selected reports' dogs as vaccinated")
+    def mark_vaccinated(self, request, queryset):
+        _update_statuses(self, request, DogStatus.objects.filter(dog_report__in=queryset.values('pk')),
+                         "{count} dog(s) marked as vaccinated.", vaccinated=True)
 
 
 @admin.register(DogStatus)
-class DogStatusAdmin(admin.ModelAdmin):
+class DogStatusAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'dog_report', 'vaccinated', 'rescued',
                     'updated_at')  # Display fields in admin panel
+    list_select_related = ('dog_report',)
     list_filter = ('vaccinated', 'rescued', 'updated_at')  # Add filters
+    date_hierarchy = 'updated_at'  # Range lookups on api_dogstatus_updated_idx
     # Search by DogReport ID and notes
     search_fields = ('dog_report__id', 'additional_notes')
+    raw_id_fields = ('dog_report',)
+    actions = ['mark_rescued', 'mark_not_rescued', 'mark_vaccinated']
+
+    @admin.action(description="Mark selected as rescued")
+    def mark_rescued(self, request, queryset):
+        _update_statuses(self, request, queryset, "{count} status(es) marked as rescued.", rescued=True)
+
+    @admin.action(description="Mark selected as not rescued")
+    def mark_not_rescued(self, request, queryset):
+        _update_statuses(self, request, queryset, "{count} status(es) marked as not rescued.", rescued=False)
+
+    @admin.action(description="Mark selected as vaccinated")
+    def mark_vaccinated(self, request, queryset):
+        _update_statuses(self, request, queryset, "{count} status(es) marked as vaccinated.", vaccinated=True)
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(ScalableAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'dog_report', 'user', 'text',
                     'created_at')  # Show in list view
+    list_select_related = ('dog_report', 'user')
     search_fields = ('user__username', 'text',
                      'dog_report__id')  # Enable search
     list_filter = ('created_at',)  # Add filtering options
+    date_hierarchy = 'created_at'  # Range lookups on api_comment_created_idx
+    raw_id_fields = ('dog_report', 'user')
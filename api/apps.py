@@ -1,8 +1,12 @@
 from django.apps import AppConfig
+from django.core import checks
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
 
     def ready(self):
-        import api.signals  # Ensure signals are imported
\ No newline at end of file
+        import api.signals  # Ensure signals are imported
+        from pawspotter_backend import db_router
+
+        checks.register(db_router.check_pin_cache, checks.Tags.caches)
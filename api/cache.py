@@ -0,0 +1,124 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+from pawspotter_backend import db_router
+
+# Generation scopes. Any change that can alter a cached response bumps its scope.
+REPORTS = 'reports'
+COMMENTS = 'comments'
+
+
+def get_cache():
+    return caches[settings.API_RESPONSE_CACHE_ALIAS]
+
+
+def _generation_key(scope):
+    return f"api:generation:{scope}"
+
+
+def get_generation(scope):
+    """Returns the current generation of a scope, starting one if needed."""
+    cache = get_cache()
+    generation = cache.get(_generation_key(scope))
+    if generation is None:
+        # Seed from the clock so ETags issued before a cache flush are never reused
+        cache.add(_generation_key(scope), time.time_ns(), timeout=None)
+        generation = cache.get(_generation_key(scope))
+    return generation
+
+
+def bump_generation(*scopes):
+    """Invalidates every cached response of the given scopes."""
+    cache = get_cache()
+    for scope in scopes:
+        try:
+            cache.incr(_generation_key(scope))
+        except ValueError:
+            cache.add(_generation_key(scope), time.time_ns(), timeout=None)
+
+
+def invalidate(*scopes):
+    """
+    Bumps the scopes now and again once the surrounding transaction commits,
+    so a response cached from a read that raced the write cannot survive it.
+    """
+    bump_generation(*scopes)
+    transaction.on_commit(lambda: bump_generation(*scopes))
+
+
+class CachedResponseMixin:
+    """
+    Caches rendered list/retrieve responses keyed on the normalized request and
+    the generation of `cache_scope`. The key doubles as a strong ETag, so a
+    matching If-None-Match gets a 304 without touching the database or the
+    serializer.
+    """
+    cache_scope = None
+    cached_actions = ('list', 'retrieve')
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_response_cache_key(self, request):
+        """Hash of everything the response depends on, including the generation."""
+        query = sorted(
+            (name, sorted(values)) for name, values in request.query_params.lists()
+        )
+        raw = "|".join([
+            self.cache_scope,
+            str(get_generation(self.cache_scope)),
+            self.action,
+            request.get_host(),
+            request.path,
+            repr(query),
+            request.accepted_media_type,
+        ])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+        etag = f'"{key}"'
+        self.response_cache_key = key
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponse(status=304)
+            response['ETag'] = etag
+            return response
+
+        cached = get_cache().get(f"api:response:{key}")
+        if cached is not None:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response['ETag'] = etag
+            patch_vary_headers(response, ['Accept'])
+            return response
+
+        return handler(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, 'response_cache_key', None)
+        if key and response.status_code == 200 and not response.has_header('ETag'):
+            response.render()
+            timeout = settings.API_RESPONSE_CACHE_TIMEOUT
+            if db_router.current_read_alias():
+                # A lagging replica may have missed the write that bumped the generation
+                timeout = min(timeout, settings.DATABASE_REPLICA_LAG_SECONDS)
+            get_cache().set(
+                f"api:response:{key}",
+                (response.content, response['Content-Type']),
+                timeout,
+            )
+            response['ETag'] = f'"{key}"'
+            patch_vary_headers(response, ['Accept'])
+        return response
@@ -0,0 +1,166 @@
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Substr
+
+from . import geo
+
+# Geohash precisions rolled up into ReportCluster rows
+CLUSTER_PRECISIONS = range(1, 8)
+
+# (highest map zoom, geohash precision) pairs, roughly one cell per 64px tile area
+ZOOM_PRECISION = [(2, 1), (5, 2), (7, 3), (10, 4), (12, 5), (15, 6)]
+
+CONDITION_COUNT_FIELDS = {
+    'Healthy': 'healthy_count',
+    'Injured': 'injured_count',
+    'Lost': 'lost_count',
+}
+
+
+def precision_for_zoom(zoom):
+    """Maps a web map zoom level onto the rollup precision to read."""
+    for max_zoom, precision in ZOOM_PRECISION:
+        if zoom <= max_zoom:
+            return precision
+    return CLUSTER_PRECISIONS[-1]
+
+
+def apply_report(geohash, latitude, longitude, condition, sign=1):
+    """
+    Adds (sign=1) or removes (sign=-1) one report's contribution to every
+    precision level. All existing cells are updated with a single UPDATE.
+    """
+    from .models import ReportCluster
+
+    if not geohash:
+        return
+    cells = [geohash[:precision] for precision in CLUSTER_PRECISIONS]
+    increments = {
+        'count': F('count') + sign,
+        'latitude_sum': F('latitude_sum') + sign * latitude,
+        'longitude_sum': F('longitude_sum') + sign * longitude,
+    }
+    condition_field = CONDITION_COUNT_FIELDS.get(condition)
+    if condition_field:
+        increments[condition_field] = F(condition_field) + sign
+
+    with transaction.atomic():
+        updated = ReportCluster.objects.filter(cell__in=cells).update(**increments)
+        if sign < 0:
+            ReportCluster.objects.filter(cell__in=cells, count=0).delete()
+            return
+        if updated == len(cells):
+            return
+
+        existing = set(ReportCluster.objects.filter(cell__in=cells).values_list('cell', flat=True))
+        for cell in cells:
+            if cell in existing:
+                continue
+            values = {
+                'count': 1,
+                'latitude_sum': latitude,
+                'longitude_sum': longitude,
+            }
+            if condition_field:
+                values[condition_field] = 1
+            try:
+                with transaction.atomic():
+                    ReportCluster.objects.create(precision=len(cell), cell=cell, **values)
+            except IntegrityError:
+                # Created concurrently, fold this report into the new row instead
+                ReportCluster.objects.filter(cell=cell).update(**increments)
+
+
+def apply_reports(reports):
+    """
+    Adds many new reports at once (bulk_create skips the signals). Deltas are
+    summed per cell first and merged with one upsert statement, so the cost is
+    O(cells touched) rather than O(reports x precisions).
+    """
+    from .models import ReportCluster
+
+    deltas = {}
+    for report in reports:
+        if not report.geohash:
+            continue
+        condition_field = CONDITION_COUNT_FIELDS.get(report.condition)
+        for precision in CLUSTER_PRECISIONS:
+            delta = deltas.setdefault(report.geohash[:precision], {
+                'count': 0, 'latitude_sum': 0.0, 'longitude_sum': 0.0,
+                **{field: 0 for field in CONDITION_COUNT_FIELDS.values()},
+            })
+            delta['count'] += 1
+            delta['latitude_sum'] += report.latitude
+            delta['longitude_sum'] += report.longitude
+            if condition_field:
+                delta[condition_field] += 1
+    if not deltas:
+        return
+
+    table = connection.ops.quote_name(ReportCluster._meta.db_table)
+    fields = ['count', 'latitude_sum', 'longitude_sum', *CONDITION_COUNT_FIELDS.values()]
+    columns = [connection.ops.quote_name(field) for field in ['precision', 'cell', *fields]]
+    increments = ", ".join(
+        f"{column} = {table}.{column} + EXCLUDED.{column}" for column in columns[2:]
+    )
+    # Upsert supported by both SQLite (3.24+) and Postgres; merges concurrent writers safely
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT ({connection.ops.quote_name('cell')}) DO UPDATE SET {increments}"
+    )
+    rows = [
+        (len(cell), cell, *(delta[field] for field in fields))
+        for cell, delta in deltas.items()
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def rebuild(report_model, cluster_model):
+    """
+    Recomputes every rollup row from the reports table with one GROUP BY per
+    precision. Takes the models as arguments so migrations can pass their
+    historical versions.
+    """
+    with transaction.atomic():
+        cluster_model.objects.all().delete()
+        for precision in CLUSTER_PRECISIONS:
+            rows = (
+                report_model.objects.exclude(geohash='')
+                .annotate(cell=Substr('geohash', 1, precision))
+                .values('cell')
+                .annotate(
+                    count=Count('id'),
+                    latitude_sum=Sum('latitude'),
+                    longitude_sum=Sum('longitude'),
+                    **{
+                        field: Count('id', filter=Q(condition=condition))
+                        for condition, field in CONDITION_COUNT_FIELDS.items()
+                    },
+                )
+                .order_by()
+            )
+            cluster_model.objects.bulk_create(
+                (cluster_model(precision=precision, **row) for row in rows.iterator()),
+                batch_size=1000,
+            )
+
+
+def clusters_in_bbox(south, west, north, east, zoom):
+    """Returns the rollup rows at the zoom's precision whose centroid is inside the box."""
+    from .models import ReportCluster
+
+    precision = precision_for_zoom(zoom)
+    candidates = ReportCluster.objects.filter(
+        geo.cell_filter(south, west, north, east, field='cell', max_precision=precision),
+        precision=precision,
+        count__gt=0,
+    )
+    clusters = []
+    for cluster in candidates:
+        latitude = cluster.latitude_sum / cluster.count
+        longitude = cluster.longitude_sum / cluster.count
+        if south <= latitude <= north and west <= longitude <= east:
+            clusters.append(cluster)
+    return precision, clusters
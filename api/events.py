@@ -0,0 +1,220 @@
+"""
+Live feed of new reports, status changes and comments (/api/events/).
+
+Writes publish small event dicts to a broker once their transaction commits.
+The broker fans each event out to the subscribers whose filter matches, so
+an idle subscriber is just a filter and an empty asyncio.Queue: nothing wakes
+it up until a matching event arrives.
+
+The default InProcessBroker only reaches subscribers of the same process.
+Deployments running several ASGI workers set EVENTS_BROKER to a Broker
+subclass whose publish() sends events over a shared channel (Redis pub/sub,
+Postgres LISTEN/NOTIFY, ...) and calls dispatch() in every process.
+"""
+import asyncio
+import itertools
+import json
+import threading
+from collections import deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+REPORT_CREATED = 'report.created'
+STATUS_UPDATED = 'status.updated'
+COMMENT_CREATED = 'comment.created'
+
+EVENT_TYPES = (REPORT_CREATED, STATUS_UPDATED, COMMENT_CREATED)
+
+# Delivered to a subscriber that fell too far behind, right before it is dropped
+OVERFLOW = 'overflow'
+
+
+class Broker:
+    """
+    Fans events out to local subscribers and keeps the last few for clients
+    reconnecting with Last-Event-ID. Subclasses that share events between
+    processes override publish() and call dispatch() when an event arrives.
+    """
+
+    def __init__(self, replay_size=1000):
+        self._subscribers = set()
+        self._recent = deque(maxlen=replay_size)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        """
+        False when nobody could receive an event, so publishers can skip
+        building it. Brokers shared between processes should return True.
+        """
+        return bool(self._subscribers)
+
+    def publish(self, event):
+        self.dispatch(event)
+
+    def dispatch(self, event):
+        with self._lock:
+            event = {**event, 'id': next(self._ids)}
+            self._recent.append(event)
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            if subscriber.matches(event):
+                subscriber.deliver(event)
+
+    def subscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.add(subscriber)
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def since(self, last_id):
+        """Recent events after `last_id`, oldest first."""
+        with self._lock:
+            return [event for event in self._recent if event['id'] > last_id]
+
+
+class InProcessBroker(Broker):
+    """Default broker: subscribers and publishers share one process."""
+
+
+class EventFilter:
+    """Matches events by type, condition and bounding box."""
+
+    def __init__(self, types=None, conditions=None, bbox=None):
+        self.types = set(types or EVENT_TYPES)
+        self.conditions = set(conditions) if conditions else None
+        self.bbox = bbox
+
+    def matches(self, event):
+        if event['type'] not in self.types:
+            return False
+        if self.conditions is not None and event['condition'] not in self.conditions:
+            return False
+        if self.bbox is not None:
+            south, west, north, east = self.bbox
+            if not (south <= event['latitude'] <= north and west <= event['longitude'] <= east):
+                return False
+        return True
+
+
+class Subscription(EventFilter):
+    """
+    A subscriber living on an event loop. Events may be published from any
+    thread; they are handed to the loop with call_soon_threadsafe.
+    """
+
+    def __init__(self, broker, max_pending=100, **filters):
+        super().__init__(**filters)
+        self.broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_pending + 1)  # Room for the overflow marker
+        self.max_pending = max_pending
+        self.overflowed = False
+
+    def __enter__(self):
+        self.broker.subscribe(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.broker.unsubscribe(self)
+
+    def deliver(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:  # The loop is gone, so is the client
+            self.broker.unsubscribe(self)
+
+    def _put(self, event):
+        if self.overflowed:
+            return
+        if self.queue.qsize() >= self.max_pending:
+            # A slow client; tell it to reconnect (and replay) instead of buffering forever
+            self.overflowed = True
+            self.broker.unsubscribe(self)
+            event = {'type': OVERFLOW}
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.EVENTS_BROKER)()
+
+
+def publish_on_commit(event_type, latitude, longitude, condition, data):
+    """Publishes an event once the surrounding transaction commits."""
+    event = {
+        'type': event_type,
+        'latitude': latitude,
+        'longitude': longitude,
+        'condition': condition,
+        'data': data,
+    }
+    transaction.on_commit(lambda: get_broker().publish(event))
+
+
+def report_created(report):
+    if not get_broker().active:
+        return
+    publish_on_commit(REPORT_CREATED, report.latitude, report.longitude, report.condition, {
+        'id': report.id,
+        'user': report.user_id,
+        'latitude': report.latitude,
+        'longitude': report.longitude,
+        'location': report.location,
+        'condition': report.condition,
+        'description': report.description,
+        'created_at': report.created_at,
+    })
+
+
+def status_updated(status, report):
+    """`report` is (latitude, longitude, condition) of the status' report."""
+    if not get_broker().active:
+        return
+    publish_on_commit(STATUS_UPDATED, *report, {
+        'dog_report': status.dog_report_id,
+        'vaccinated': status.vaccinated,
+        'rescued': status.rescued,
+        'additional_notes': status.additional_notes,
+        'updated_at': status.updated_at,
+    })
+
+
+def comment_created(comment, report):
+    """`report` is (latitude, longitude, condition) of the comment's report."""
+    if not get_broker().active:
+        return
+    publish_on_commit(COMMENT_CREATED, *report, {
+        'id': comment.id,
+        'dog_report': comment.dog_report_id,
+        'user': comment.user.username if comment.user_id else "Anonymous",
+        'text': comment.text,
+        'created_at': comment.created_at,
+    })
+
+
+def statuses_updated(queryset):
+    """Publishes the statuses in `queryset` after a bulk update (which skips post_save)."""
+    if not get_broker().active:
+        return
+    for status in queryset.select_related('dog_report'):
+        report = status.dog_report
+        status_updated(status, (report.latitude, report.longitude, report.condition))
+
+
+def format_sse(event):
+    """Server-Sent Events wire format of one event."""
+    if event['type'] == OVERFLOW:
+        return "event: overflow\ndata: {}\n\n"
+    data = json.dumps(event['data'], cls=DjangoJSONEncoder)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
@@ -0,0 +1,80 @@
+import csv
+import io
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+# (output column, queryset lookup) pairs; status fields come from the same LEFT JOIN
+EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('user', 'user_id'),
+    ('latitude', 'latitude'),
+    ('longitude', 'longitude'),
+    ('location', 'location'),
+    ('condition', 'condition'),
+    ('description', 'description'),
+    ('image', 'image'),
+    ('created_at', 'created_at'),
+    ('vaccinated', 'status__vaccinated'),
+    ('rescued', 'status__rescued'),
+    ('additional_notes', 'status__additional_notes'),
+    ('status_updated_at', 'status__updated_at'),
+]
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+CHUNK_SIZE = 2000  # Rows fetched per round trip and written per yielded chunk
+
+
+def export_rows(queryset):
+    """Streams tuples of EXPORT_COLUMNS without instantiating models."""
+    return queryset.values_list(*(lookup for _, lookup in EXPORT_COLUMNS)).iterator(chunk_size=CHUNK_SIZE)
+
+
+def _batched(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= CHUNK_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ndjson_lines(rows):
+    """One JSON object per line, a chunk of lines per yield."""
+    names = [name for name, _ in EXPORT_COLUMNS]
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for batch in _batched(rows):
+        yield "".join(encoder.encode(dict(zip(names, row))) + "\n" for row in batch).encode()
+
+
+def csv_lines(rows):
+    """CSV with a header row, a chunk of lines per yield."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    for batch in _batched(rows):
+        writer.writerows(
+            [value.isoformat() if hasattr(value, 'isoformat') else value for value in row]
+            for row in batch
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():  # Header only, no rows
+        yield buffer.getvalue().encode()
+
+
+def gzipped(chunks):
+    """Compresses a byte stream on the fly, keeping one chunk in memory."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -33,6 +33,8 @@ class DogReportFactory(factory.django.DjangoModelFactory):
 class DogStatusFactory(factory.django.DjangoModelFactory):
     """
     Factory for creating test dog statuses.
+    Updates the status the create_dog_status signal already made for the
+    report with the given fields, creating it if there is none.
     """
     class Meta:
         model = DogStatus
@@ -43,6 +45,12 @@ class DogStatusFactory(factory.django.DjangoModelFactory):
     additional_notes = factory.Faker("sentence")
     updated_at = factory.Faker("date_time_this_year")
 
+    @classmethod
+    def _create(cls, model_class, *args, **kwargs):
+        dog_report = kwargs.pop("dog_report")
+        dog_status, _ = cls._get_manager(model_class).update_or_create(dog_report=dog_report, defaults=kwargs)
+        return dog_status
+
 
 class CommentFactory(factory.django.DjangoModelFactory):
     """
@@ -0,0 +1,107 @@
+from django import forms
+from django_filters import rest_framework as filters
+
+from . import geo
+from .models import DogReport
+
+# Largest radius accepted by the ?near= filter
+MAX_NEAR_RADIUS_KM = 100.0
+DEFAULT_NEAR_RADIUS_KM = 1.0
+
+
+def _parse_floats(value, count, label):
+    """Splits a comma separated list of floats, raising a form error on bad input."""
+    parts = [part.strip() for part in value.split(",")]
+    if len(parts) != count:
+        raise forms.ValidationError(f"Expected {label}.")
+    try:
+        return [float(part) for part in parts]
+    except ValueError:
+        raise forms.ValidationError(f"Expected {label}.")
+
+
+def _check_coordinate(latitude, longitude):
+    if not -90.0 <= latitude <= 90.0 or not -180.0 <= longitude <= 180.0:
+        raise forms.ValidationError("Coordinates are out of range.")
+
+
+class BBoxField(forms.CharField):
+    """Parses 'south,west,north,east' into a tuple of floats."""
+
+    def clean(self, value):
+        value = super().clean(value)
+        if not value:
+            return None
+        south, west, north, east = _parse_floats(value, 4, "south,west,north,east")
+        _check_coordinate(south, west)
+        _check_coordinate(north, east)
+        if south > north:
+            raise forms.ValidationError("South must not be greater than north.")
+        if west > east:
+            raise forms.ValidationError("Bounding boxes crossing the antimeridian are not supported.")
+        return south, west, north, east
+
+
+class PointField(forms.CharField):
+    """Parses 'lat,lon' into a tuple of floats."""
+
+    def clean(self, value):
+        value = super().clean(value)
+        if not value:
+            return None
+        latitude, longitude = _parse_floats(value, 2, "lat,lon")
+        _check_coordinate(latitude, longitude)
+        return latitude, longitude
+
+
+class BBoxFilter(filters.Filter):
+    field_class = BBoxField
+
+
+class PointFilter(filters.Filter):
+    field_class = PointField
+
+
+class DogReportFilter(filters.FilterSet):
+    """
+    Filters for dog report listings.
+    Spatial filters prune by geohash cell first, then check exact coordinates.
+    """
+    bbox = BBoxFilter(method="filter_bbox")
+    near = PointFilter(method="filter_near")
+    radius = filters.NumberFilter(method="filter_radius", min_value=0, max_value=MAX_NEAR_RADIUS_KM)
+
+    created_after = filters.IsoDateTimeFilter(field_name="created_at", lookup_expr="gte")
+    created_before = filters.IsoDateTimeFilter(field_name="created_at", lookup_expr="lt")
+
+    class Meta:
+        model = DogReport
+        fields = {
+            'condition': ['exact', 'in'],  # ?condition__in=Injured,Lost
+            'user': ['exact'],
+            'created_at': ['exact'],
+        }
+
+    def filter_bbox(self, queryset, name, value):
+        south, west, north, east = value
+        return queryset.filter(
+            geo.cell_filter(south, west, north, east),
+            latitude__range=(south, north),
+            longitude__range=(west, east),
+        )
+
+    def filter_near(self, queryset, name, value):
+        latitude, longitude = value
+        radius = self.form.cleaned_data.get("radius")
+        radius = float(radius) if radius is not None else DEFAULT_NEAR_RADIUS_KM
+        south, west, north, east = geo.bbox_around(latitude, longitude, radius)
+        return queryset.filter(
+            geo.cell_filter(south, west, north, east),
+            latitude__range=(south, north),
+            longitude__range=(west, east),
+        ).alias(
+            distance_km=geo.haversine_expression(latitude, longitude),
+        ).filter(distance_km__lte=radius)
+
+    def filter_radius(self, queryset, name, value):
+        return queryset  # Consumed by filter_near
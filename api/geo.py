@@ -0,0 +1,170 @@
+import math
+
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Precision stored on DogReport.geohash (~4.8m x 4.8m cells)
+GEOHASH_PRECISION = 9
+
+# Upper bound on the number of cells a single query is pruned with
+MAX_COVERING_CELLS = 32
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def _bit_counts(precision):
+    """Return (latitude bits, longitude bits) for a geohash precision."""
+    total = precision * 5
+    return total // 2, (total + 1) // 2
+
+
+def _cell_index(value, low, span, bits):
+    """Map a coordinate onto its integer cell index for the given bit depth."""
+    index = int((value - low) / span * (1 << bits))
+    return min(max(index, 0), (1 << bits) - 1)
+
+
+def _interleave(lat_index, lon_index, precision):
+    """Interleave latitude/longitude cell indexes into a base32 geohash."""
+    lat_bits, lon_bits = _bit_counts(precision)
+    value = 0
+    for position in range(precision * 5):
+        if position % 2 == 0:  # Geohash starts with a longitude bit
+            lon_bits -= 1
+            bit = (lon_index >> lon_bits) & 1
+        else:
+            lat_bits -= 1
+            bit = (lat_index >> lat_bits) & 1
+        value = (value << 1) | bit
+    return "".join(
+        _BASE32[(value >> shift) & 31]
+        for shift in range(precision * 5 - 5, -1, -5)
+    )
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Encode a coordinate as a geohash string."""
+    lat_bits, lon_bits = _bit_counts(precision)
+    return _interleave(
+        _cell_index(latitude, -90.0, 180.0, lat_bits),
+        _cell_index(longitude, -180.0, 360.0, lon_bits),
+        precision,
+    )
+
+
+def decode(geohash):
+    """Return the (latitude, longitude) center of a geohash cell."""
+    precision = len(geohash)
+    lat_bits, lon_bits = _bit_counts(precision)
+    value = 0
+    for char in geohash:
+        value = (value << 5) | _BASE32.index(char)
+    lat_index = lon_index = 0
+    for position in range(precision * 5):
+        bit = (value >> (precision * 5 - 1 - position)) & 1
+        if position % 2 == 0:
+            lon_index = (lon_index << 1) | bit
+        else:
+            lat_index = (lat_index << 1) | bit
+    return (
+        -90.0 + (lat_index + 0.5) * 180.0 / (1 << lat_bits),
+        -180.0 + (lon_index + 0.5) * 360.0 / (1 << lon_bits),
+    )
+
+
+def _successor(prefix):
+    """Return the smallest geohash that sorts after every hash starting with prefix."""
+    chars = list(prefix)
+    while chars:
+        position = _BASE32.index(chars[-1])
+        if position < len(_BASE32) - 1:
+            chars[-1] = _BASE32[position + 1]
+            return "".join(chars)
+        chars.pop()
+    return None  # prefix was all 'z', nothing sorts after it
+
+
+def covering_cells(south, west, north, east, max_cells=MAX_COVERING_CELLS,
+                   max_precision=GEOHASH_PRECISION):
+    """
+    Returns the geohash prefixes of the finest grid (up to ``max_precision``)
+    whose cells cover the box using at most ``max_cells`` cells.
+    """
+    for precision in range(max_precision, 0, -1):
+        lat_bits, lon_bits = _bit_counts(precision)
+        lat_low = _cell_index(south, -90.0, 180.0, lat_bits)
+        lat_high = _cell_index(north, -90.0, 180.0, lat_bits)
+        lon_low = _cell_index(west, -180.0, 360.0, lon_bits)
+        lon_high = _cell_index(east, -180.0, 360.0, lon_bits)
+        if (lat_high - lat_low + 1) * (lon_high - lon_low + 1) <= max_cells:
+            return sorted(
+                _interleave(lat_index, lon_index, precision)
+                for lat_index in range(lat_low, lat_high + 1)
+                for lon_index in range(lon_low, lon_high + 1)
+            )
+    return [""]  # Box is too large to prune, match everything
+
+
+def prefix_ranges(prefixes):
+    """Collapse sorted geohash prefixes into contiguous [start, stop) ranges."""
+    ranges = []
+    for prefix in prefixes:
+        stop = _successor(prefix)
+        if ranges and ranges[-1][1] == prefix:
+            ranges[-1][1] = stop
+        else:
+            ranges.append([prefix, stop])
+    return ranges
+
+
+def cell_filter(south, west, north, east, field="geohash", max_precision=GEOHASH_PRECISION):
+    """
+    Builds a Q object that prunes rows to the geohash cells covering the box.
+    Each cell becomes an indexable range scan instead of a LIKE.
+    ``max_precision`` must not exceed the length of the hashes stored in ``field``.
+    """
+    condition = Q()
+    cells = covering_cells(south, west, north, east, max_precision=max_precision)
+    for start, stop in prefix_ranges(cells):
+        cell = Q(**{f"{field}__gte": start})
+        if stop is not None:
+            cell &= Q(**{f"{field}__lt": stop})
+        condition |= cell
+    return condition
+
+
+def bbox_around(latitude, longitude, radius_km):
+    """Returns the (south, west, north, east) box enclosing a circle."""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south = max(latitude - lat_delta, -90.0)
+    north = min(latitude + lat_delta, 90.0)
+    if south == -90.0 or north == 90.0:
+        return south, -180.0, north, 180.0  # Circle contains a pole
+    lon_delta = math.degrees(
+        math.asin(min(1.0, math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(latitude))))
+    )
+    return south, max(longitude - lon_delta, -180.0), north, min(longitude + lon_delta, 180.0)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two coordinates in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def haversine_expression(latitude, longitude, lat_field="latitude", lon_field="longitude"):
+    """Database expression for the haversine distance (km) to a fixed point."""
+    lat = Value(latitude, output_field=FloatField())
+    lon = Value(longitude, output_field=FloatField())
+    a = (
+        Power(Sin((Radians(F(lat_field)) - Radians(lat)) / 2), 2)
+        + Cos(Radians(lat)) * Cos(Radians(F(lat_field)))
+        * Power(Sin((Radians(F(lon_field)) - Radians(lon)) / 2), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a))
@@ -0,0 +1,271 @@
+"""
+Offline reverse geocoding: report coordinates -> nearest named place.
+
+The gazetteer (a GeoNames dump or a name,latitude,longitude[,country] CSV)
+is compiled once into a flat binary grid index stored next to it as
+<gazetteer>.idx. Places are sorted by 1 degree grid cell; the file holds the
+sorted cell keys, each cell's first place, and the coordinates and names of
+the places as packed arrays. The index is memory-mapped, so worker processes
+share its pages, and a lookup only reads the few cells around the point.
+"""
+import bisect
+import csv
+import math
+import mmap
+import os
+import struct
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .geo import EARTH_RADIUS_KM
+
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Grid cell size of the index, in degrees
+CELL_DEGREES = 1.0
+
+# Coordinates are rounded to this many decimals (~110m) before the cached lookup
+ROUND_DIGITS = 3
+
+_MAGIC = b"PSGAZ001"
+# magic, cell size, places, cells, bytes of names
+_HEADER = struct.Struct("<8sdQQQ")
+
+
+def _distance_km(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def read_places(path):
+    """
+    Yields (label, latitude, longitude) of every place in a gazetteer file:
+    a tab separated GeoNames dump, or a CSV with a header naming at least
+    name, latitude and longitude columns.
+    """
+    with open(path, newline='', encoding='utf-8') as handle:
+        first = handle.readline()
+        handle.seek(0)
+        if '\t' in first:
+            # GeoNames: geonameid, name, asciiname, alternatenames, latitude, longitude, ..., country code
+            for row in csv.reader(handle, delimiter='\t', quoting=csv.QUOTE_NONE):
+                if len(row) > 8:
+                    yield _label(row[1], row[8]), float(row[4]), float(row[5])
+        else:
+            for row in csv.DictReader(handle):
+                country = row.get('country') or row.get('country_code') or ''
+                yield _label(row['name'], country), float(row['latitude']), float(row['longitude'])
+
+
+def _label(name, country):
+    name = name.strip()
+    return f"{name}, {country.strip()}" if country.strip() else name
+
+
+def _grid_size(cell_degrees):
+    return math.ceil(180 / cell_degrees), math.ceil(360 / cell_degrees)
+
+
+def _cell(latitude, longitude, cell_degrees):
+    rows, cols = _grid_size(cell_degrees)
+    row = min(max(int((latitude + 90) // cell_degrees), 0), rows - 1)
+    col = int((longitude + 180) // cell_degrees) % cols
+    return row, col
+
+
+def compile_index(places, cell_degrees=CELL_DEGREES):
+    """Packs (label, latitude, longitude) places into the binary index format."""
+    cols = _grid_size(cell_degrees)[1]
+    keyed = []
+    for label, latitude, longitude in places:
+        row, col = _cell(latitude, longitude, cell_degrees)
+        keyed.append((row * cols + col, latitude, longitude, label.encode('utf-8')))
+    keyed.sort(key=lambda place: place[0])
+
+    cell_keys, cell_starts = [], []
+    for index, (key, *_) in enumerate(keyed):
+        if not cell_keys or cell_keys[-1] != key:
+            cell_keys.append(key)
+            cell_starts.append(index)
+    cell_starts.append(len(keyed))
+
+    name_offsets, names = [0], bytearray()
+    for *_, label in keyed:
+        names += label
+        name_offsets.append(len(names))
+
+    count = len(keyed)
+    return b"".join([
+        _HEADER.pack(_MAGIC, cell_degrees, count, len(cell_keys), len(names)),
+        struct.pack(f"<{len(cell_keys)}q", *cell_keys),
+        struct.pack(f"<{len(cell_starts)}q", *cell_starts),
+        struct.pack(f"<{count + 1}q", *name_offsets),
+        struct.pack(f"<{count}f", *(place[1] for place in keyed)),
+        struct.pack(f"<{count}f", *(place[2] for place in keyed)),
+        bytes(names),
+    ])
+
+
+class Gazetteer:
+    """Nearest-place lookups over a compiled index held in any buffer (bytes or mmap)."""
+
+    def __init__(self, buffer):
+        magic, self.cell_degrees, count, cells, names_size = _HEADER.unpack_from(buffer)
+        if magic != _MAGIC:
+            raise ValueError("Not a gazetteer index.")
+        self._buffer = buffer  # Keeps the mmap alive
+        view = memoryview(buffer)
+        offset = _HEADER.size
+
+        def take(length, itemsize, fmt):
+            nonlocal offset
+            array = view[offset:offset + length * itemsize].cast(fmt)
+            offset += length * itemsize
+            return array
+
+        self.cell_keys = take(cells, 8, 'q')
+        self.cell_starts = take(cells + 1, 8, 'q')
+        self.name_offsets = take(count + 1, 8, 'q')
+        self.latitudes = take(count, 4, 'f')
+        self.longitudes = take(count, 4, 'f')
+        self.names = view[offset:offset + names_size]
+        self.rows, self.cols = _grid_size(self.cell_degrees)
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    @classmethod
+    def open(cls, path):
+        """Memory-maps a compiled index file."""
+        with open(path, 'rb') as handle:
+            return cls(mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _cell_places(self, row, col):
+        key = row * self.cols + col % self.cols
+        index = bisect.bisect_left(self.cell_keys, key)
+        if index == len(self.cell_keys) or self.cell_keys[index] != key:
+            return range(0)
+        return range(self.cell_starts[index], self.cell_starts[index + 1])
+
+    def name(self, index):
+        return bytes(self.names[self.name_offsets[index]:self.name_offsets[index + 1]]).decode('utf-8')
+
+    def _row_places(self, row):
+        start = bisect.bisect_left(self.cell_keys, row * self.cols)
+        end = bisect.bisect_left(self.cell_keys, (row + 1) * self.cols)
+        return range(self.cell_starts[start], self.cell_starts[end])
+
+    def nearest(self, latitude, longitude, max_distance_km):
+        """Index of the nearest place within max_distance_km, or None."""
+        if not (-90 <= latitude <= 90 and math.isfinite(longitude)):
+            return None
+        row0, col0 = _cell(latitude, longitude, self.cell_degrees)
+        best, best_distance = None, max_distance_km
+        ring_km = self.cell_degrees * KM_PER_DEGREE
+        # Longitude cells shrink towards the poles; when rings would have to go
+        # (nearly) round the globe, whole rows are cheaper
+        reach = min(90.0, abs(latitude) + max_distance_km / KM_PER_DEGREE)
+        width_km = ring_km * math.cos(math.radians(reach))
+        if width_km <= 0 or 2 * (max_distance_km / width_km + 1) + 1 >= self.cols:
+            return self._nearest_by_rows(latitude, longitude, row0, max_distance_km)
+        ring = 0
+        while ring <= max(self.rows, self.cols // 2):
+            # Places beyond this ring are at least `ring` cells away in latitude
+            # or longitude; a longitude cell is narrowest at the highest latitude in reach
+            reach = min(90.0, abs(latitude) + best_distance / KM_PER_DEGREE)
+            if ring and (ring - 1) * ring_km * math.cos(math.radians(reach)) >= best_distance:
+                break
+            for row in range(row0 - ring, row0 + ring + 1):
+                if not 0 <= row < self.rows:
+                    continue
+                edge = row in (row0 - ring, row0 + ring)
+                cols = range(col0 - ring, col0 + ring + 1) if edge else (col0 - ring, col0 + ring)
+                for col in cols:
+                    for index in self._cell_places(row, col):
+                        distance = _distance_km(latitude, longitude, self.latitudes[index], self.longitudes[index])
+                        if distance < best_distance:
+                            best, best_distance = index, distance
+            if 2 * ring + 1 >= self.cols and row0 - ring <= 0 and row0 + ring >= self.rows - 1:
+                break  # Covered the whole grid
+            ring += 1
+        return best
+
+    def _nearest_by_rows(self, latitude, longitude, row0, max_distance_km):
+        """nearest() scanning whole grid rows outwards from row0, for points near the poles."""
+        best, best_distance = None, max_distance_km
+        ring_km = self.cell_degrees * KM_PER_DEGREE
+        for ring in range(self.rows):
+            # Rows beyond this ring are at least ring - 1 cells away in latitude alone
+            if ring and (ring - 1) * ring_km >= best_distance:
+                break
+            for row in {row0 - ring, row0 + ring}:
+                if not 0 <= row < self.rows:
+                    continue
+                for index in self._row_places(row):
+                    distance = _distance_km(latitude, longitude, self.latitudes[index], self.longitudes[index])
+                    if distance < best_distance:
+                        best, best_distance = index, distance
+        return best
+
+    def reverse(self, latitude, longitude, max_distance_km):
+        index = self.nearest(latitude, longitude, max_distance_km)
+        return None if index is None else self.name(index)
+
+
+def load(path):
+    """
+    Opens a gazetteer, compiling <path>.idx first when it is missing or older
+    than the gazetteer. Falls back to an in-memory index if the directory is
+    read-only.
+    """
+    if path.endswith('.idx'):
+        return Gazetteer.open(path)
+    index_path = f"{path}.idx"
+    try:
+        if os.path.getmtime(index_path) >= os.path.getmtime(path):
+            return Gazetteer.open(index_path)
+    except OSError:
+        pass
+    data = compile_index(read_places(path))
+    try:
+        temporary = f"{index_path}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as handle:
+            handle.write(data)
+        os.replace(temporary, index_path)
+    except OSError:
+        return Gazetteer(data)
+    return Gazetteer.open(index_path)
+
+
+@lru_cache(maxsize=None)
+def get_gazetteer():
+    """The configured gazetteer, or None when GEOCODER_GAZETTEER is unset."""
+    path = settings.GEOCODER_GAZETTEER
+    return load(path) if path else None
+
+
+@lru_cache(maxsize=65536)
+def _reverse_rounded(latitude, longitude):
+    gazetteer = get_gazetteer()
+    if gazetteer is None:
+        return None
+    return gazetteer.reverse(latitude, longitude, settings.GEOCODER_MAX_DISTANCE_KM)
+
+
+def reverse(latitude, longitude):
+    """Name of the nearest gazetteer place (e.g. "Denpasar, ID"), or None."""
+    if latitude is None or longitude is None or not settings.GEOCODER_GAZETTEER:
+        return None
+    return _reverse_rounded(round(latitude, ROUND_DIGITS), round(longitude, ROUND_DIGITS))
+
+
+@receiver(setting_changed)
+def reset(setting=None, **kwargs):
+    if setting is None or setting.startswith('GEOCODER_'):
+        get_gazetteer.cache_clear()
+        _reverse_rounded.cache_clear()
@@ -0,0 +1,195 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels of each generated variant
+VARIANT_SIZES = {
+    'small': 160,
+    'medium': 480,
+    'large': 1280,
+}
+
+# (format, file extension, save options) of each variant encoding
+VARIANT_FORMATS = [
+    ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+]
+
+# Save options of the re-encoded original, by format
+ORIGINAL_OPTIONS = {
+    'JPEG': {'quality': 92},
+    'WEBP': {'quality': 90},
+}
+
+# Image.info keys holding metadata that can identify the uploader or their location
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment', 'photoshop')
+
+EXIF_ORIENTATION = 0x0112
+
+_executor = None
+
+
+def variant_key(original_name, size_name, extension):
+    """Storage key of a variant, next to the original under dog_reports/variants/."""
+    stem = os.path.splitext(os.path.basename(original_name))[0]
+    return f"dog_reports/variants/{stem}_{size_name}.{extension}"
+
+
+def render_variants(source):
+    """
+    Decodes an uploaded image once and yields (size name, extension, bytes)
+    for every variant. Images are rotated according to their EXIF orientation
+    and re-encoded without any metadata, which drops EXIF/GPS tags.
+    """
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        for size_name, edge in VARIANT_SIZES.items():
+            variant = image.copy()
+            variant.thumbnail((edge, edge), Image.LANCZOS)
+            for image_format, extension, options in VARIANT_FORMATS:
+                buffer = io.BytesIO()
+                variant.save(buffer, image_format, **options)
+                yield size_name, extension, buffer.getvalue()
+
+
+def strip_original(source):
+    """
+    Re-encodes an uploaded image in its own format without EXIF/GPS, XMP or
+    comments, rotated according to its EXIF orientation first. Returns None
+    when there is nothing to strip. Unrotated JPEGs keep their quantization
+    tables, so they lose no further quality.
+    """
+    with Image.open(source) as image:
+        if not any(image.info.get(key) for key in METADATA_KEYS) and not image.getexif():
+            return None
+        image_format = 'JPEG' if image.format == 'MPO' else image.format  # Phone JPEGs with extra frames
+        options = dict(ORIGINAL_OPTIONS.get(image_format, {}))
+        if image.info.get('icc_profile'):
+            options['icc_profile'] = image.info['icc_profile']  # Colour data, not personal
+        if image.getexif().get(EXIF_ORIENTATION, 1) != 1:
+            output = ImageOps.exif_transpose(image)
+        else:
+            output = image
+            if image.format == 'JPEG':
+                options['quality'] = 'keep'
+        if image_format == 'JPEG':
+            options['comment'] = b''  # Otherwise carried over from the source
+        elif getattr(image, 'n_frames', 1) > 1:
+            options['save_all'] = True
+        buffer = io.BytesIO()
+        output.save(buffer, image_format, **options)
+        return buffer.getvalue()
+
+
+def process_report_image(report_id):
+    """
+    Generates the variants of a report's image and records their keys in
+    DogReport.image_variants. The original is replaced by a copy without
+    metadata, since it is served too.
+    """
+    from . import cache
+    from .models import DogReport
+
+    report = DogReport.objects.filter(id=report_id).only('id', 'image').first()
+    if report is None or not report.image:
+        return {}
+
+    storage = report.image.storage
+    original = report.image.name
+    variants = {}
+    with storage.open(original, 'rb') as source:
+        for size_name, extension, content in render_variants(source):
+            key = variant_key(original, size_name, extension)
+            if storage.exists(key):
+                storage.delete(key)
+            variants[f"{size_name}_{extension}"] = storage.save(key, ContentFile(content))
+        source.seek(0)
+        stripped = strip_original(source)
+
+    # Saved before the old file goes: S3 overwrites in place, other storages pick a new name
+    name = original if stripped is None else storage.save(original, ContentFile(stripped))
+
+    # update() keeps the pipeline from re-triggering the save signals
+    now = timezone.now()
+    DogReport.objects.filter(id=report_id).update(
+        image=name, image_variants=variants, image_processed_at=now, updated_at=now)
+    if name != original:
+        storage.delete(original)
+    cache.invalidate(cache.REPORTS)
+    return variants
+
+
+def _run(report_id):
+    close_old_connections()
+    try:
+        process_report_image(report_id)
+    except Exception:
+        logger.exception("Image processing failed for DogReport %s", report_id)
+    finally:
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PIPELINE_WORKERS, thread_name_prefix='image-pipeline')
+    return _executor
+
+
+def enqueue(report_id):
+    """
+    Schedules variant generation for a report once the current transaction
+    commits, using the backend selected by settings.IMAGE_PIPELINE_BACKEND:
+
+    - "thread": an in-process thread pool (default)
+    - "db": an ImageJob row, picked up by `manage.py process_image_jobs`
+    - "sync": inline, for tests and debugging
+    """
+    backend = settings.IMAGE_PIPELINE_BACKEND
+    if backend == 'db':
+        from .models import ImageJob
+
+        ImageJob.objects.create(dog_report_id=report_id)
+    elif backend == 'sync':
+        transaction.on_commit(lambda: process_report_image(report_id))
+    else:
+        transaction.on_commit(lambda: _get_executor().submit(_run, report_id))
+
+
+def run_pending_jobs(limit=50):
+    """Processes up to `limit` pending ImageJob rows, returning how many ran."""
+    from .models import ImageJob
+
+    with transaction.atomic():
+        jobs = list(
+            ImageJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ImageJob.PENDING)
+            .order_by('id')[:limit]
+        )
+        ImageJob.objects.filter(id__in=[job.id for job in jobs]).update(status=ImageJob.RUNNING)
+
+    for job in jobs:
+        try:
+            process_report_image(job.dog_report_id)
+        except Exception as exc:
+            logger.exception("Image job %s failed", job.id)
+            job.attempts += 1
+            job.error = str(exc)
+            job.status = ImageJob.FAILED if job.attempts >= ImageJob.MAX_ATTEMPTS else ImageJob.PENDING
+        else:
+            job.status = ImageJob.DONE
+            job.error = ""
+        job.save(update_fields=['status', 'attempts', 'error', 'updated_at'])
+    return len(jobs)
@@ -0,0 +1,114 @@
+import json
+import statistics
+import subprocess
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from api import cache, seeding
+from api.models import DogReport, DogStatus
+
+# (name, path, query params) of the requests timed at every table size
+ENDPOINTS = [
+    ("reports_page", "/api/dogs/", {"page_size": 50}),
+    ("reports_pins", "/api/dogs/", {"mode": "pins", "page_size": 200}),
+    ("reports_bbox", "/api/dogs/", {"bbox": "-8.70,115.18,-8.64,115.25", "page_size": 50}),
+    ("reports_near", "/api/dogs/", {"near": "-8.6705,115.2126", "radius": 2, "page_size": 50}),
+    ("reports_condition", "/api/dogs/", {"condition": "Injured", "page_size": 50}),
+    ("reports_clusters", "/api/dogs/clusters/", {"bbox": "-9.0,114.4,-8.0,115.8", "zoom": 10}),
+    ("report_detail", "/api/dogs/{report_id}/", {}),
+    ("report_expanded", "/api/dogs/{report_id}/", {"expand": "status,comments"}),
+    ("comments_page", "/api/comments/", {"page_size": 50}),
+    # /api/status/ isn't paginated, so this serializes every status and grows with the table
+    ("statuses_full_dump", "/api/status/", {}),
+    ("status_detail", "/api/status/{status_id}/", {}),
+]
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of already sorted samples."""
+    index = max(0, min(len(samples) - 1, int(round(fraction * len(samples))) - 1))
+    return samples[index]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the main API endpoints at growing table sizes and prints JSON results. "
+        "Seeds data into the configured database, so point DATABASE_URL at a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,10000,100000",
+                            help="Comma separated report counts to grow the table to")
+        parser.add_argument("--repeat", type=int, default=30, help="Timed requests per endpoint and size")
+        parser.add_argument("--warm-cache", action="store_true",
+                            help="Let the response cache serve repeats (default measures the full path)")
+        parser.add_argument("--output", help="Also write the JSON results to this file")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options["sizes"].split(","))
+        seeder = seeding.Seeder(seed=options["seed"])
+        client = Client()
+        results = []
+
+        for size in sizes:
+            missing = size - DogReport.objects.count()
+            if missing > 0:
+                self.stderr.write(f"Seeding {missing} report(s) to reach {size}")
+                seeder.seed(missing)
+            report_id = DogReport.objects.order_by("-created_at", "-id").values_list("id", flat=True).first()
+            status_id = DogStatus.objects.filter(dog_report_id=report_id).values_list("id", flat=True).first()
+
+            for name, path, params in ENDPOINTS:
+                url = path.format(report_id=report_id, status_id=status_id)
+                samples = []
+                for _ in range(options["repeat"]):
+                    if not options["warm_cache"]:
+                        cache.bump_generation(cache.REPORTS, cache.COMMENTS)
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        response = client.get(url, params, SERVER_NAME="localhost")
+                        body = b"".join(response.streaming_content) if response.streaming else response.content
+                        samples.append((time.perf_counter() - start) * 1000)
+                samples.sort()
+                result = {
+                    "size": size,
+                    "endpoint": name,
+                    "status": response.status_code,
+                    "p50_ms": round(statistics.median(samples), 3),
+                    "p95_ms": round(percentile(samples, 0.95), 3),
+                    "p99_ms": round(percentile(samples, 0.99), 3),
+                    "queries": len(queries),
+                    "bytes": len(body),
+                }
+                results.append(result)
+                self.stderr.write(
+                    f"{size:>9} {name:<18} p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  "
+                    f"{result['queries']} queries  {result['bytes']} bytes"
+                )
+
+        report = {
+            "revision": git_revision(),
+            "database": connection.vendor,
+            "warm_cache": options["warm_cache"],
+            "repeat": options["repeat"],
+            "results": results,
+        }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+        self.stdout.write(output)
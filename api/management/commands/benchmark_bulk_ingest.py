@@ -0,0 +1,74 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+
+from api import seeding
+
+from .benchmark_api import git_revision
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the rows/s of report ingestion through one POST /api/dogs/ per report and "
+        "POST /api/dogs/bulk/ batches. Prints JSON results. Writes reports into the configured "
+        "database, so point DATABASE_URL at a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=2000, help="Reports created through each path")
+        parser.add_argument("--batch", type=int, default=500, help="Reports per bulk request")
+        parser.add_argument("--output", help="Also write the JSON results to this file")
+        parser.add_argument("--seed", type=int, default=3)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        rows, batch = options["rows"], options["batch"]
+        client = Client()
+
+        def sighting():
+            _, latitude, longitude, spread, _ = rng.choice(seeding.HOTSPOTS)
+            return {
+                "latitude": rng.gauss(latitude, spread),
+                "longitude": rng.gauss(longitude, spread),
+                "condition": rng.choice(seeding.CONDITIONS)[0],
+                "description": rng.choice(seeding.DESCRIPTIONS),
+            }
+
+        def post(path, data):
+            response = client.post(path, json.dumps(data), content_type="application/json", SERVER_NAME="localhost")
+            if response.status_code != 201:
+                raise CommandError(f"POST {path} returned {response.status_code}: {response.content[:200]}")
+
+        start = time.perf_counter()
+        for _ in range(rows):
+            post("/api/dogs/", sighting())
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for offset in range(0, rows, batch):
+            post("/api/dogs/bulk/", [sighting() for _ in range(min(batch, rows - offset))])
+        bulk = time.perf_counter() - start
+
+        results = [
+            {"path": "single", "seconds": round(single, 3), "rows_per_s": round(rows / single)},
+            {"path": f"bulk_{batch}", "seconds": round(bulk, 3), "rows_per_s": round(rows / bulk)},
+        ]
+        for result in results:
+            self.stderr.write(f"{result['path']:<10} {result['seconds']:>8.2f} s  {result['rows_per_s']:>8} rows/s")
+
+        report = {
+            "revision": git_revision(),
+            "database": connection.vendor,
+            "rows": rows,
+            "batch": batch,
+            "results": results,
+        }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+        self.stdout.write(output)
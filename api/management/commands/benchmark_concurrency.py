@@ -0,0 +1,125 @@
+import asyncio
+import itertools
+import json
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from .benchmark_api import git_revision, percentile
+
+
+class HTTPError(Exception):
+    pass
+
+
+async def read_response(reader):
+    """Reads one HTTP/1.1 response; returns (status, keep_alive)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise HTTPError("Connection closed")
+    version, status = status_line.split(b" ", 2)[:2]
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while size := int((await reader.readline()).split(b";")[0], 16):
+            await reader.readexactly(size + 2)
+        await reader.readline()
+    elif "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    else:
+        await reader.read()  # Body runs until the connection closes
+        return int(status), False
+    keep_alive = version == b"HTTP/1.1" and headers.get("connection", "").lower() != "close"
+    return int(status), keep_alive
+
+
+async def client(url, deadline, latencies, errors, counter=None):
+    """
+    One client sending requests back to back on a keep-alive connection.
+    With a counter, every request gets a unique ?_bench= so the response
+    cache can't answer it.
+    """
+    parts = urlsplit(url)
+    path = parts.path + f"?{parts.query}&" if parts.query else parts.path + "?"
+    writer = None
+    while time.monotonic() < deadline:
+        target = f"{path}_bench={next(counter)}" if counter else path.rstrip("?&")
+        request = f"GET {target} HTTP/1.1\r\nHost: {parts.netloc}\r\nAccept: application/json\r\n\r\n"
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+            start = time.perf_counter()
+            writer.write(request.encode())
+            status, keep_alive = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors[status] = errors.get(status, 0) + 1
+        except (OSError, HTTPError, ValueError, asyncio.IncompleteReadError) as exc:
+            errors[type(exc).__name__] = errors.get(type(exc).__name__, 0) + 1
+            keep_alive = False
+        if not keep_alive and writer is not None:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def load(url, concurrency, duration, warm_cache=False):
+    latencies, errors = [], {}
+    counter = None if warm_cache else itertools.count()
+    deadline = time.monotonic() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(client(url, deadline, latencies, errors, counter) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "url": url,
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares requests/sec of the WSGI report listing with its async twin at many concurrent "
+        "clients. Start both servers with the same number of workers first, e.g.\n"
+        "  gunicorn pawspotter_backend.wsgi -w 4 -b localhost:8000\n"
+        "  gunicorn pawspotter_backend.asgi -k uvicorn.workers.UvicornWorker -w 4 -b localhost:8001"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--wsgi-url", default="http://localhost:8000/api/dogs/?page_size=50")
+        parser.add_argument("--asgi-url", default="http://localhost:8001/api/async/dogs/?page_size=50")
+        parser.add_argument("--concurrency", type=int, default=200, help="Concurrent clients")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load per server")
+        parser.add_argument("--warm-cache", action="store_true",
+                            help="Let the response cache of the WSGI views serve repeats (the async views have none)")
+        parser.add_argument("--output", help="Also write the JSON results to this file")
+
+    def handle(self, *args, **options):
+        results = {
+            "revision": git_revision(),
+            "concurrency": options["concurrency"],
+            "duration_seconds": options["duration"],
+            "servers": {},
+        }
+        for name in ("wsgi", "asgi"):
+            url = options[f"{name}_url"]
+            if urlsplit(url).scheme != "http":
+                raise CommandError(f"Only http:// URLs are supported: {url}")
+            self.stdout.write(f"Loading {url} with {options['concurrency']} clients for {options['duration']}s")
+            results["servers"][name] = asyncio.run(
+                load(url, options["concurrency"], options["duration"], options["warm_cache"]))
+
+        output = json.dumps(results, indent=2)
+        self.stdout.write(output)
+        if options["output"]:
+            with open(options["output"], "w") as handle:
+                handle.write(output + "\n")
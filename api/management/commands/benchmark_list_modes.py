@@ -0,0 +1,81 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+
+from api import cache, seeding
+from api.models import DogReport
+
+from .benchmark_api import git_revision, percentile
+
+# (name, query params) of the /api/dogs/ list representations compared
+MODES = [
+    ("full", {}),
+    ("fields", {"fields": "id,latitude,longitude,condition,created_at"}),
+    ("pins", {"mode": "pins"}),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the throughput of the /api/dogs/ list representations: the full serializer, "
+        "?fields= sparse fieldsets and ?mode=pins. Prints JSON results. Seeds data into the "
+        "configured database, so point DATABASE_URL at a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=20000, help="Reports to grow the table to")
+        parser.add_argument("--repeat", type=int, default=50, help="Timed requests per representation")
+        parser.add_argument("--page-size", type=int, default=200)
+        parser.add_argument("--output", help="Also write the JSON results to this file")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        missing = options["rows"] - DogReport.objects.count()
+        if missing > 0:
+            self.stderr.write(f"Seeding {missing} report(s) to reach {options['rows']}")
+            seeding.Seeder(seed=options["seed"]).seed(missing)
+
+        page_size = options["page_size"]
+        client = Client()
+        results = []
+        for name, params in MODES:
+            params = {**params, "page_size": page_size}
+            samples = []
+            for _ in range(options["repeat"]):
+                # Measure the query and serializer, not the response cache
+                cache.bump_generation(cache.REPORTS)
+                start = time.perf_counter()
+                response = client.get("/api/dogs/", params, SERVER_NAME="localhost")
+                samples.append((time.perf_counter() - start) * 1000)
+            samples.sort()
+            p50 = statistics.median(samples)
+            result = {
+                "mode": name,
+                "status": response.status_code,
+                "p50_ms": round(p50, 3),
+                "p95_ms": round(percentile(samples, 0.95), 3),
+                "rows_per_s": round(page_size / p50 * 1000),
+            }
+            results.append(result)
+            self.stderr.write(
+                f"{name:<8} p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  "
+                f"{result['rows_per_s']:>8} rows/s"
+            )
+
+        report = {
+            "revision": git_revision(),
+            "database": connection.vendor,
+            "rows": DogReport.objects.count(),
+            "page_size": page_size,
+            "repeat": options["repeat"],
+            "results": results,
+        }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+        self.stdout.write(output)
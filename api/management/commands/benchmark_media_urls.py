@@ -0,0 +1,58 @@
+import json
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from storages.backends.s3 import S3Storage
+
+from api import media
+
+
+def time_page(function, names, repeat):
+    """Best wall time of `repeat` runs of function(name) over every name, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for name in names:
+            function(name)
+        best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 3)
+
+
+class Command(BaseCommand):
+    help = (
+        "Times building the image URLs of one page of reports through storage.url() "
+        "and through api.media, with signed and custom domain S3 URLs. Runs offline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=500, help="Image names per page")
+        parser.add_argument("--repeat", type=int, default=20, help="Timed runs per case; the best is reported")
+
+    def handle(self, *args, **options):
+        credentials = {
+            "bucket_name": "pawspotter-benchmark",
+            "access_key": "benchmark",
+            "secret_key": "benchmark",
+            "region_name": "ap-southeast-2",
+        }
+        signed = S3Storage(**credentials, custom_domain=None, querystring_auth=True)
+        cdn = S3Storage(**credentials, custom_domain="cdn.example.com", querystring_auth=False)
+        names = [f"dog_images/{uuid.uuid4().hex}.jpg" for _ in range(options["rows"])]
+        repeat = options["repeat"]
+
+        def cold(name):
+            media.signed_urls.clear()
+            return media.url(signed, name)
+
+        signed.url(names[0])  # Creates the boto3 client outside the timings
+        media.url(signed, names[0])
+        results = {
+            "rows": len(names),
+            "signed_storage_url_ms": time_page(signed.url, names, repeat),
+            "signed_media_url_cold_ms": time_page(cold, names, repeat),
+            "signed_media_url_cached_ms": time_page(lambda name: media.url(signed, name), names, repeat),
+            "cdn_storage_url_ms": time_page(cdn.url, names, repeat),
+            "cdn_media_url_ms": time_page(lambda name: media.url(cdn, name), names, repeat),
+        }
+        self.stdout.write(json.dumps(results, indent=2))
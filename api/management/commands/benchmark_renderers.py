@@ -0,0 +1,95 @@
+import gzip
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from rest_framework.renderers import JSONRenderer
+
+from api import cache, renderers, seeding
+from api.management.commands.benchmark_api import git_revision
+from api.models import DogReport
+
+
+def time_calls(function, repeat):
+    """Median and best wall time of `repeat` calls, in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 3), round(min(samples), 3)
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders one /api/dogs/ listing with DRF's JSON renderer, the orjson renderer and "
+        "msgpack, and prints encode/decode times and payload sizes as JSON. Seeds data into "
+        "the configured database, so point DATABASE_URL at a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000, help="Reports in the listing")
+        parser.add_argument("--repeat", type=int, default=20, help="Timed runs per format")
+        parser.add_argument("--mode", choices=["full", "pins"], default="full",
+                            help="Full representations or ?mode=pins rows")
+        parser.add_argument("--output", help="Also write the JSON results to this file")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        missing = rows - DogReport.objects.count()
+        if missing > 0:
+            self.stderr.write(f"Seeding {missing} report(s) to reach {rows}")
+            seeding.Seeder(seed=options["seed"]).seed(missing)
+
+        # The legacy bare list returns every row in one response
+        params = {"mode": "pins"} if options["mode"] == "pins" else {}
+        cache.bump_generation(cache.REPORTS)
+        with override_settings(LEGACY_BARE_LIST_RESPONSES=True):
+            data = Client().get("/api/dogs/", params, SERVER_NAME="localhost").data[:rows]
+
+        formats = [
+            ("drf_json", JSONRenderer(), json.loads),
+            ("fast_json", renderers.FastJSONRenderer(),
+             renderers.orjson.loads if renderers.orjson is not None else json.loads),
+        ]
+        if renderers.msgpack is not None:
+            formats.append(("msgpack", renderers.MessagePackRenderer(), renderers.msgpack.unpackb))
+        else:
+            self.stderr.write("msgpack is not installed; skipping it")
+
+        results = []
+        for name, renderer, decode in formats:
+            body = renderer.render(data)
+            encode_p50, encode_best = time_calls(lambda: renderer.render(data), options["repeat"])
+            decode_p50, decode_best = time_calls(lambda: decode(body), options["repeat"])
+            result = {
+                "format": name,
+                "encode_p50_ms": encode_p50,
+                "encode_best_ms": encode_best,
+                "decode_p50_ms": decode_p50,
+                "decode_best_ms": decode_best,
+                "bytes": len(body),
+                "gzip_bytes": len(gzip.compress(body, compresslevel=6)),
+            }
+            results.append(result)
+            self.stderr.write(
+                f"{name:<10} encode {encode_p50:>8.2f} ms  decode {decode_p50:>8.2f} ms  "
+                f"{result['bytes']:>9} bytes  {result['gzip_bytes']:>8} gzipped"
+            )
+
+        report = {
+            "revision": git_revision(),
+            "rows": len(data),
+            "mode": options["mode"],
+            "orjson": renderers.orjson is not None,
+            "repeat": options["repeat"],
+            "results": results,
+        }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+        self.stdout.write(output)
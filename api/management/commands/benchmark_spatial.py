@@ -0,0 +1,92 @@
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api import geo, seeding
+from api.filters import DogReportFilter
+from api.models import DogReport
+
+from .benchmark_api import git_revision, percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares bbox and near/radius lookups pruned by geohash cells with plain coordinate "
+        "scans. Prints JSON results. Seeds data into the configured database, so point "
+        "DATABASE_URL at a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000000, help="Reports to grow the table to")
+        parser.add_argument("--repeat", type=int, default=50, help="Lookups per query, each around a new point")
+        parser.add_argument("--radius", type=float, default=2, help="near/radius distance in km")
+        parser.add_argument("--output", help="Also write the JSON results to this file")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        missing = options["rows"] - DogReport.objects.count()
+        if missing > 0:
+            self.stderr.write(f"Seeding {missing} report(s) to reach {options['rows']}")
+            seeding.Seeder(seed=options["seed"]).seed(missing)
+
+        # Points around the hotspots the seeder clusters reports at
+        rng = random.Random(7)
+        weights = [hotspot[4] for hotspot in seeding.HOTSPOTS]
+        points = []
+        for _ in range(options["repeat"]):
+            _, latitude, longitude, spread, _ = rng.choices(seeding.HOTSPOTS, weights)[0]
+            points.append((rng.gauss(latitude, spread), rng.gauss(longitude, spread)))
+        radius = options["radius"]
+        size = 0.05  # Degrees per bbox side, about 5 km
+
+        def filtered(params):
+            return list(DogReportFilter(params, queryset=DogReport.objects.all()).qs.values_list("id", flat=True))
+
+        queries = [
+            ("near_cells", lambda lat, lon: filtered({"near": f"{lat},{lon}", "radius": str(radius)})),
+            ("near_scan", lambda lat, lon: list(
+                DogReport.objects.alias(distance_km=geo.haversine_expression(lat, lon))
+                .filter(distance_km__lte=radius).values_list("id", flat=True))),
+            ("bbox_cells", lambda lat, lon: filtered({"bbox": f"{lat},{lon},{lat + size},{lon + size}"})),
+            ("bbox_scan", lambda lat, lon: list(DogReport.objects.filter(
+                latitude__range=(lat, lat + size), longitude__range=(lon, lon + size),
+            ).values_list("id", flat=True))),
+        ]
+
+        results = []
+        for name, query in queries:
+            samples, matches = [], 0
+            for latitude, longitude in points:
+                start = time.perf_counter()
+                matches += len(query(latitude, longitude))
+                samples.append((time.perf_counter() - start) * 1000)
+            samples.sort()
+            result = {
+                "query": name,
+                "p50_ms": round(statistics.median(samples), 3),
+                "p95_ms": round(percentile(samples, 0.95), 3),
+                "mean_rows": round(matches / len(points), 1),
+            }
+            results.append(result)
+            self.stderr.write(
+                f"{name:<11} p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  "
+                f"{result['mean_rows']:>8} rows"
+            )
+
+        report = {
+            "revision": git_revision(),
+            "database": connection.vendor,
+            "rows": DogReport.objects.count(),
+            "radius_km": radius,
+            "repeat": options["repeat"],
+            "results": results,
+        }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(output + "\n")
+        self.stdout.write(output)
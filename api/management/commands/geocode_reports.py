@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from api import cache, geocoding, search
+from api.models import DogReport
+
+
+class Command(BaseCommand):
+    help = "Fills the empty location of existing reports from the offline gazetteer (GEOCODER_GAZETTEER)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Reports read and updated per batch")
+
+    def handle(self, *args, **options):
+        if not settings.GEOCODER_GAZETTEER:
+            raise CommandError("GEOCODER_GAZETTEER is not set.")
+        gazetteer = geocoding.get_gazetteer()
+        self.stdout.write(f"Loaded {len(gazetteer)} place(s)")
+
+        pending = DogReport.objects.filter(Q(location__isnull=True) | Q(location="")).order_by("id")
+        last_id, filled, unmatched = 0, 0, 0
+        while True:
+            # Keyset over the id, so reports no place matched aren't read again
+            batch = list(pending.filter(id__gt=last_id).only("id", "latitude", "longitude")[:options["batch_size"]])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            now = timezone.now()
+            located = []
+            for report in batch:
+                report.location = geocoding.reverse(report.latitude, report.longitude)
+                if report.location:
+                    report.updated_at = now  # bulk_update skips auto_now; sync clients need the change
+                    located.append(report)
+            with transaction.atomic():
+                DogReport.objects.bulk_update(located, ["location", "updated_at"])
+                search.index_reports([report.id for report in located])
+            filled += len(located)
+            unmatched += len(batch) - len(located)
+            self.stdout.write(f"  {filled} filled, {unmatched} without a place nearby")
+
+        cache.invalidate(cache.REPORTS)
+        self.stdout.write(self.style.SUCCESS(f"Filled the location of {filled} report(s)"))
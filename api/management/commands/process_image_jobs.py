@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import images
+
+
+class Command(BaseCommand):
+    help = "Processes queued report images (IMAGE_PIPELINE_BACKEND = 'db')."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new jobs")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds between polls")
+        parser.add_argument("--limit", type=int, default=50, help="Jobs claimed per poll")
+
+    def handle(self, *args, **options):
+        while True:
+            processed = images.run_pending_jobs(limit=options["limit"])
+            if processed:
+                self.stdout.write(f"Processed {processed} image job(s)")
+            if not options["loop"]:
+                break
+            if not processed:
+                time.sleep(options["interval"])
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import sync
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes the tombstones of deleted rows older than SYNC_TOMBSTONE_RETENTION_DAYS. "
+        "Run it daily; /api/sync/ rejects tokens that old anyway."
+    )
+
+    def handle(self, *args, **options):
+        deleted = sync.prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} tombstone(s) older than {settings.SYNC_TOMBSTONE_RETENTION_DAYS} days"))
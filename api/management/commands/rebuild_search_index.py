@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api import search
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index from the reports and comments tables."
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stdout.write(f"No search index on {connection.vendor}; searches fall back to LIKE scans")
+            return
+        with transaction.atomic():
+            search.rebuild()
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from api import stats
+from api.models import DogReport, ReportStat
+
+
+class Command(BaseCommand):
+    help = "Recomputes the /api/stats/ rollups (ReportStat) from the reports and statuses tables."
+
+    def handle(self, *args, **options):
+        stats.rebuild(DogReport, ReportStat)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {ReportStat.objects.count()} stats bucket(s)"))
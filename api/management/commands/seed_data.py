@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from api import seeding
+from api.models import DogReport
+
+
+class Command(BaseCommand):
+    help = "Seeds the database with realistic dog reports, statuses and comments for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reports", type=int, default=100_000, help="Reports to add")
+        parser.add_argument("--users", type=int, default=1000, help="Seed users to make sure exist")
+        parser.add_argument("--comments-per-report", type=float, default=1.5, help="Average comments per report")
+        parser.add_argument("--days", type=int, default=365, help="Spread created_at over this many past days")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows inserted per statement/COPY")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed, for reproducible data")
+
+    def handle(self, *args, **options):
+        seeder = seeding.Seeder(
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            days=options["days"],
+            stdout=self.stdout,
+        )
+        method = "COPY" if seeder.use_copy else "bulk_create"
+        self.stdout.write(f"Seeding {options['reports']} report(s) on {connection.vendor} using {method}")
+        seeder.seed(
+            options["reports"],
+            users=options["users"],
+            comments_per_report=options["comments_per_report"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Done, {DogReport.objects.count()} report(s) in total"))
@@ -0,0 +1,111 @@
+"""
+URLs of stored report images and thumbnails.
+
+Serializing a page of reports asks the storage for the URL of every image
+and thumbnail. On S3 without a custom domain (or with CloudFront signing)
+every storage.url() call computes a request signature. url() avoids that:
+
+* public files on a custom domain (AWS_S3_CUSTOM_DOMAIN) get their URL by
+  string formatting, without going through the storage at all;
+* signed URLs are cached per process for half their lifetime, so a URL
+  handed out is always valid for at least half of AWS_QUERYSTRING_EXPIRE.
+
+Other storages (the local FileSystemStorage) build URLs cheaply and are
+called directly.
+"""
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from . import uploads
+
+# Signed URLs cached per process, least recently used dropped first
+URL_CACHE_SIZE = 10_000
+
+# Share of a signature's lifetime a cached URL is served for
+SIGNED_URL_TTL_FRACTION = 0.5
+
+_PLAIN_CHARACTERS = re.compile(r"[\w.\-/]+\Z", re.ASCII)
+
+_prefixes = weakref.WeakKeyDictionary()  # storage -> public URL prefix, or None when URLs are signed
+
+
+class URLCache:
+    """Thread-safe LRU of (url, expires at) entries."""
+
+    def __init__(self, maxsize=URL_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, url, ttl):
+        with self._lock:
+            self._entries[key] = (url, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+signed_urls = URLCache()
+
+
+def _is_plain(name):
+    """True for names that need neither quoting nor normalization, like those unique_filename generates."""
+    return bool(_PLAIN_CHARACTERS.match(name)) and all(
+        part not in ('', '.', '..') for part in name.split('/'))
+
+
+def public_prefix(storage):
+    """
+    "https://cdn.example.com/<location>/" when the storage serves unsigned
+    URLs from a custom domain, else None.
+    """
+    try:
+        return _prefixes[storage]
+    except (KeyError, TypeError):
+        pass
+    prefix = None
+    if uploads.is_s3(storage) and storage.custom_domain and not (
+            storage.querystring_auth and storage.cloudfront_signer):
+        location = storage.location.strip('/')
+        prefix = f"{storage.url_protocol}//{storage.custom_domain}/" + (f"{location}/" if location else "")
+    try:
+        _prefixes[storage] = prefix
+    except TypeError:  # Not weak-referenceable
+        pass
+    return prefix
+
+
+def url(storage, name):
+    """URL of the stored file `name`, None for an empty name."""
+    if not name:
+        return None
+    prefix = public_prefix(storage)
+    if prefix is not None and _is_plain(name):
+        return prefix + name
+    if not uploads.is_s3(storage):
+        return storage.url(name)
+
+    key = (id(storage), name)
+    cached = signed_urls.get(key)
+    if cached is None:
+        cached = storage.url(name)
+        signed_urls.set(key, cached, storage.querystring_expire * SIGNED_URL_TTL_FRACTION)
+    return cached
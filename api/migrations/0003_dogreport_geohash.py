@@ -0,0 +1,38 @@
+# Generated by Django 4.2.19 on 2026-10-17 00:50
+
+from django.db import migrations, models
+
+from api import geo
+
+
+def backfill_geohash(apps, schema_editor):
+    DogReport = apps.get_model('api', 'DogReport')
+    batch = []
+    for report in DogReport.objects.only('id', 'latitude', 'longitude').iterator(chunk_size=2000):
+        report.geohash = geo.encode(report.latitude, report.longitude)
+        batch.append(report)
+        if len(batch) >= 2000:
+            DogReport.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    if batch:
+        DogReport.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_dogreport_description_alter_dogreport_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dogreport',
+            name='geohash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='dogreport',
+            index=models.Index(fields=['geohash', 'latitude', 'longitude'], name='api_dogreport_geo_idx'),
+        ),
+    ]
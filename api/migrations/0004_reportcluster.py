@@ -0,0 +1,37 @@
+# Generated by Django 4.2.19 on 2026-10-17 00:52
+
+from django.db import migrations, models
+
+from api import clusters
+
+
+def backfill_clusters(apps, schema_editor):
+    clusters.rebuild(apps.get_model('api', 'DogReport'), apps.get_model('api', 'ReportCluster'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_dogreport_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportCluster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precision', models.PositiveSmallIntegerField()),
+                ('cell', models.CharField(max_length=12, unique=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('latitude_sum', models.FloatField(default=0)),
+                ('longitude_sum', models.FloatField(default=0)),
+                ('healthy_count', models.PositiveIntegerField(default=0)),
+                ('injured_count', models.PositiveIntegerField(default=0)),
+                ('lost_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['precision', 'cell'], name='api_cluster_precision_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_clusters, migrations.RunPython.noop),
+    ]
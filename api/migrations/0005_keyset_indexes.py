@@ -0,0 +1,25 @@
+# Generated by Django 4.2.19 on 2026-10-17 00:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_reportcluster'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['-created_at', '-id'], name='api_comment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['dog_report', '-created_at', '-id'], name='api_comment_report_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dogreport',
+            index=models.Index(fields=['-created_at', '-id'], name='api_dogreport_created_idx'),
+        ),
+    ]
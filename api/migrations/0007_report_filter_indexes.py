@@ -0,0 +1,21 @@
+# Generated by Django 4.2.19 on 2026-10-17 01:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_image_pipeline'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dogreport',
+            index=models.Index(fields=['condition', '-created_at', '-id'], name='api_dogreport_cond_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dogreport',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='api_dogreport_user_created_idx'),
+        ),
+    ]
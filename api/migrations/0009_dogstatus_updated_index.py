@@ -0,0 +1,17 @@
+# Generated by Django 4.2.19 on 2026-10-17 01:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_report_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dogstatus',
+            index=models.Index(fields=['-updated_at', '-id'], name='api_dogstatus_updated_idx'),
+        ),
+    ]
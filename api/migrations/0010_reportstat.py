@@ -0,0 +1,39 @@
+# Generated by Django 4.2.19 on 2026-10-17 01:29
+
+from django.db import migrations, models
+
+from api import stats
+
+
+def backfill_stats(apps, schema_editor):
+    stats.rebuild(apps.get_model('api', 'DogReport'), apps.get_model('api', 'ReportStat'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_dogstatus_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('condition', models.CharField(max_length=20)),
+                ('cell', models.CharField(max_length=12)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('rescued_count', models.PositiveIntegerField(default=0)),
+                ('vaccinated_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['cell', 'day'], name='api_reportstat_cell_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reportstat',
+            constraint=models.UniqueConstraint(fields=('day', 'condition', 'cell'), name='api_reportstat_bucket_uniq'),
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.19 on 2026-10-17 01:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_reportstat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('report', 'Report'), ('status', 'Status'), ('comment', 'Comment')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='dogreport',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        # Existing rows get their creation time rather than the migration time
+        migrations.RunSQL(
+            "UPDATE api_dogreport SET updated_at = created_at",
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            "UPDATE api_comment SET updated_at = created_at",
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['updated_at', 'id'], name='api_comment_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dogreport',
+            index=models.Index(fields=['updated_at', 'id'], name='api_dogreport_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='api_tombstone_deleted_idx'),
+        ),
+    ]
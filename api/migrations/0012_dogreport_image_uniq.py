@@ -0,0 +1,17 @@
+# Generated by Django 4.2.19 on 2026-10-17 02:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_sync_timestamps_and_tombstones'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='dogreport',
+            constraint=models.UniqueConstraint(condition=models.Q(models.Q(('image', ''), _negated=True), ('image__isnull', False)), fields=('image',), name='api_dogreport_image_uniq'),
+        ),
+    ]
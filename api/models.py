@@ -3,6 +3,8 @@ import uuid
 from django.db import models
 from django.contrib.auth.models import User
 
+from . import geo, geocoding
+
 def unique_filename(instance, filename):
     """Generates a unique filename for uploaded images"""
     ext = filename.split('.')[-1] 
@@ -30,7 +32,52 @@ class DogReport(models.Model):
     )
     description = models.TextField(blank=True, null=True)  
     image = models.ImageField(upload_to=unique_filename, blank=True, null=True)  
+    # Storage keys of the thumbnails/WebP variants, filled in by api.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    image_processed_at = models.DateTimeField(blank=True, null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped by every change, including queryset.update() paths; drives /api/sync/
+    updated_at = models.DateTimeField(auto_now=True)
+    # Geohash of (latitude, longitude), kept in sync on save for spatial lookups
+    geohash = models.CharField(max_length=12, blank=True, default="", editable=False)
+
+    class Meta:
+        indexes = [
+            # Covers the cell range scan and the exact coordinate check
+            models.Index(fields=["geohash", "latitude", "longitude"], name="api_dogreport_geo_idx"),
+            # Keyset pagination order, overall and within the common filters
+            models.Index(fields=["-created_at", "-id"], name="api_dogreport_created_idx"),
+            models.Index(fields=["condition", "-created_at", "-id"], name="api_dogreport_cond_created_idx"),
+            models.Index(fields=["user", "-created_at", "-id"], name="api_dogreport_user_created_idx"),
+            # Delta sync order
+            models.Index(fields=["updated_at", "id"], name="api_dogreport_updated_idx"),
+        ]
+        constraints = [
+            # An uploaded image_key can back one report only
+            models.UniqueConstraint(
+                fields=["image"], condition=~models.Q(image="") & models.Q(image__isnull=False),
+                name="api_dogreport_image_uniq",
+            ),
+        ]
+
+    def sync_geohash(self):
+        """Recomputes the geohash; bulk_create callers must call this themselves."""
+        self.geohash = geo.encode(self.latitude, self.longitude)
+
+    def fill_location(self):
+        """Names an empty location after the nearest gazetteer place; bulk_create callers must call this themselves."""
+        if not self.location:
+            self.location = geocoding.reverse(self.latitude, self.longitude)
+
+    def save(self, *args, **kwargs):
+        """Keeps the geohash column in sync with the coordinates and fills in the location of new reports."""
+        self.sync_geohash()
+        if self._state.adding:
+            self.fill_location()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"latitude", "longitude"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "geohash"}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.condition} dog spotted at ({self.latitude}, {self.longitude})"
@@ -47,8 +94,14 @@ class DogStatus(models.Model):
     additional_notes = models.TextField(blank=True, null=True)  
     updated_at = models.DateTimeField(auto_now=True)  
 
+    class Meta:
+        indexes = [
+            # Admin date hierarchy and "recently updated" listings
+            models.Index(fields=["-updated_at", "-id"], name="api_dogstatus_updated_idx"),
+        ]
+
     def __str__(self):
-        return f"Status for DogReport {self.dog_report.id}"
+        return f"Status for DogReport {self.dog_report_id}"
 
 
 
@@ -61,6 +114,131 @@ class Comment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)  
     text = models.TextField()  
     created_at = models.DateTimeField(auto_now_add=True) 
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination order, overall and per report
+            models.Index(fields=["-created_at", "-id"], name="api_comment_created_idx"),
+            models.Index(fields=["dog_report", "-created_at", "-id"], name="api_comment_report_created_idx"),
+            # Delta sync order
+            models.Index(fields=["updated_at", "id"], name="api_comment_updated_idx"),
+        ]
+
+    def __str__(self):
+        return f"Comment by {self.user.username if self.user else 'Anonymous'} on Report {self.dog_report_id}"
+
+class ReportCluster(models.Model):
+    """
+    Rollup of dog reports per geohash cell, used for zoomed out map clusters.
+    One row per cell at each precision in CLUSTER_PRECISIONS, kept up to date
+    incrementally by the DogReport signals.
+    """
+    precision = models.PositiveSmallIntegerField()
+    cell = models.CharField(max_length=12, unique=True)  # Geohash prefix of length `precision`
+    count = models.PositiveIntegerField(default=0)
+    latitude_sum = models.FloatField(default=0)
+    longitude_sum = models.FloatField(default=0)
+    healthy_count = models.PositiveIntegerField(default=0)
+    injured_count = models.PositiveIntegerField(default=0)
+    lost_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["precision", "cell"], name="api_cluster_precision_idx"),
+        ]
+
+    def __str__(self):
+        return f"Cluster {self.cell} ({self.count} reports)"
+
+
+class Tombstone(models.Model):
+    """
+    Records a deleted report, status or comment so offline clients syncing
+    through /api/sync/ learn about the deletion. Written by post_delete
+    handlers; pruned after SYNC_TOMBSTONE_RETENTION_DAYS.
+    """
+    REPORT = 'report'
+    STATUS = 'status'
+    COMMENT = 'comment'
+
+    kind = models.CharField(
+        max_length=10,
+        choices=[
+            (REPORT, 'Report'),
+            (STATUS, 'Status'),
+            (COMMENT, 'Comment'),
+        ],
+    )
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["deleted_at", "id"], name="api_tombstone_deleted_idx"),
+        ]
+
+    def __str__(self):
+        return f"Deleted {self.kind} {self.object_id}"
+
+
+class ReportStat(models.Model):
+    """
+    Daily rollup of reports per condition and coarse geohash cell (region),
+    with how many of those dogs are rescued/vaccinated. Kept up to date
+    incrementally by the DogReport and DogStatus signals; see api.stats.
+    """
+    day = models.DateField()
+    condition = models.CharField(max_length=20)
+    cell = models.CharField(max_length=12)  # Geohash prefix of length STATS_PRECISION
+    count = models.PositiveIntegerField(default=0)
+    rescued_count = models.PositiveIntegerField(default=0)
+    vaccinated_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Doubles as the index for day ranges
+            models.UniqueConstraint(fields=["day", "condition", "cell"], name="api_reportstat_bucket_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["cell", "day"], name="api_reportstat_cell_day_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.count} {self.condition} report(s) in {self.cell} on {self.day}"
+
+
+class ImageJob(models.Model):
+    """
+    Queued image processing for a dog report, used when
+    IMAGE_PIPELINE_BACKEND = "db". Processed by `manage.py process_image_jobs`.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    MAX_ATTEMPTS = 3
+
+    dog_report = models.ForeignKey(DogReport, on_delete=models.CASCADE, related_name="image_jobs")
+    status = models.CharField(
+        max_length=10,
+        choices=[
+            (PENDING, 'Pending'),
+            (RUNNING, 'Running'),
+            (DONE, 'Done'),
+            (FAILED, 'Failed'),
+        ],
+        default=PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "id"], name="api_imagejob_status_idx"),
+        ]
 
     def __str__(self):
-        return f"Comment by {self.user.username if self.user else 'Anonymous'} on Report {self.dog_report.id}"
\ No newline at end of file
+        return f"Image job {self.id} for DogReport {self.dog_report_id} ({self.status})"
@@ -0,0 +1,99 @@
+"""
+Response renderers and request parsers.
+
+FastJSONRenderer/FastJSONParser are DRF's JSON renderer and parser backed by
+orjson when it is installed; otherwise (and for the indented output of the
+browsable API) they are DRF's stdlib implementations. Compact output is
+byte-for-byte what DRF renders: datetimes and decimals still go through
+DRF's encoder.
+
+MessagePackRenderer/MessagePackParser add application/msgpack (?format=msgpack)
+for clients that send Accept: application/msgpack. The payload holds the same
+structure as the JSON one; floats are packed as 9 byte doubles. Both need the
+msgpack package and are only offered when it is installed.
+"""
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.utils.encoders import JSONEncoder
+
+from pawspotter_backend.metrics import span
+
+try:
+    import orjson
+except ImportError:  # Optional: DRF's stdlib encoder is used instead
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # Optional: application/msgpack is not offered
+    msgpack = None
+
+_encode_default = JSONEncoder().default  # Types the fast encoders leave to DRF (datetimes, Decimal, lazy strings)
+
+_LINE_SEPARATORS = (b'\xe2\x80\xa8', b'\xe2\x80\xa9')
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """JSONRenderer encoding with orjson when available."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        with span('render'):
+            if (orjson is None or self.ensure_ascii or not self.compact
+                    or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+                return super().render(data, accepted_media_type, renderer_context)
+            try:
+                ret = orjson.dumps(data, default=_encode_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+            except orjson.JSONEncodeError:
+                # Non-string keys, integers beyond 64 bits and the like
+                return super().render(data, accepted_media_type, renderer_context)
+            # Like DRF, keep the output a strict JavaScript subset
+            if _LINE_SEPARATORS[0] in ret or _LINE_SEPARATORS[1] in ret:
+                ret = ret.replace(_LINE_SEPARATORS[0], b'\\u2028').replace(_LINE_SEPARATORS[1], b'\\u2029')
+            return ret
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser decoding UTF-8 bodies with orjson when available."""
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """Renders application/msgpack. Requires the msgpack package."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        with span('render'):
+            return msgpack.packb(data, default=_encode_default, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    """Parses application/msgpack request bodies. Requires the msgpack package."""
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError('MessagePack parse error - %s' % str(exc))
+
+
+# Parsers for request bodies carrying plain data, for views that set their own parser_classes
+DATA_PARSERS = (FastJSONParser,) + ((MessagePackParser,) if msgpack is not None else ())
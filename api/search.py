@@ -0,0 +1,151 @@
+"""
+Full-text search over report locations, descriptions and comments.
+
+Each report has one row in the api_report_search index: an FTS5 virtual table
+on SQLite, or a tsvector column with a GIN index on Postgres. Rows are rebuilt
+from the reports and comments tables with one INSERT ... SELECT, so
+incremental updates and full rebuilds share the same SQL.
+"""
+import re
+
+from django.db import connection, connections, router
+
+TABLE = "api_report_search"
+
+# Relevance weights of location, description and comments (Postgres A/B/C)
+FTS5_WEIGHTS = (10.0, 5.0, 1.0)
+
+MAX_TERMS = 12
+_CHUNK_SIZE = 500  # Report ids per statement, below SQLite's parameter limit
+
+
+def is_supported(conn=connection):
+    return conn.vendor in ('sqlite', 'postgresql')
+
+
+def create_index(schema_editor):
+    """Creates the index table; used by the migration."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {TABLE} USING fts5("
+            "location, description, comments, tokenize = 'porter unicode61')"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(f"CREATE TABLE {TABLE} (report_id integer PRIMARY KEY, document tsvector NOT NULL)")
+        schema_editor.execute(f"CREATE INDEX {TABLE}_document_idx ON {TABLE} USING GIN (document)")
+
+
+def drop_index(schema_editor):
+    if is_supported(schema_editor.connection):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+def _select_documents(vendor, where=""):
+    """SELECT producing one index row per report, optionally restricted by `where`."""
+    comments = "SELECT {agg} FROM api_comment c WHERE c.dog_report_id = r.id"
+    if vendor == 'sqlite':
+        comments = comments.format(agg="group_concat(c.text, ' ')")
+        return (
+            "SELECT r.id, COALESCE(r.location, ''), COALESCE(r.description, ''), "
+            f"COALESCE(({comments}), '') FROM api_dogreport r {where}"
+        )
+    comments = comments.format(agg="string_agg(c.text, ' ')")
+    return (
+        "SELECT r.id, "
+        "setweight(to_tsvector('english', COALESCE(r.location, '')), 'A') || "
+        "setweight(to_tsvector('english', COALESCE(r.description, '')), 'B') || "
+        f"setweight(to_tsvector('english', COALESCE(({comments}), '')), 'C') "
+        f"FROM api_dogreport r {where}"
+    )
+
+
+def _columns(vendor):
+    if vendor == 'sqlite':
+        return "rowid, location, description, comments", "rowid"
+    return "report_id, document", "report_id"
+
+
+def index_reports(report_ids):
+    """(Re)indexes the given reports; ids of deleted reports are just removed."""
+    if not is_supported():
+        return
+    report_ids = sorted(set(report_ids))
+    columns, key = _columns(connection.vendor)
+    with connection.cursor() as cursor:
+        for start in range(0, len(report_ids), _CHUNK_SIZE):
+            chunk = report_ids[start:start + _CHUNK_SIZE]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            select = _select_documents(connection.vendor, f"WHERE r.id IN ({placeholders})")
+            cursor.execute(f"DELETE FROM {TABLE} WHERE {key} IN ({placeholders})", chunk)
+            cursor.execute(f"INSERT INTO {TABLE} ({columns}) {select}", chunk)
+
+
+def remove_reports(report_ids):
+    if not is_supported():
+        return
+    report_ids = sorted(set(report_ids))
+    _, key = _columns(connection.vendor)
+    with connection.cursor() as cursor:
+        for start in range(0, len(report_ids), _CHUNK_SIZE):
+            chunk = report_ids[start:start + _CHUNK_SIZE]
+            cursor.execute(f"DELETE FROM {TABLE} WHERE {key} IN ({', '.join(['%s'] * len(chunk))})", chunk)
+
+
+def rebuild(conn=connection):
+    """Reindexes every report."""
+    if not is_supported(conn):
+        return
+    columns, _ = _columns(conn.vendor)
+    with conn.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+        cursor.execute(f"INSERT INTO {TABLE} ({columns}) " + _select_documents(conn.vendor))
+
+
+def search_terms(query):
+    """Words of a free-text query, lowercased; punctuation and operators are dropped."""
+    return re.findall(r"\w+", query.lower())[:MAX_TERMS]
+
+
+def ranked_ids(query, limit, offset=0):
+    """
+    Report ids matching any word of `query`, best match first.
+    Reports matching more (and rarer) words rank higher, and matches in the
+    location count more than in the description, which count more than in comments.
+    """
+    from .models import DogReport
+
+    terms = search_terms(query)
+    if not terms:
+        return []
+    conn = connections[router.db_for_read(DogReport)]  # A replica when the request reads from one
+    if conn.vendor == 'sqlite':
+        sql = (
+            f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s "
+            f"ORDER BY bm25({TABLE}, {', '.join(map(str, FTS5_WEIGHTS))}), rowid DESC LIMIT %s OFFSET %s"
+        )
+        params = [" OR ".join(f'"{term}"' for term in terms), limit, offset]
+    elif conn.vendor == 'postgresql':
+        sql = (
+            f"SELECT report_id FROM {TABLE}, to_tsquery('english', %s) query WHERE document @@ query "
+            "ORDER BY ts_rank(document, query) DESC, report_id DESC LIMIT %s OFFSET %s"
+        )
+        params = [" | ".join(terms), limit, offset]
+    else:
+        return _fallback_ids(terms, limit, offset)
+    with conn.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fallback_ids(terms, limit, offset):
+    """Unranked LIKE scan for databases without a supported index."""
+    from django.db.models import Q
+
+    from .models import DogReport
+
+    condition = Q()
+    for term in terms:
+        condition |= Q(location__icontains=term) | Q(description__icontains=term) | Q(comments__text__icontains=term)
+    queryset = DogReport.objects.filter(condition).order_by('-created_at', '-id').values_list('id', flat=True)
+    return list(queryset.distinct()[offset:offset + limit])
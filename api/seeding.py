@@ -0,0 +1,202 @@
+import csv
+import io
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import cache, clusters, geo, search, stats
+from .models import Comment, DogReport, DogStatus, ReportCluster, ReportStat
+
+# (name, latitude, longitude, spread in degrees, weight) of the hotspots reports cluster around
+HOTSPOTS = [
+    ("Denpasar, Bali", -8.6705, 115.2126, 0.04, 5),
+    ("Kuta, Bali", -8.7180, 115.1686, 0.02, 3),
+    ("Canggu, Bali", -8.6478, 115.1385, 0.02, 2),
+    ("Ubud, Bali", -8.5069, 115.2625, 0.03, 2),
+    ("Singaraja, Bali", -8.1120, 115.0882, 0.03, 1),
+    ("Jakarta, Indonesia", -6.2088, 106.8456, 0.10, 4),
+]
+
+CONDITIONS = [("Healthy", 5), ("Injured", 3), ("Lost", 2)]
+
+DESCRIPTIONS = [
+    "Brown dog limping near the market, seems friendly but hungry.",
+    "Small white puppy sleeping under a parked scooter.",
+    "Black dog with a red collar, looks lost and follows people around.",
+    "Skinny dog with skin problems near the temple entrance.",
+    "Mother dog with three puppies behind the warung.",
+    "",
+]
+
+COMMENTS = [
+    "I saw this dog again this morning.",
+    "On my way with some food.",
+    "Called the local shelter, they will check.",
+    "Still there as of tonight.",
+    "Looks much better now!",
+]
+
+
+@contextmanager
+def explicit_timestamps():
+    """Lets bulk_create keep the generated created_at/updated_at values."""
+    fields = [
+        DogReport._meta.get_field('created_at'),
+        DogReport._meta.get_field('updated_at'),
+        DogStatus._meta.get_field('updated_at'),
+        Comment._meta.get_field('created_at'),
+        Comment._meta.get_field('updated_at'),
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Seeder:
+    """
+    Generates realistic reports, statuses and comments in batches.
+    Uses COPY on Postgres and bulk_create elsewhere; the cluster and stats
+    rollups and the search index are rebuilt once at the end instead of per row.
+    """
+
+    def __init__(self, seed=42, batch_size=5000, days=365, stdout=None):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.days = days
+        self.stdout = stdout
+        self.now = timezone.now()
+        self.use_copy = connection.vendor == 'postgresql'
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def ensure_users(self, count):
+        """Creates seed users sharing one password hash (hashing is the slow part)."""
+        existing = list(User.objects.filter(username__startswith='seed_user_').values_list('id', flat=True))
+        password = make_password('seedpassword')
+        start = len(existing)
+        users = [
+            User(username=f"seed_user_{index}", email=f"seed_user_{index}@example.com", password=password)
+            for index in range(start, count)
+        ]
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        return list(User.objects.filter(username__startswith='seed_user_').values_list('id', flat=True))
+
+    def seed(self, reports, users=1000, comments_per_report=1.5):
+        """Adds `reports` reports (with statuses and comments) to the database."""
+        user_ids = self.ensure_users(users)
+        weights = [hotspot[4] for hotspot in HOTSPOTS]
+        condition_names = [name for name, _ in CONDITIONS]
+        condition_weights = [weight for _, weight in CONDITIONS]
+
+        created = 0
+        with explicit_timestamps():
+            while created < reports:
+                size = min(self.batch_size, reports - created)
+                batch = []
+                for _ in range(size):
+                    name, latitude, longitude, spread, _ = self.rng.choices(HOTSPOTS, weights)[0]
+                    latitude = max(-90.0, min(90.0, self.rng.gauss(latitude, spread)))
+                    longitude = max(-180.0, min(180.0, self.rng.gauss(longitude, spread)))
+                    created_at = self.now - timedelta(seconds=self.rng.randrange(self.days * 86400))
+                    batch.append(DogReport(
+                        user_id=self.rng.choice(user_ids) if user_ids and self.rng.random() < 0.7 else None,
+                        latitude=latitude,
+                        longitude=longitude,
+                        geohash=geo.encode(latitude, longitude),
+                        location=name if self.rng.random() < 0.4 else None,
+                        condition=self.rng.choices(condition_names, condition_weights)[0],
+                        description=self.rng.choice(DESCRIPTIONS),
+                        created_at=created_at,
+                        updated_at=created_at,
+                    ))
+                with transaction.atomic():
+                    self.insert_reports(batch)
+                    self.insert_statuses(batch)
+                    self.insert_comments(batch, user_ids, comments_per_report)
+                created += size
+                self.log(f"  {created}/{reports} reports")
+
+        clusters.rebuild(DogReport, ReportCluster)
+        stats.rebuild(DogReport, ReportStat)
+        search.rebuild()
+        cache.invalidate(cache.REPORTS, cache.COMMENTS)
+
+    def insert_reports(self, batch):
+        if not self.use_copy:
+            DogReport.objects.bulk_create(batch)
+            return
+        # COPY can't return ids, so reserve a block of the sequence up front
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+                [DogReport._meta.db_table, len(batch)],
+            )
+            for report, (report_id,) in zip(batch, cursor.fetchall()):
+                report.id = report_id
+        self.copy(DogReport, ['id', 'user_id', 'latitude', 'longitude', 'geohash', 'location',
+                              'condition', 'description', 'image', 'image_variants', 'created_at', 'updated_at'],
+                  ((r.id, r.user_id, r.latitude, r.longitude, r.geohash, r.location, r.condition,
+                    r.description, '', '{}', r.created_at, r.updated_at) for r in batch))
+
+    def insert_statuses(self, batch):
+        statuses = []
+        for report in batch:
+            rescued = report.condition != 'Healthy' and self.rng.random() < 0.3
+            statuses.append(DogStatus(
+                dog_report_id=report.id,
+                vaccinated=self.rng.random() < 0.25,
+                rescued=rescued,
+                additional_notes="Taken to the shelter" if rescued else None,
+                updated_at=min(self.now, report.created_at + timedelta(hours=self.rng.randrange(1, 72))),
+            ))
+        if not self.use_copy:
+            DogStatus.objects.bulk_create(statuses)
+            return
+        self.copy(DogStatus, ['dog_report_id', 'vaccinated', 'rescued', 'additional_notes', 'updated_at'],
+                  ((s.dog_report_id, s.vaccinated, s.rescued, s.additional_notes, s.updated_at)
+                   for s in statuses))
+
+    def insert_comments(self, batch, user_ids, per_report):
+        comments = []
+        for report in batch:
+            # Geometric-ish distribution: most reports get 0-2 comments, a few get many
+            count = min(int(self.rng.expovariate(1 / per_report)), 50) if per_report else 0
+            for _ in range(count):
+                created_at = min(self.now, report.created_at + timedelta(minutes=self.rng.randrange(1, 10000)))
+                comments.append(Comment(
+                    dog_report_id=report.id,
+                    user_id=self.rng.choice(user_ids) if user_ids and self.rng.random() < 0.8 else None,
+                    text=self.rng.choice(COMMENTS),
+                    created_at=created_at,
+                    updated_at=created_at,
+                ))
+        if not self.use_copy:
+            Comment.objects.bulk_create(comments, batch_size=self.batch_size)
+            return
+        self.copy(Comment, ['dog_report_id', 'user_id', 'text', 'created_at', 'updated_at'],
+                  ((c.dog_report_id, c.user_id, c.text, c.created_at, c.updated_at) for c in comments))
+
+    def copy(self, model, columns, rows):
+        """Streams rows into a table with Postgres COPY ... FROM STDIN."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([r'\N' if value is None else value for value in row])
+        buffer.seek(0)
+        table = connection.ops.quote_name(model._meta.db_table)
+        column_list = ", ".join(connection.ops.quote_name(column) for column in columns)
+        with connection.cursor() as cursor:
+            cursor.cursor.copy_expert(
+                f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
@@ -1,6 +1,15 @@
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import models
+from django.urls import reverse
+from django.utils.http import urlencode
 from rest_framework import serializers
-from .models import DogReport, DogStatus, Comment
+from pawspotter_backend.metrics import span
+from . import events, media, uploads
+from .clusters import CONDITION_COUNT_FIELDS
+from .filters import BBoxField
+from .models import DogReport, DogStatus, Comment, ReportCluster
+from .pagination import KeysetPagination
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -22,31 +31,298 @@ class RegisterSerializer(serializers.ModelSerializer):
         return user
 
 
-class DogReportSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Limits the serialized fields to those listed in ?fields=a,b,c.
+    Unknown names are ignored; without the parameter every field is returned.
+    """
+    fields_query_param = 'fields'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = requested_fields(self.context.get('request'), self.fields_query_param)
+        if requested:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+
+class TimedRepresentationMixin:
+    """Reports the time spent building representations as the request's 'serialize' timing."""
+
+    def to_representation(self, instance):
+        with span('serialize'):
+            return super().to_representation(instance)
+
+
+def requested_fields(request, param='fields'):
+    """Returns the set of names listed in a comma separated GET parameter, if any."""
+    if request is None or request.method != 'GET':
+        return None
+    value = request.query_params.get(param)
+    if not value:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class ImageURLField(serializers.ImageField):
+    """ImageField whose URLs come from api.media: formatted for a CDN, cached when signed."""
+
+    def to_representation(self, value):
+        if not value or not getattr(self, 'use_url', True):
+            return super().to_representation(value)
+        with span('storage'):
+            url = media.url(value.storage, value.name)
+        request = self.context.get('request')
+        if request is not None and url.startswith('/'):
+            return request.build_absolute_uri(url)
+        return url
+
+
+class DogReportSerializer(TimedRepresentationMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.ImageField: ImageURLField,
+    }
+    thumbnails = serializers.SerializerMethodField()
+    # Token from /api/dogs/upload-url/, sent instead of a multipart `image`
+    image_key = serializers.CharField(write_only=True, required=False)
+
     class Meta:
         model = DogReport
-        fields = '__all__'
+        exclude = ['image_variants']  # Exposed as URLs through `thumbnails`
 
-    def get_image(self, obj):
-        if obj.image:
-            return obj.image.url
-        return None
+    def validate_image_key(self, value):
+        """Checks the token, that it wasn't used before and that the object was actually uploaded"""
+        try:
+            key = uploads.unsign_key(value)
+            if DogReport.objects.filter(image=key).exists():
+                raise uploads.UploadError(uploads.KEY_USED_MESSAGE)
+            return uploads.check_uploaded(key)
+        except uploads.UploadError as exc:
+            raise serializers.ValidationError(str(exc))
+
+    def validate(self, attrs):
+        image_key = attrs.pop('image_key', None)
+        if image_key:
+            if attrs.get('image'):
+                raise serializers.ValidationError("Send either image or image_key, not both.")
+            attrs['image'] = image_key  # Already stored, the model just records the name
+        return attrs
+
+    def get_thumbnails(self, obj):
+        """URLs of the processed variants by size and format, empty until processed"""
+        if not obj.image_variants:
+            return {}
+        storage = obj.image.storage
+        thumbnails = {}
+        with span('storage'):
+            for name, key in obj.image_variants.items():
+                size_name, extension = name.rsplit('_', 1)
+                thumbnails.setdefault(size_name, {})[extension] = media.url(storage, key)
+        return thumbnails
+
+
+class UploadRequestSerializer(serializers.Serializer):
+    """Validates a request for a direct-to-storage upload URL."""
+    filename = serializers.CharField(max_length=255)
+    content_type = serializers.RegexField(r'^image/[\w.+-]+$', max_length=100)
+
+    def validate_filename(self, value):
+        """Reserves the storage key the file will be uploaded to"""
+        try:
+            return uploads.new_key(value)
+        except uploads.UploadError as exc:
+            raise serializers.ValidationError(str(exc))
+
+
+class LocalUploadSerializer(serializers.Serializer):
+    """Multipart body posted to the local upload receiver."""
+    key = serializers.CharField()
+    policy = serializers.CharField()
+    file = serializers.FileField()
+
+
+# Columns of the compact "pins" list representation
+PIN_FIELDS = ('id', 'latitude', 'longitude', 'condition', 'created_at')
+
+
+def serialize_pins(rows):
+    """
+    Builds pin dicts straight from DogReport.values_list(*PIN_FIELDS, named=True)
+    rows, skipping model instantiation and per-field serializer dispatch.
+    """
+    created_at = serializers.DateTimeField()
+    rows = list(rows)  # Run the query outside the timed section
+    with span('serialize'):
+        return [
+            {
+                'id': row.id,
+                'latitude': row.latitude,
+                'longitude': row.longitude,
+                'condition': row.condition,
+                'created_at': created_at.to_representation(row.created_at),
+            }
+            for row in rows
+        ]
+
+
+class ClusterQuerySerializer(serializers.Serializer):
+    """Validates the ?bbox=&zoom= parameters of the clusters endpoint."""
+    bbox = serializers.CharField()
+    zoom = serializers.IntegerField(min_value=0, max_value=22)
+
+    def validate_bbox(self, value):
+        try:
+            return BBoxField().clean(value)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.messages)
 
 
-class DogStatusSerializer(serializers.ModelSerializer):
+class StatsQuerySerializer(serializers.Serializer):
+    """Validates the ?since=&until=&condition=&bbox=&regions= parameters of /api/stats/."""
+    since = serializers.DateField(required=False)
+    until = serializers.DateField(required=False)  # Inclusive
+    condition = serializers.CharField(required=False)  # Comma separated
+    bbox = serializers.CharField(required=False)
+    regions = serializers.IntegerField(min_value=0, max_value=500, default=50)
+
+    def validate_condition(self, value):
+        conditions = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = set(conditions) - set(CONDITION_COUNT_FIELDS)
+        if unknown:
+            raise serializers.ValidationError(f"Unknown condition: {', '.join(sorted(unknown))}.")
+        return conditions
+
+    def validate_bbox(self, value):
+        try:
+            return BBoxField().clean(value)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.messages)
+
+
+class EventStreamQuerySerializer(serializers.Serializer):
+    """Validates the ?types=&condition=&bbox= filters of the live event stream."""
+    types = serializers.CharField(required=False)  # Comma separated, e.g. report.created
+    condition = serializers.CharField(required=False)  # Comma separated
+    bbox = serializers.CharField(required=False)
+
+    def validate_types(self, value):
+        types = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = set(types) - set(events.EVENT_TYPES)
+        if unknown:
+            raise serializers.ValidationError(f"Unknown event type: {', '.join(sorted(unknown))}.")
+        return types
+
+    validate_condition = StatsQuerySerializer.validate_condition
+    validate_bbox = StatsQuerySerializer.validate_bbox
+
+
+class SyncQuerySerializer(serializers.Serializer):
+    """Validates the ?since=&limit= parameters of /api/sync/."""
+    since = serializers.CharField(required=False, allow_blank=True)  # sync_token of the previous call
+    limit = serializers.IntegerField(min_value=1, max_value=2000, default=500)  # Rows per kind
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    """Validates the ?q=&page=&page_size= parameters of the search endpoint."""
+    q = serializers.CharField(max_length=200)
+    page = serializers.IntegerField(min_value=1, default=1)
+    page_size = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+
+class ReportClusterSerializer(serializers.ModelSerializer):
+    latitude = serializers.SerializerMethodField()
+    longitude = serializers.SerializerMethodField()
+    conditions = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportCluster
+        fields = ['cell', 'latitude', 'longitude', 'count', 'conditions']
+
+    def get_latitude(self, obj):
+        """Centroid latitude of the reports in the cell"""
+        return obj.latitude_sum / obj.count
+
+    def get_longitude(self, obj):
+        """Centroid longitude of the reports in the cell"""
+        return obj.longitude_sum / obj.count
+
+    def get_conditions(self, obj):
+        """Report counts per condition"""
+        return {condition: getattr(obj, field) for condition, field in CONDITION_COUNT_FIELDS.items()}
+
+
+class DogStatusSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     class Meta:
         model = DogStatus
         fields = '__all__'
 
 
-class CommentSerializer(serializers.ModelSerializer):
+# DogStatus fields that the upsert and bulk update endpoints can change
+STATUS_CHANGE_FIELDS = ('vaccinated', 'rescued', 'additional_notes')
+
+
+class DogStatusChangeSerializer(serializers.Serializer):
+    """
+    One status change keyed on the dog report. Only the fields present are
+    changed. The report id is not looked up here; the views detect unknown
+    reports from the write itself.
+    """
+    dog_report = serializers.IntegerField(min_value=1)
+    vaccinated = serializers.BooleanField(required=False)
+    rescued = serializers.BooleanField(required=False)
+    additional_notes = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+
+class CommentSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     user = serializers.SerializerMethodField()
 
     class Meta:
         model = Comment
-        fields = ['id', 'dog_report', 'user', 'text', 'created_at']
-        read_only_fields = ['created_at', 'user']
+        fields = ['id', 'dog_report', 'user', 'text', 'created_at', 'updated_at']
+        read_only_fields = ['created_at', 'updated_at', 'user']
 
     def get_user(self, obj):
         """Return the username or 'Anonymous' if no user is attached"""
-        return obj.user.username if obj.user else "Anonymous"
\ No newline at end of file
+        return obj.user.username if obj.user else "Anonymous"
+
+# Related objects that can be embedded with ?expand=
+EXPANDABLE_FIELDS = {'status', 'comments'}
+
+
+class ExpandedDogReportSerializer(DogReportSerializer):
+    """
+    Dog report with its status and the first page of comments embedded.
+    Expects the view to select_related('status') and prefetch the comment page
+    into `comment_page`, so the whole payload costs a fixed number of queries.
+    """
+    status = DogStatusSerializer(read_only=True)
+    comments = serializers.SerializerMethodField()
+
+    class Meta(DogReportSerializer.Meta):
+        pass
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = self.context.get('expand', set())
+        for name in EXPANDABLE_FIELDS - expand:
+            self.fields.pop(name, None)
+
+    def get_comments(self, obj):
+        """First page of comments, newest first, with a cursor to the next page"""
+        page_size = self.context['comment_page_size']
+        page = obj.comment_page[:page_size]
+        next_link = None
+        request = self.context.get('request')
+        if len(obj.comment_page) > page_size and request is not None:
+            paginator = KeysetPagination()
+            query = urlencode({
+                'dog_report': obj.id,
+                paginator.page_size_query_param: page_size,
+                paginator.cursor_query_param: paginator.encode_cursor(page[-1].created_at, page[-1].id),
+            })
+            next_link = request.build_absolute_uri(f"{reverse('comments-list')}?{query}")
+        return {
+            'next': next_link,
+            'results': CommentSerializer(page, many=True, context=self.context).data,
+        }
@@ -1,8 +1,195 @@
-from django.db.models.signals import post_save
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from .models import DogReport, DogStatus
+from rest_framework.authtoken.models import Token
+from . import authentication, cache, clusters, events, images, search, stats, sync
+from .models import Comment, DogReport, DogStatus, Tombstone
 
 @receiver(post_save, sender=DogReport)
 def create_dog_status(sender, instance, created, **kwargs):
     if created:
         DogStatus.objects.create(dog_report=instance)
+
+
+@receiver(pre_save, sender=DogReport)
+def remember_previous_values(sender, instance, **kwargs):
+    """
+    Keeps the stored position/condition so updates can move the report between
+    clusters, and the stored image so a replaced image gets reprocessed.
+    """
+    instance._cluster_previous = None
+    instance._image_previous = None
+    if not instance._state.adding and instance.pk is not None:
+        previous = DogReport.objects.filter(pk=instance.pk).values_list(
+            'geohash', 'latitude', 'longitude', 'condition', 'image').first()
+        if previous:
+            instance._cluster_previous = previous[:4]
+            instance._image_previous = previous[4]
+
+
+@receiver(post_save, sender=DogReport)
+def update_report_clusters(sender, instance, created, **kwargs):
+    current = (instance.geohash, instance.latitude, instance.longitude, instance.condition)
+    previous = getattr(instance, '_cluster_previous', None)
+    if not created and previous == current:
+        return
+    if previous:
+        clusters.apply_report(*previous, sign=-1)
+    clusters.apply_report(*current)
+
+
+@receiver(post_save, sender=DogReport)
+def process_report_image(sender, instance, created, **kwargs):
+    """Generates thumbnails off the request path once the original is stored."""
+    if instance.image and (created or instance.image.name != getattr(instance, '_image_previous', None)):
+        images.enqueue(instance.id)
+
+
+@receiver(post_delete, sender=DogReport)
+def remove_from_report_clusters(sender, instance, **kwargs):
+    clusters.apply_report(instance.geohash, instance.latitude, instance.longitude,
+                          instance.condition, sign=-1)
+
+
+@receiver(post_save, sender=DogReport)
+def update_report_stats(sender, instance, created, **kwargs):
+    if created:
+        stats.apply_report(instance.created_at, instance.condition, instance.geohash)
+        return
+    previous = getattr(instance, '_cluster_previous', None)
+    if not previous:
+        return
+    old_key = stats.bucket(instance.created_at, previous[3], previous[0])
+    new_key = stats.bucket(instance.created_at, instance.condition, instance.geohash)
+    if old_key == new_key:
+        return
+    flags = DogStatus.objects.filter(dog_report=instance).values_list('rescued', 'vaccinated').first()
+    rescued, vaccinated = flags or (False, False)
+    deltas = {}
+    stats.add(deltas, old_key, count=-1, rescued=-rescued, vaccinated=-vaccinated)
+    stats.add(deltas, new_key, count=1, rescued=rescued, vaccinated=vaccinated)
+    stats.apply(deltas)
+
+
+@receiver(post_delete, sender=DogReport)
+def remove_from_report_stats(sender, instance, **kwargs):
+    # The status is deleted first and takes its rescued/vaccinated flags along
+    stats.apply_report(instance.created_at, instance.condition, instance.geohash, sign=-1)
+
+
+@receiver(pre_save, sender=DogStatus)
+def remember_previous_flags(sender, instance, **kwargs):
+    instance._flags_previous = (False, False)
+    if not instance._state.adding and instance.pk is not None:
+        instance._flags_previous = DogStatus.objects.filter(pk=instance.pk).values_list(
+            'rescued', 'vaccinated').first() or (False, False)
+
+
+@receiver(post_save, sender=DogStatus)
+def update_status_stats(sender, instance, **kwargs):
+    previous = getattr(instance, '_flags_previous', (False, False))
+    current = (instance.rescued, instance.vaccinated)
+    if previous == current:
+        return
+    report = DogReport.objects.filter(pk=instance.dog_report_id).values_list(
+        'created_at', 'condition', 'geohash').first()
+    if report:
+        stats.apply_status_change(*report, previous, current)
+
+
+@receiver(post_delete, sender=DogStatus)
+def remove_status_stats(sender, instance, **kwargs):
+    if not (instance.rescued or instance.vaccinated):
+        return
+    report = DogReport.objects.filter(pk=instance.dog_report_id).values_list(
+        'created_at', 'condition', 'geohash').first()
+    if report:
+        stats.apply_status_change(*report, (instance.rescued, instance.vaccinated), (False, False))
+
+
+@receiver(post_save, sender=DogReport)
+def index_report_text(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or {'location', 'description'} & set(update_fields):
+        search.index_reports([instance.pk])
+
+
+@receiver(post_delete, sender=DogReport)
+def remove_report_text(sender, instance, **kwargs):
+    search.remove_reports([instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def index_comment_text(sender, instance, **kwargs):
+    # Comments are part of their report's search document
+    search.index_reports([instance.dog_report_id])
+
+
+@receiver(post_save, sender=DogReport)
+def publish_report_created(sender, instance, created, **kwargs):
+    if created:
+        events.report_created(instance)
+
+
+@receiver(post_save, sender=DogStatus)
+def publish_status_updated(sender, instance, created, **kwargs):
+    # New statuses are the empty ones created along with their report
+    if created or not events.get_broker().active:
+        return
+    report = DogReport.objects.filter(pk=instance.dog_report_id).values_list(
+        'latitude', 'longitude', 'condition').first()
+    if report:
+        events.status_updated(instance, report)
+
+
+@receiver(post_save, sender=Comment)
+def publish_comment_created(sender, instance, created, **kwargs):
+    if not created or not events.get_broker().active:
+        return
+    report = DogReport.objects.filter(pk=instance.dog_report_id).values_list(
+        'latitude', 'longitude', 'condition').first()
+    if report:
+        events.comment_created(instance, report)
+
+
+@receiver(post_delete, sender=DogReport)
+def record_report_deletion(sender, instance, **kwargs):
+    sync.record_deletion(Tombstone.REPORT, instance.pk)
+
+
+@receiver(post_delete, sender=DogStatus)
+def record_status_deletion(sender, instance, **kwargs):
+    sync.record_deletion(Tombstone.STATUS, instance.pk)
+
+
+@receiver(post_delete, sender=Comment)
+def record_comment_deletion(sender, instance, **kwargs):
+    sync.record_deletion(Tombstone.COMMENT, instance.pk)
+
+
+@receiver(post_save, sender=DogReport)
+@receiver(post_delete, sender=DogReport)
+@receiver(post_save, sender=DogStatus)
+@receiver(post_delete, sender=DogStatus)
+def invalidate_report_responses(sender, **kwargs):
+    cache.invalidate(cache.REPORTS)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_responses(sender, **kwargs):
+    # Comments are embedded in expanded report responses too
+    cache.invalidate(cache.REPORTS, cache.COMMENTS)
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    authentication.invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user_tokens(sender, instance, **kwargs):
+    # Covers deactivation, password changes and deletion
+    authentication.invalidate_user(instance.pk)
@@ -0,0 +1,191 @@
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Substr, TruncDate
+from django.utils import timezone
+
+from . import geo
+
+# Geohash precision of the region buckets (~39km x 20km cells)
+STATS_PRECISION = 4
+
+# ReportStat counters, in the order deltas hold them
+COUNTERS = ('count', 'rescued_count', 'vaccinated_count')
+
+
+def bucket(created_at, condition, geohash):
+    """(day, condition, cell) rollup key of a report."""
+    return timezone.localdate(created_at), condition, geohash[:STATS_PRECISION]
+
+
+def add(deltas, key, count=0, rescued=0, vaccinated=0):
+    """Accumulates a change of the (count, rescued, vaccinated) counters of a bucket."""
+    delta = deltas.setdefault(key, [0, 0, 0])
+    delta[0] += count
+    delta[1] += rescued
+    delta[2] += vaccinated
+
+
+def apply(deltas):
+    """
+    Writes accumulated deltas. Growing buckets are merged with one upsert,
+    shrinking ones with plain UPDATEs (an INSERT could violate the positive
+    checks), and buckets left without reports are deleted.
+    """
+    from .models import ReportStat
+
+    grow, shrink = [], []
+    for key, delta in deltas.items():
+        if not any(delta):
+            continue
+        day, condition, cell = key
+        row = (connection.ops.adapt_datefield_value(day), condition, cell, *delta)
+        (shrink if min(delta) < 0 else grow).append(row)
+    if not grow and not shrink:
+        return
+
+    ops = connection.ops
+    table = ops.quote_name(ReportStat._meta.db_table)
+    keys = [ops.quote_name(column) for column in ('day', 'condition', 'cell')]
+    counters = [ops.quote_name(column) for column in COUNTERS]
+    with transaction.atomic(), connection.cursor() as cursor:
+        if grow:
+            increments = ", ".join(f"{column} = {table}.{column} + EXCLUDED.{column}" for column in counters)
+            cursor.executemany(
+                f"INSERT INTO {table} ({', '.join(keys + counters)}) VALUES ({', '.join(['%s'] * 6)}) "
+                f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {increments}",
+                grow,
+            )
+        if shrink:
+            increments = ", ".join(f"{column} = {column} + %s" for column in counters)
+            cursor.executemany(
+                f"UPDATE {table} SET {increments} WHERE {' AND '.join(f'{key} = %s' for key in keys)}",
+                [(*row[3:], *row[:3]) for row in shrink],
+            )
+            empty = Q()
+            for day, condition, cell, *_ in shrink:
+                empty |= Q(day=day, condition=condition, cell=cell)
+            ReportStat.objects.filter(empty, count=0).delete()
+
+
+def apply_report(created_at, condition, geohash, sign=1, rescued=False, vaccinated=False):
+    """Adds (sign=1) or removes (sign=-1) one report from its bucket."""
+    apply({bucket(created_at, condition, geohash): [sign, sign * rescued, sign * vaccinated]})
+
+
+def apply_reports(reports):
+    """Adds many new reports (bulk_create skips the signals); their statuses start out unset."""
+    deltas = {}
+    for report in reports:
+        add(deltas, bucket(report.created_at, report.condition, report.geohash), count=1)
+    apply(deltas)
+
+
+def apply_status_change(created_at, condition, geohash, previous, current):
+    """Folds a (rescued, vaccinated) change of one report's status into its bucket."""
+    rescued = int(current[0]) - int(previous[0])
+    vaccinated = int(current[1]) - int(previous[1])
+    if rescued or vaccinated:
+        apply({bucket(created_at, condition, geohash): [0, rescued, vaccinated]})
+
+
+def update_statuses(queryset, **changes):
+    """
+    queryset.update(**changes) on DogStatus rows, for bulk paths that skip the
+    signals. The flags being replaced are read first, with the rows locked
+    until commit, so the rollups get the exact deltas even when concurrent
+    writers change the same statuses.
+    """
+    with transaction.atomic():
+        rows = []
+        if 'rescued' in changes or 'vaccinated' in changes:
+            # Re-selected by pk: FOR UPDATE can't lock a DISTINCT queryset (admin searches)
+            locked = queryset.model.objects.filter(pk__in=queryset.values('pk')).select_for_update(of=('self',))
+            rows = list(locked.values_list(
+                'rescued', 'vaccinated', 'dog_report__created_at', 'dog_report__condition', 'dog_report__geohash'))
+        updated = queryset.update(**changes)
+
+        deltas = {}
+        for rescued, vaccinated, created_at, condition, geohash in rows:
+            add(deltas, bucket(created_at, condition, geohash),
+                rescued=int(changes.get('rescued', rescued)) - int(rescued),
+                vaccinated=int(changes.get('vaccinated', vaccinated)) - int(vaccinated))
+        apply(deltas)
+    return updated
+
+
+def rebuild(report_model, stat_model):
+    """
+    Recomputes every bucket with one GROUP BY over the reports and their
+    statuses. Takes the models as arguments so migrations can pass their
+    historical versions.
+    """
+    rows = (
+        report_model.objects
+        .annotate(day=TruncDate('created_at'), cell=Substr('geohash', 1, STATS_PRECISION))
+        .values('day', 'condition', 'cell')
+        .annotate(
+            count=Count('id'),
+            rescued_count=Count('id', filter=Q(status__rescued=True)),
+            vaccinated_count=Count('id', filter=Q(status__vaccinated=True)),
+        )
+        .order_by()
+    )
+    with transaction.atomic():
+        stat_model.objects.all().delete()
+        stat_model.objects.bulk_create((stat_model(**row) for row in rows.iterator()), batch_size=1000)
+
+
+def _totals(row):
+    count, rescued, vaccinated = row['reports'] or 0, row['rescued'] or 0, row['vaccinated'] or 0
+    return {
+        'count': count,
+        'rescued': rescued,
+        'vaccinated': vaccinated,
+        'rescue_rate': round(rescued / count, 4) if count else None,
+        'vaccination_rate': round(vaccinated / count, 4) if count else None,
+    }
+
+
+def summarize(since=None, until=None, conditions=None, bbox=None, regions=50):
+    """
+    Dashboard numbers read from the rollups only, so the cost grows with the
+    number of buckets (days x conditions x regions), never with reports.
+    A bbox selects whole regions, not exact coordinates.
+    """
+    from .models import ReportStat
+
+    queryset = ReportStat.objects.all()
+    if since:
+        queryset = queryset.filter(day__gte=since)
+    if until:
+        queryset = queryset.filter(day__lte=until)
+    if conditions:
+        queryset = queryset.filter(condition__in=conditions)
+    if bbox:
+        queryset = queryset.filter(geo.cell_filter(*bbox, field='cell', max_precision=STATS_PRECISION))
+
+    sums = {'reports': Sum('count'), 'rescued': Sum('rescued_count'), 'vaccinated': Sum('vaccinated_count')}
+    by_condition = {
+        row['condition']: _totals(row)
+        for row in queryset.values('condition').annotate(**sums).order_by('condition')
+    }
+    by_day = [
+        {'day': row['day'], **_totals(row)}
+        for row in queryset.values('day').annotate(**sums).order_by('day')
+    ]
+    by_region = []
+    for row in queryset.values('cell').annotate(**sums).order_by('-reports', 'cell')[:regions]:
+        latitude, longitude = geo.decode(row['cell']) if row['cell'] else (None, None)
+        by_region.append({'cell': row['cell'], 'latitude': latitude, 'longitude': longitude, **_totals(row)})
+
+    overall = {
+        'reports': sum(totals['count'] for totals in by_condition.values()),
+        'rescued': sum(totals['rescued'] for totals in by_condition.values()),
+        'vaccinated': sum(totals['vaccinated'] for totals in by_condition.values()),
+    }
+    return {
+        **_totals(overall),
+        'by_condition': by_condition,
+        'by_day': by_day,
+        'by_region': by_region,
+    }
@@ -0,0 +1,149 @@
+"""
+Delta sync for offline clients (/api/sync/).
+
+Each kind of row is read in (updated_at, id) order from its own index,
+resuming after the last row the client received. Deletions come from
+Tombstone rows in (deleted_at, id) order. The sync token carries one such
+cursor per kind, so a sync costs O(changes) however large the tables are.
+
+updated_at is stamped when a row is saved, not when its transaction
+commits, so a transaction still running when the client syncs may later
+commit rows older than rows already handed out. Each sync therefore stops
+at a horizon: SYNC_SETTLE_SECONDS ago, and on PostgreSQL no later than the
+start of the oldest transaction that has written anything. Elsewhere a
+transaction running longer than SYNC_SETTLE_SECONDS can still have its rows
+skipped.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Comment, DogReport, DogStatus, Tombstone
+
+_TOKEN_SALT = 'api.sync.token'
+
+# Token key -> (model, timestamp field)
+KINDS = {
+    'reports': (DogReport, 'updated_at'),
+    'statuses': (DogStatus, 'updated_at'),
+    'comments': (Comment, 'updated_at'),
+    'deleted': (Tombstone, 'deleted_at'),
+}
+
+TOMBSTONE_KINDS = {
+    Tombstone.REPORT: 'reports',
+    Tombstone.STATUS: 'statuses',
+    Tombstone.COMMENT: 'comments',
+}
+
+
+class SyncTokenError(ValueError):
+    pass
+
+
+class SyncTokenExpired(SyncTokenError):
+    pass
+
+
+def encode_token(cursors, issued_at):
+    return signing.dumps({
+        'issued': issued_at.isoformat(),
+        'cursors': {
+            kind: [cursor[0].isoformat(), cursor[1]] if cursor else None
+            for kind, cursor in cursors.items()
+        },
+    }, salt=_TOKEN_SALT, compress=True)
+
+
+def decode_token(token):
+    """Returns the per-kind cursors of a token, raising SyncTokenError if invalid or too old."""
+    try:
+        payload = signing.loads(token, salt=_TOKEN_SALT)
+        issued_at = datetime.fromisoformat(payload['issued'])
+        cursors = {
+            kind: (datetime.fromisoformat(cursor[0]), int(cursor[1])) if cursor else None
+            for kind, cursor in payload['cursors'].items()
+            if kind in KINDS
+        }
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise SyncTokenError("Invalid sync token.")
+    if issued_at < timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS):
+        # Deletions older than the retention period are gone
+        raise SyncTokenExpired("Sync token expired, download everything again.")
+    return cursors
+
+
+def _page(model, field, cursor, until, limit):
+    queryset = model.objects.filter(**{f"{field}__lt": until})
+    if model is Comment:
+        queryset = queryset.select_related('user')
+    if cursor is not None:
+        timestamp, pk = cursor
+        queryset = queryset.filter(
+            Q(**{f"{field}__gt": timestamp}) | Q(**{field: timestamp, 'id__gt': pk}),
+            **{f"{field}__gte": timestamp},  # Lets the planner range scan the index
+        )
+    rows = list(queryset.order_by(field, 'id')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        cursor = (getattr(rows[-1], field), rows[-1].id)
+    return rows, cursor, has_more
+
+
+def horizon():
+    """Rows stamped before this are committed, or belong to no running transaction."""
+    settled = timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    if connection.vendor != 'postgresql':
+        return settled
+    with connection.cursor() as cursor:
+        # backend_xid is only assigned once a transaction writes
+        cursor.execute(
+            "SELECT min(xact_start) FROM pg_stat_activity "
+            "WHERE datname = current_database() AND backend_xid IS NOT NULL AND pid <> pg_backend_pid()"
+        )
+        oldest = cursor.fetchone()[0]
+    return settled if oldest is None else min(settled, oldest)
+
+
+def changes(token=None, limit=500):
+    """
+    Rows changed after `token` (everything without one), at most `limit` of
+    each kind, plus the ids deleted since. Returns (changes, next token,
+    has_more); clients call again with the new token while has_more is set.
+    """
+    until = horizon()
+    if token:
+        cursors = decode_token(token)
+    else:
+        # A first sync has nothing to delete; start the tombstone feed now
+        cursors = {'deleted': (until, 0)}
+
+    result = {}
+    next_cursors = {}
+    has_more = False
+    for kind, (model, field) in KINDS.items():
+        rows, next_cursors[kind], more = _page(model, field, cursors.get(kind), until, limit)
+        result[kind] = rows
+        has_more = has_more or more
+
+    deleted = {name: [] for name in TOMBSTONE_KINDS.values()}
+    for tombstone in result['deleted']:
+        deleted[TOMBSTONE_KINDS[tombstone.kind]].append(tombstone.object_id)
+    result['deleted'] = deleted
+    return result, encode_token(next_cursors, until), has_more
+
+
+def record_deletion(kind, object_id):
+    Tombstone.objects.create(kind=kind, object_id=object_id)
+
+
+def prune_tombstones():
+    """Deletes tombstones past the retention period; tokens that old are rejected anyway."""
+    cutoff = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
@@ -1,10 +1,88 @@
+import csv
+import gzip
+import io
+import json
+import os
+import random
+import re
+import shutil
+import sqlite3
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+from urllib.parse import parse_qs, urlsplit
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
-from .models import DogReport, DogStatus, Comment
+from rest_framework.authtoken.models import Token
+from storages.backends.s3 import S3Storage
+from pawspotter_backend import db_router, metrics
+from .admin import EstimatedCountPaginator
+from . import authentication, cache, clusters, events, geo, geocoding, images, media, renderers, search, stats, sync
+from .models import DogReport, DogStatus, Comment, ImageJob, ReportCluster, ReportStat, Tombstone
 from .factories import UserFactory, DogReportFactory, DogStatusFactory, CommentFactory
 
 
+class AuthenticationTests(APITestCase):
+    """
+    Tests for login/logout and the cached token authentication.
+    """
+
+    def setUp(self):
+        """Log a user in through the API."""
+        authentication.token_cache.clear()
+        self.user = UserFactory(username="rescuer")
+        response = self.client.post("/api/login/", {"username": "rescuer", "password": "testpassword"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["user"]["username"], "rescuer")
+        self.token = response.data["token"]
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token}")
+
+    def test_token_lookup_is_cached(self):
+        """Ensure only the first authenticated request queries the token."""
+        with self.assertNumQueries(2):  # Token + user, then the status list
+            self.client.get("/api/status/")
+        with self.assertNumQueries(1):  # Just the status list
+            response = self.client.get("/api/status/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_logout_invalidates(self):
+        """Ensure a logged out token stops working immediately."""
+        self.client.get("/api/status/")
+        response = self.client.post("/api/logout/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post("/api/logout/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)  # Session auth comes first, so no 401
+
+    def test_deactivated_user_rejected(self):
+        """Ensure user changes drop cached identities."""
+        self.client.get("/api/status/")
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get("/api/status/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)  # Session auth comes first, so no 401
+
+    def test_cache_is_bounded(self):
+        """Ensure the least recently used entries are evicted."""
+        bounded = authentication.TTLCache(maxsize=2, ttl=60)
+        tokens = [Token(key=str(i), user=self.user) for i in range(3)]
+        for token in tokens:
+            bounded.set(token.key, token)
+        self.assertIsNone(bounded.get("0"))
+        self.assertEqual(bounded.get("2"), tokens[2])
+
+
 class DogReportTests(APITestCase):
     """
     Tests for dog reports using Factory Boy.
@@ -34,6 +112,1547 @@ class DogReportTests(APITestCase):
         self.assertGreaterEqual(len(response.data), 5)
 
 
+class DogReportSpatialTests(APITestCase):
+    """
+    Tests for the bbox and near/radius filters on dog reports.
+    """
+
+    def setUp(self):
+        """Reports in Denpasar, Ubud and Jakarta."""
+        self.denpasar = DogReportFactory(latitude=-8.6500, longitude=115.2167)
+        self.ubud = DogReportFactory(latitude=-8.5069, longitude=115.2625)
+        self.jakarta = DogReportFactory(latitude=-6.2088, longitude=106.8456)
+
+    def _ids(self, response):
+        return {item["id"] for item in response.data}
+
+    def test_geohash_maintained_on_save(self):
+        """Ensure the geohash column follows coordinate changes."""
+        self.assertEqual(self.denpasar.geohash, geo.encode(-8.65, 115.2167))
+        self.denpasar.latitude = -6.2088
+        self.denpasar.longitude = 106.8456
+        self.denpasar.save(update_fields=["latitude", "longitude"])
+        self.denpasar.refresh_from_db()
+        self.assertEqual(self.denpasar.geohash, self.jakarta.geohash)
+
+    def test_bbox_filter(self):
+        """Ensure only reports inside the bounding box are returned."""
+        response = self.client.get("/api/dogs/", {"bbox": "-8.7,115.1,-8.4,115.3"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._ids(response), {self.denpasar.id, self.ubud.id})
+
+    def test_near_filter(self):
+        """Ensure the radius is checked with exact haversine distance."""
+        # Ubud is ~16.6km from Denpasar
+        response = self.client.get("/api/dogs/", {"near": "-8.65,115.2167", "radius": 10})
+        self.assertEqual(self._ids(response), {self.denpasar.id})
+        response = self.client.get("/api/dogs/", {"near": "-8.65,115.2167", "radius": 20})
+        self.assertEqual(self._ids(response), {self.denpasar.id, self.ubud.id})
+
+    def test_invalid_spatial_params(self):
+        """Ensure malformed spatial filters are rejected."""
+        for params in ({"bbox": "1,2,3"}, {"bbox": "10,0,-10,5"}, {"near": "abc"},
+                       {"near": "0,0", "radius": 1000}):
+            response = self.client.get("/api/dogs/", params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class DogReportClusterTests(APITestCase):
+    """
+    Tests for the precomputed map clusters endpoint.
+    """
+
+    def setUp(self):
+        """Two reports in Denpasar and one in Ubud."""
+        self.first = DogReportFactory(latitude=-8.650, longitude=115.216, condition="Injured")
+        self.second = DogReportFactory(latitude=-8.652, longitude=115.218, condition="Healthy")
+        self.ubud = DogReportFactory(latitude=-8.507, longitude=115.263, condition="Lost")
+
+    def _clusters(self, zoom):
+        response = self.client.get("/api/dogs/clusters/", {"bbox": "-9,114,-8,116", "zoom": zoom})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["clusters"]
+
+    def test_rollups_follow_create_update_delete(self):
+        """Ensure rollups are maintained incrementally and match a rebuild."""
+        self.ubud.latitude = -8.651
+        self.ubud.longitude = 115.217
+        self.ubud.save()
+        self.second.delete()
+        incremental = set(ReportCluster.objects.values_list(
+            "cell", "count", "healthy_count", "injured_count", "lost_count"))
+        clusters.rebuild(DogReport, ReportCluster)
+        rebuilt = set(ReportCluster.objects.values_list(
+            "cell", "count", "healthy_count", "injured_count", "lost_count"))
+        self.assertEqual(incremental, rebuilt)
+
+    def test_clusters_by_zoom(self):
+        """Ensure zoomed out views merge nearby reports into one cluster."""
+        rows = self._clusters(zoom=5)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["count"], 3)
+        self.assertEqual(rows[0]["conditions"], {"Healthy": 1, "Injured": 1, "Lost": 1})
+
+        rows = sorted(self._clusters(zoom=12), key=lambda row: row["count"])
+        self.assertEqual([row["count"] for row in rows], [1, 2])
+        self.assertAlmostEqual(rows[1]["latitude"], -8.651)
+
+    def test_clusters_outside_bbox(self):
+        """Ensure clusters outside the viewport are not returned."""
+        response = self.client.get("/api/dogs/clusters/", {"bbox": "10,10,11,11", "zoom": 8})
+        self.assertEqual(response.data["clusters"], [])
+
+    def test_clusters_requires_params(self):
+        """Ensure bbox and zoom are validated."""
+        response = self.client.get("/api/dogs/clusters/", {"bbox": "oops"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class KeysetPaginationTests(APITestCase):
+    """
+    Tests for cursor pagination of report and comment listings.
+    """
+
+    def setUp(self):
+        """Seven reports, five of which share a timestamp to exercise the id tie-break."""
+        self.reports = DogReportFactory.create_batch(7)
+        DogReport.objects.filter(id__in=[r.id for r in self.reports[:5]]).update(
+            created_at="2025-03-01T00:00:00Z")
+
+    def _walk(self, url, params):
+        ids = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [item["id"] for item in response.data["results"]]
+            if not response.data["next"]:
+                return ids
+            response = self.client.get(response.data["next"])
+
+    def test_pages_cover_every_report_once(self):
+        """Ensure walking the cursors yields each report once, newest first."""
+        ids = self._walk("/api/dogs/", {"page_size": 2})
+        expected = list(DogReport.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_comment_pages(self):
+        """Ensure comment listings paginate per report."""
+        CommentFactory.create_batch(3, dog_report=self.reports[0])
+        CommentFactory(dog_report=self.reports[1])
+        ids = self._walk("/api/comments/", {"dog_report": self.reports[0].id, "page_size": 2})
+        self.assertEqual(len(ids), 3)
+
+    def test_legacy_bare_list(self):
+        """Ensure clients that don't paginate still get a bare list."""
+        response = self.client.get("/api/dogs/")
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 7)
+        cache.get_cache().clear()
+        with self.settings(LEGACY_BARE_LIST_RESPONSES=False):
+            response = self.client.get("/api/dogs/")
+        self.assertEqual(len(response.data["results"]), 7)
+
+    def test_invalid_cursor(self):
+        """Ensure a garbled cursor is rejected."""
+        response = self.client.get("/api/dogs/", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class DogReportRepresentationTests(APITestCase):
+    """
+    Tests for ?fields= sparse fieldsets and the compact pins mode.
+    """
+
+    def setUp(self):
+        """Set up test data using factories."""
+        self.reports = DogReportFactory.create_batch(3, description="Brown dog near the market")
+
+    def test_sparse_fields(self):
+        """Ensure only the requested fields are returned."""
+        response = self.client.get("/api/dogs/", {"fields": "id,condition,bogus"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data[0]), {"id", "condition"})
+
+        response = self.client.get(f"/api/dogs/{self.reports[0].id}/", {"fields": "description"})
+        self.assertEqual(response.data, {"description": "Brown dog near the market"})
+
+    def test_pins_mode(self):
+        """Ensure pins match the full serializer for their fields."""
+        full = self.client.get("/api/dogs/").data
+        pins = self.client.get("/api/dogs/", {"mode": "pins"}).data
+        self.assertEqual(
+            pins,
+            [{key: item[key] for key in ("id", "latitude", "longitude", "condition", "created_at")}
+             for item in full],
+        )
+
+    def test_pins_mode_paginates(self):
+        """Ensure pins can be paged with a cursor."""
+        response = self.client.get("/api/dogs/", {"mode": "pins", "page_size": 2})
+        self.assertEqual(len(response.data["results"]), 2)
+        response = self.client.get(response.data["next"])
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertIsNone(response.data["next"])
+
+
+class ExpandedDogReportTests(APITestCase):
+    """
+    Tests for ?expand=status,comments on the report detail view.
+    """
+
+    def setUp(self):
+        """Set up test data using factories."""
+        self.dog_report = DogReportFactory()
+        self.url = f"/api/dogs/{self.dog_report.id}/"
+
+    def test_expand_status_and_comments(self):
+        """Ensure the status and comments with usernames are embedded."""
+        user = UserFactory(username="rescuer")
+        CommentFactory(dog_report=self.dog_report, user=user, text="On my way")
+        CommentFactory(dog_report=self.dog_report, user=None)
+        response = self.client.get(self.url, {"expand": "status,comments"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"]["dog_report"], self.dog_report.id)
+        self.assertEqual({c["user"] for c in response.data["comments"]["results"]},
+                         {"rescuer", "Anonymous"})
+        self.assertIsNone(response.data["comments"]["next"])
+
+    def test_expand_query_count_is_constant(self):
+        """Ensure the expanded detail costs two queries however many comments exist."""
+        for count in (1, 30):
+            CommentFactory.create_batch(count, dog_report=self.dog_report)
+            with self.assertNumQueries(2):
+                response = self.client.get(self.url, {"expand": "status,comments"})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_expanded_comments_link_to_next_page(self):
+        """Ensure the embedded comment page links to the comments listing."""
+        CommentFactory.create_batch(25, dog_report=self.dog_report)
+        comments = self.client.get(self.url, {"expand": "comments"}).data["comments"]
+        self.assertEqual(len(comments["results"]), 20)
+        response = self.client.get(comments["next"])
+        self.assertEqual(len(response.data["results"]), 5)
+
+    def test_no_expand(self):
+        """Ensure the plain detail view is unchanged."""
+        response = self.client.get(self.url)
+        self.assertNotIn("status", response.data)
+        self.assertNotIn("comments", response.data)
+
+    def test_comment_list_query_count_is_constant(self):
+        """Ensure comment usernames don't trigger one query per comment."""
+        CommentFactory.create_batch(10, dog_report=self.dog_report)
+        with self.assertNumQueries(1):
+            self.client.get("/api/comments/", {"dog_report": self.dog_report.id})
+
+
+class ResponseCacheTests(APITestCase):
+    """
+    Tests for cached list/retrieve responses and ETag revalidation.
+    """
+
+    def setUp(self):
+        """Set up test data using factories."""
+        self.dog_report = DogReportFactory()
+        CommentFactory(dog_report=self.dog_report)
+
+    def test_repeat_get_served_from_cache(self):
+        """Ensure an unchanged poll runs no queries."""
+        first = self.client.get("/api/dogs/", {"condition": self.dog_report.condition})
+        with self.assertNumQueries(0):
+            second = self.client.get("/api/dogs/", {"condition": self.dog_report.condition})
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first["ETag"], second["ETag"])
+
+    def test_pins_are_cached(self):
+        """Ensure ?mode=pins polls are cached and revalidate with their own ETag."""
+        full = self.client.get("/api/dogs/")
+        first = self.client.get("/api/dogs/", {"mode": "pins"})
+        self.assertNotEqual(first["ETag"], full["ETag"])
+        with self.assertNumQueries(0):
+            second = self.client.get("/api/dogs/", {"mode": "pins"})
+            revalidated = self.client.get("/api/dogs/", {"mode": "pins"}, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(revalidated.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_if_none_match_returns_304(self):
+        """Ensure a matching ETag gets a 304 without a body."""
+        etag = self.client.get("/api/comments/", {"dog_report": self.dog_report.id})["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/comments/", {"dog_report": self.dog_report.id},
+                                       HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+    def test_writes_invalidate(self):
+        """Ensure report, status and comment writes change the cached responses."""
+        url = f"/api/dogs/{self.dog_report.id}/"
+        params = {"expand": "status,comments"}
+        etag = self.client.get(url, params)["ETag"]
+        for write in (
+            lambda: CommentFactory(dog_report=self.dog_report, text="Fed him"),
+            lambda: DogStatus.objects.get(dog_report=self.dog_report).save(),
+            lambda: DogReport.objects.get(id=self.dog_report.id).save(),
+        ):
+            write()
+            response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            etag = response["ETag"]
+        self.assertEqual(response.data["comments"]["results"][0]["text"], "Fed him")
+
+    def test_param_order_is_normalized(self):
+        """Ensure equivalent query strings share a cache entry."""
+        first = self.client.get("/api/dogs/?condition=Lost&user=1")
+        second = self.client.get("/api/dogs/?user=1&condition=Lost")
+        self.assertEqual(first["ETag"], second["ETag"])
+
+
+def make_photo(width=600, height=400, orientation=6):
+    """A JPEG with an EXIF orientation tag and a GPS block, like a phone photo."""
+    exif = Image.Exif()
+    exif[0x0112] = orientation  # Orientation: rotate 90 CW when displayed
+    exif[0x8825] = {2: (8.0, 39.0, 0.0)}  # GPSInfo latitude
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "brown").save(buffer, "JPEG", exif=exif)
+    return SimpleUploadedFile("photo.jpg", buffer.getvalue(), content_type="image/jpeg")
+
+
+class LocalMediaMixin:
+    """
+    Swaps S3 for a throwaway FileSystemStorage.
+    """
+
+    def setUp(self):
+        """Use a throwaway local storage instead of S3."""
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        storage_settings = override_settings(
+            DEFAULT_FILE_STORAGE="django.core.files.storage.FileSystemStorage",
+            MEDIA_ROOT=self.media_root,
+            MEDIA_URL="/media/",
+        )
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+
+
+class ImagePipelineTests(LocalMediaMixin, APITestCase):
+    """
+    Tests for off-request thumbnail generation.
+    """
+
+    def _upload(self):
+        data = {"latitude": -8.65, "longitude": 115.22, "condition": "Injured", "image": make_photo()}
+        return self.client.post("/api/dogs/", data, format="multipart")
+
+    @override_settings(IMAGE_PIPELINE_BACKEND="sync")
+    def test_variants_generated_after_commit(self):
+        """Ensure variants are oriented, stripped of EXIF and exposed as URLs."""
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self._upload()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["thumbnails"], {})  # Nothing done inside the request
+        for callback in callbacks:
+            callback()
+
+        report = DogReport.objects.get(id=response.data["id"])
+        self.assertEqual(set(report.image_variants),
+                         {f"{size}_{ext}" for size in images.VARIANT_SIZES for ext in ("jpg", "webp")})
+        with report.image.storage.open(report.image_variants["medium_webp"]) as variant:
+            image = Image.open(variant)
+            self.assertEqual(image.format, "WEBP")
+            self.assertEqual(image.size, (320, 480))  # Rotated portrait
+            self.assertEqual(len(image.getexif()), 0)
+
+        thumbnails = self.client.get(f"/api/dogs/{report.id}/").data["thumbnails"]
+        self.assertTrue(thumbnails["small"]["webp"].endswith("_small.webp"))
+
+    @override_settings(IMAGE_PIPELINE_BACKEND="sync")
+    def test_original_is_stripped_of_metadata(self):
+        """Ensure the served original loses its EXIF/GPS tags and is stored upright."""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self._upload()
+        report = DogReport.objects.get(id=response.data["id"])
+        with report.image.storage.open(report.image.name) as original:
+            image = Image.open(original)
+            self.assertEqual(image.format, "JPEG")
+            self.assertEqual(image.size, (400, 600))  # Rotated portrait
+            self.assertEqual(len(image.getexif()), 0)
+        served = self.client.get(f"/api/dogs/{report.id}/").data["image"]
+        self.assertTrue(served.endswith(report.image.name))
+        self.assertEqual(len(os.listdir(os.path.join(self.media_root, "dog_reports"))), 2)  # Old copy removed
+
+        images.process_report_image(report.id)  # Nothing left to strip
+        self.assertEqual(DogReport.objects.get(id=report.id).image.name, report.image.name)
+
+    @override_settings(IMAGE_PIPELINE_BACKEND="db")
+    def test_db_queue(self):
+        """Ensure the DB-backed queue records and processes jobs."""
+        response = self._upload()
+        job = ImageJob.objects.get(dog_report_id=response.data["id"])
+        self.assertEqual(job.status, ImageJob.PENDING)
+        self.assertEqual(images.run_pending_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImageJob.DONE)
+        self.assertEqual(len(DogReport.objects.get(id=job.dog_report_id).image_variants), 6)
+
+
+class DirectUploadTests(LocalMediaMixin, APITestCase):
+    """
+    Tests for presigned uploads that bypass the API workers.
+    """
+
+    def _upload_url(self, filename="photo.jpg"):
+        return self.client.post("/api/dogs/upload-url/",
+                                {"filename": filename, "content_type": "image/jpeg"}, format="json")
+
+    def test_local_presigned_flow(self):
+        """Ensure a report can be created from an uploaded key."""
+        response = self._upload_url()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        upload = response.data["upload"]
+        self.assertEqual(
+            self.client.post(upload["url"], {**upload["fields"], "file": make_photo()}).status_code,
+            status.HTTP_204_NO_CONTENT)
+
+        response = self.client.post("/api/dogs/", {
+            "latitude": -8.65, "longitude": 115.22, "condition": "Lost",
+            "image_key": response.data["image_key"],
+        }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        report = DogReport.objects.get(id=response.data["id"])
+        self.assertEqual(report.image.name, upload["fields"]["key"])
+
+    def test_key_must_be_uploaded_and_signed(self):
+        """Ensure missing objects and forged keys are rejected."""
+        token = self._upload_url().data["image_key"]
+        for image_key in (token, "dog_reports/" + "0" * 32 + ".jpg"):
+            response = self.client.post("/api/dogs/", {
+                "latitude": -8.65, "longitude": 115.22, "condition": "Lost", "image_key": image_key,
+            }, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("image_key", response.data)
+
+    def test_key_backs_one_report(self):
+        """Ensure an image_key can't be reused, alone or twice in one bulk request."""
+        response = self._upload_url()
+        upload = response.data["upload"]
+        self.client.post(upload["url"], {**upload["fields"], "file": make_photo()})
+        report = {"latitude": -8.65, "longitude": 115.22, "condition": "Lost",
+                  "image_key": response.data["image_key"]}
+
+        response = self.client.post("/api/dogs/bulk/", [report, report], format="json")
+        self.assertEqual(len(response.data["created"]), 1)
+        self.assertEqual(response.data["errors"][0]["index"], 1)
+        for path, data in (("/api/dogs/", report), ("/api/dogs/bulk/", [report])):
+            response = self.client.post(path, data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(DogReport.objects.filter(image=upload["fields"]["key"]).count(), 1)
+
+    def test_rejects_tampered_policy_and_bad_types(self):
+        """Ensure the local receiver checks the policy and only images are accepted."""
+        upload = self._upload_url().data["upload"]
+        fields = {**upload["fields"], "key": "dog_reports/" + "1" * 32 + ".jpg"}
+        response = self.client.post(upload["url"], {**fields, "file": make_photo()})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        for filename in ("script.exe", "photo.heic"):
+            self.assertEqual(self._upload_url(filename).status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(
+        DEFAULT_FILE_STORAGE="storages.backends.s3boto3.S3Boto3Storage",
+        AWS_STORAGE_BUCKET_NAME="pawspotter-test",
+        AWS_ACCESS_KEY_ID="test",
+        AWS_SECRET_ACCESS_KEY="test",
+    )
+    def test_s3_presigned_post(self):
+        """Ensure S3 storage hands out a bucket POST with size and type conditions."""
+        response = self._upload_url()
+        upload = response.data["upload"]
+        self.assertIn("pawspotter-test", upload["url"])
+        self.assertEqual(upload["fields"]["Content-Type"], "image/jpeg")
+        self.assertIn("policy", upload["fields"])
+
+
+class BulkReportTests(APITestCase):
+    """
+    Tests for bulk report ingestion.
+    """
+
+    def setUp(self):
+        """Set up test data using factories."""
+        self.user = UserFactory()
+        DogReportFactory(latitude=-8.65, longitude=115.22, condition="Lost")
+
+    def test_bulk_create(self):
+        """Ensure valid items are created with statuses and invalid ones reported."""
+        self.client.force_authenticate(user=self.user)
+        items = [
+            {"latitude": -8.65 + i / 100, "longitude": 115.22, "condition": "Injured"}
+            for i in range(5)
+        ]
+        items.insert(2, {"latitude": "north", "longitude": 115.22, "condition": "Injured"})
+        response = self.client.post("/api/dogs/bulk/", items, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["created"]), 5)
+        self.assertEqual([error["index"] for error in response.data["errors"]], [2])
+        self.assertIn("latitude", response.data["errors"][0]["errors"])
+
+        created = DogReport.objects.filter(id__in=response.data["created"])
+        self.assertEqual(created.filter(user=self.user).count(), 5)
+        self.assertEqual(DogStatus.objects.filter(dog_report__in=created).count(), 5)
+        self.assertTrue(all(report.geohash for report in created))
+
+    def test_bulk_create_updates_clusters(self):
+        """Ensure rollups include bulk inserted reports."""
+        items = [{"latitude": -8.6 - i / 50, "longitude": 115.1 + i / 40, "condition": "Healthy"}
+                 for i in range(20)]
+        self.client.post("/api/dogs/bulk/", items, format="json")
+        incremental = set(ReportCluster.objects.values_list("cell", "count", "healthy_count", "lost_count"))
+        clusters.rebuild(DogReport, ReportCluster)
+        self.assertEqual(incremental,
+                         set(ReportCluster.objects.values_list("cell", "count", "healthy_count", "lost_count")))
+
+    def test_bulk_rejects_bad_payloads(self):
+        """Ensure non-arrays and all-invalid payloads are rejected."""
+        for payload in ({"latitude": 1}, [], [{"condition": "Unknown"}]):
+            response = self.client.post("/api/dogs/bulk/", payload, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class QueryPlanMixin:
+    """
+    Captures the SQL a request runs and checks its EXPLAIN output.
+    On Postgres sequential scans are disabled for the check, so the tiny test
+    tables don't hide a missing index behind a cheaper seq scan.
+    """
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute("EXPLAIN " + sql)
+            else:
+                cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            return "\n".join(str(row[-1]) for row in cursor.fetchall())
+
+    def captured_plan(self, path, params, table):
+        """Plan of the last SELECT on `table` made while serving the request."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        selects = [query["sql"] for query in queries
+                   if query["sql"].startswith("SELECT") and f'FROM "{table}"' in query["sql"]]
+        self.assertTrue(selects, f"No SELECT on {table} for {params}")
+        return self.explain(selects[-1])
+
+    def assertUsesIndex(self, path, params, table):
+        plan = self.captured_plan(path, params, table)
+        full_scan = rf"SCAN {table}$|SCAN {table} \(|SCAN TABLE {table}$|Seq Scan on {table}"
+        self.assertNotRegex(plan, re.compile(full_scan, re.MULTILINE), plan)
+        self.assertRegex(plan, r"USING (COVERING )?INDEX|Index (Only )?Scan|Bitmap Index Scan", plan)
+
+
+class DogReportRangeFilterTests(QueryPlanMixin, APITestCase):
+    """
+    Tests for created_at ranges, condition__in and the indexes behind them.
+    """
+
+    def setUp(self):
+        """Reports created on three different days."""
+        self.user = UserFactory()
+        self.reports = []
+        for day, condition in ((1, "Healthy"), (2, "Injured"), (3, "Lost")):
+            report = DogReportFactory(user=self.user, condition=condition)
+            DogReport.objects.filter(id=report.id).update(created_at=f"2025-03-0{day}T12:00:00Z")
+            self.reports.append(report)
+
+    def _ids(self, params):
+        response = self.client.get("/api/dogs/", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {item["id"] for item in response.data}
+
+    def test_created_range(self):
+        """Ensure created_after is inclusive and created_before exclusive."""
+        ids = self._ids({"created_after": "2025-03-02T12:00:00Z", "created_before": "2025-03-03T12:00:00Z"})
+        self.assertEqual(ids, {self.reports[1].id})
+
+    def test_condition_in(self):
+        """Ensure several conditions can be requested at once."""
+        self.assertEqual(self._ids({"condition__in": "Healthy,Lost"}),
+                         {self.reports[0].id, self.reports[2].id})
+
+    def test_hot_list_queries_use_indexes(self):
+        """Ensure the common list queries are index scans, not full table scans."""
+        next_link = self.client.get("/api/dogs/", {"page_size": 1}).data["next"]
+        cursor = parse_qs(urlsplit(next_link).query)["cursor"][0]
+        for params in (
+            {"page_size": 50},
+            {"page_size": 50, "cursor": cursor},
+            {"page_size": 50, "condition": "Injured"},
+            {"page_size": 50, "user": self.user.id},
+            {"page_size": 50, "created_after": "2025-03-02T00:00:00Z"},
+            {"page_size": 50, "condition": "Lost", "created_before": "2025-03-03T00:00:00Z"},
+            {"page_size": 50, "bbox": "-8.7,115.1,-8.6,115.3"},
+        ):
+            with self.subTest(params=params):
+                self.assertUsesIndex("/api/dogs/", params, "api_dogreport")
+
+    def test_comment_queries_use_indexes(self):
+        """Ensure per-report comment pages use the comment index."""
+        self.assertUsesIndex("/api/comments/", {"dog_report": self.reports[0].id, "page_size": 20},
+                             "api_comment")
+
+
+class ExportTests(APITestCase):
+    """
+    Tests for the streaming report export.
+    """
+
+    def setUp(self):
+        """Set up test data using factories."""
+        self.reports = DogReportFactory.create_batch(3, condition="Injured", description="Limping, hungry")
+        DogReportFactory(condition="Healthy")
+        DogStatus.objects.filter(dog_report=self.reports[0]).update(vaccinated=True)
+
+    def _get(self, params, **headers):
+        response = self.client.get("/api/dogs/export/", params, **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content)
+
+    def test_ndjson_with_filters(self):
+        """Ensure filtered reports stream as NDJSON with status fields."""
+        with self.assertNumQueries(1):
+            response, body = self._get({"condition": "Injured"})
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([row["id"] for row in rows], [report.id for report in self.reports])
+        self.assertTrue(rows[0]["vaccinated"])
+        self.assertEqual(rows[1]["description"], "Limping, hungry")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+
+    def test_csv(self):
+        """Ensure CSV output has a header and quotes text."""
+        _, body = self._get({"output": "csv"})
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]["description"], "Limping, hungry")
+
+    def test_gzip(self):
+        """Ensure the stream is gzipped when the client accepts it."""
+        response, body = self._get({}, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(len(gzip.decompress(body).splitlines()), 4)
+
+    def test_unknown_output(self):
+        """Ensure unsupported formats are rejected."""
+        response = self.client.get("/api/dogs/export/", {"output": "xml"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SeedDataTests(APITestCase):
+    """
+    Tests for the seed_data command and the benchmark commands.
+    """
+
+    def test_seed_data_creates_related_rows_and_rollups(self):
+        """Ensure seeding creates users, statuses, comments and cluster rollups."""
+        call_command("seed_data", reports=30, users=3, comments_per_report=2, stdout=io.StringIO())
+
+        self.assertEqual(DogReport.objects.count(), 30)
+        self.assertEqual(DogStatus.objects.count(), 30)
+        self.assertEqual(User.objects.filter(username__startswith="seed_user_").count(), 3)
+        self.assertTrue(Comment.objects.exists())
+        self.assertFalse(DogReport.objects.filter(geohash="").exists())
+        self.assertGreater(DogReport.objects.dates("created_at", "day").count(), 1)  # Timestamps are spread out
+        total = sum(ReportCluster.objects.filter(precision=1).values_list("count", flat=True))
+        self.assertEqual(total, 30)
+
+    def test_benchmark_api_reports_latency_percentiles(self):
+        """Ensure every benchmarked endpoint answers and reports its percentiles."""
+        output = io.StringIO()
+        call_command("benchmark_api", sizes="10", repeat=2, stdout=output, stderr=io.StringIO())
+
+        report = json.loads(output.getvalue())
+        endpoints = {result["endpoint"] for result in report["results"]}
+        self.assertLessEqual({"reports_page", "statuses_full_dump", "status_detail"}, endpoints)
+        for result in report["results"]:
+            self.assertEqual(result["status"], 200, result["endpoint"])
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"])
+            self.assertGreater(result["bytes"], 0)
+
+    def test_benchmark_commands_seed_through_the_seeder(self):
+        """Ensure the list mode, spatial and ingestion benchmarks run and report every case."""
+        for command, options, cases in (
+            ("benchmark_list_modes", {"rows": 10, "repeat": 2}, 3),
+            ("benchmark_spatial", {"rows": 10, "repeat": 2}, 4),
+            ("benchmark_bulk_ingest", {"rows": 4, "batch": 2}, 2),
+        ):
+            output = io.StringIO()
+            call_command(command, **options, stdout=output, stderr=io.StringIO())
+            self.assertEqual(len(json.loads(output.getvalue())["results"]), cases, command)
+        self.assertTrue(User.objects.filter(username__startswith="seed_user_").exists())
+        self.assertEqual(DogReport.objects.count(), 10 + 4 * 2)
+
+
+class RequestMetricsTests(APITestCase):
+    """
+    Tests for Server-Timing headers, the /metrics endpoint and the slow request log.
+    """
+
+    def setUp(self):
+        """Set up test data using factories and start from empty histograms."""
+        DogReportFactory.create_batch(3)
+        for histogram in metrics.HISTOGRAMS:
+            histogram.clear()
+
+    def test_server_timing_header_breaks_down_the_request(self):
+        """Ensure responses report database, serialization and total time."""
+        response = self.client.get("/api/dogs/", {"page_size": 10})
+
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertRegex(timing, r"serialize;dur=[\d.]+")
+        self.assertRegex(timing, r"total;dur=[\d.]+")
+
+    def test_metrics_endpoint_exposes_per_route_histograms(self):
+        """Ensure /metrics exposes request histograms labelled by route."""
+        self.client.get("/api/dogs/", {"page_size": 10})
+        self.client.get("/api/dogs/", {"page_size": 10})
+
+        self.client.force_login(UserFactory(is_staff=True))
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn("# TYPE pawspotter_request_duration_seconds histogram", body)
+        self.assertIn(
+            'pawspotter_request_duration_seconds_count{route="dogreport-list",method="GET",status="200"} 2', body)
+        self.assertIn('pawspotter_request_db_queries_bucket{route="dogreport-list",method="GET",status="200",le="+Inf"} 2', body)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_endpoint_requires_staff_or_the_token(self):
+        """Ensure /metrics is only served to staff users and bearers of the configured token."""
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret").status_code, 200)
+
+        self.client.force_login(UserFactory())
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.client.force_login(UserFactory(is_staff=True))
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    def test_metrics_endpoint_public_only_when_opted_in(self):
+        """Ensure anonymous requests need METRICS_PUBLIC, which is off by default."""
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        with override_settings(METRICS_PUBLIC=True):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0)
+    def test_slow_requests_are_logged_with_their_sql(self):
+        """Ensure slow requests are logged together with their queries."""
+        with self.assertLogs("pawspotter.slow_requests", "WARNING") as logs:
+            self.client.get("/api/dogs/", {"page_size": 10})
+
+        self.assertIn("GET /api/dogs/?page_size=10 -> 200", logs.output[0])
+        self.assertIn('FROM "api_dogreport"', logs.output[0])
+
+
+class DogReportSearchTests(APITestCase):
+    """
+    Tests for full-text search over report descriptions, locations and comments.
+    """
+
+    url = "/api/dogs/search/"
+
+    def setUp(self):
+        """Reports at a market, a beach and a temple."""
+        self.market = DogReportFactory(location="Ubud market",
+                                       description="Brown dog limping, seems friendly")
+        self.beach = DogReportFactory(location="Kuta beach", description="Brown puppy sleeping")
+        self.temple = DogReportFactory(location="Temple", description="Black dog with a collar")
+
+    def ids(self, response):
+        return [report["id"] for report in response.data["results"]]
+
+    def test_ranks_reports_matching_more_words_first(self):
+        """Ensure reports matching more of the query words rank higher."""
+        response = self.client.get(self.url, {"q": "limping brown dog near market"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = self.ids(response)
+        self.assertEqual(ids[0], self.market.id)
+        self.assertEqual(set(ids), {self.market.id, self.beach.id, self.temple.id})
+
+    def test_stems_words(self):
+        """Ensure word forms match their stem."""
+        response = self.client.get(self.url, {"q": "limps"})
+        self.assertEqual(self.ids(response), [self.market.id])
+
+    def test_index_follows_report_and_comment_changes(self):
+        """Ensure edits and deletions of reports and comments reach the index."""
+        self.beach.description = "Grey puppy"
+        self.beach.save()
+        comment = CommentFactory(dog_report=self.temple, text="Saw it limping today")
+
+        self.assertEqual(self.ids(self.client.get(self.url, {"q": "grey"})), [self.beach.id])
+        self.assertEqual(set(self.ids(self.client.get(self.url, {"q": "limping"}))),
+                         {self.market.id, self.temple.id})
+
+        comment.delete()
+        self.market.delete()
+        self.assertEqual(self.ids(self.client.get(self.url, {"q": "limping"})), [])
+
+    def test_bulk_created_reports_are_indexed(self):
+        """Ensure bulk ingested reports are searchable."""
+        self.client.post("/api/dogs/bulk/", [
+            {"latitude": -8.5, "longitude": 115.2, "condition": "Lost", "description": "Spotted dalmatian"},
+        ], format="json")
+        self.assertEqual(len(self.ids(self.client.get(self.url, {"q": "dalmatian"}))), 1)
+
+    def test_paginates_results(self):
+        """Ensure results are paged without repeating reports."""
+        response = self.client.get(self.url, {"q": "dog brown", "page_size": 2})
+        self.assertEqual(len(response.data["results"]), 2)
+        second = self.client.get(response.data["next"])
+        self.assertEqual(len(second.data["results"]), 1)
+        self.assertIsNone(second.data["next"])
+        self.assertFalse(set(self.ids(response)) & set(self.ids(second)))
+
+    def test_query_operators_are_treated_as_words(self):
+        """Ensure query syntax in the search text can't break the query."""
+        response = self.client.get(self.url, {"q": 'brown" OR NOT (*'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_requires_query(self):
+        """Ensure a search without ?q= is rejected."""
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rebuild_matches_incremental_index(self):
+        """Ensure rebuilding the index gives the same results."""
+        search.rebuild()
+        self.assertEqual(self.ids(self.client.get(self.url, {"q": "collar"})), [self.temple.id])
+
+
+class AdminScalingTests(TestCase):
+    """
+    Tests for admin changelists and actions on large tables.
+    """
+
+    def setUp(self):
+        """Log in as a superuser."""
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "password")
+        self.client.force_login(self.admin)
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelists_do_not_query_per_row(self):
+        """Ensure changelist query counts don't grow with the rows shown."""
+        for report in DogReportFactory.create_batch(2, user=UserFactory()):
+            CommentFactory(dog_report=report, user=UserFactory())
+        urls = ["/admin/api/dogreport/", "/admin/api/dogstatus/", "/admin/api/comment/"]
+        few = [self.changelist_queries(url) for url in urls]
+
+        for report in DogReportFactory.create_batch(8, user=UserFactory()):
+            CommentFactory(dog_report=report, user=UserFactory())
+        self.assertEqual([self.changelist_queries(url) for url in urls], few)
+
+    def test_str_does_not_load_the_report(self):
+        """Ensure status and comment labels don't fetch their report."""
+        report = DogReportFactory()
+        status_obj = DogStatus.objects.get(dog_report=report)
+        comment = Comment.objects.get(pk=CommentFactory(dog_report=report, user=None).pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(str(status_obj), f"Status for DogReport {report.id}")
+            self.assertEqual(str(comment), f"Comment by Anonymous on Report {report.id}")
+
+    def test_bulk_status_action_runs_one_update(self):
+        """Ensure the mark rescued action updates all selected statuses at once."""
+        reports = DogReportFactory.create_batch(3)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/admin/api/dogreport/", {
+                "action": "mark_rescued",
+                "_selected_action": [report.pk for report in reports[:2]],
+            })
+        self.assertEqual(response.status_code, 302)
+        updates = [query for query in queries if query["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(
+            set(DogStatus.objects.filter(rescued=True).values_list("dog_report_id", flat=True)),
+            {reports[0].pk, reports[1].pk},
+        )
+
+    def test_paginator_counts_exactly_without_estimates(self):
+        """Ensure the paginator falls back to an exact count without a planner estimate."""
+        DogReportFactory.create_batch(3)
+        paginator = EstimatedCountPaginator(DogReport.objects.order_by("-id"), 2)
+        self.assertIsNone(paginator.estimated_count())  # Only Postgres keeps reltuples
+        self.assertEqual(paginator.count, 3)
+
+
+class StatsTests(APITestCase):
+    """
+    Tests for the dashboard statistics and their ReportStat rollups.
+    """
+
+    url = "/api/stats/"
+
+    def setUp(self):
+        """Three reports in Bali and one in Jakarta."""
+        self.bali = DogReportFactory.create_batch(3, latitude=-8.65, longitude=115.22)  # Healthy, Injured, Lost
+        self.jakarta = DogReportFactory(latitude=-6.2, longitude=106.85, condition="Injured")
+
+    def rollups(self):
+        return set(ReportStat.objects.values_list("day", "condition", "cell", "count",
+                                                  "rescued_count", "vaccinated_count"))
+
+    def assertRollupsMatchRebuild(self):
+        """Incrementally maintained rollups equal a rebuild from scratch."""
+        incremental = self.rollups()
+        stats.rebuild(DogReport, ReportStat)
+        self.assertEqual(incremental, self.rollups())
+
+    def test_rollups_follow_every_write_path(self):
+        """Ensure status, bulk, edit and delete paths keep the rollups exact."""
+        self.client.patch(f"/api/status/{self.bali[0].status.id}/", {"rescued": True}, format="json")
+        self.client.post("/api/status/upsert/", {"dog_report": self.bali[1].id, "vaccinated": True}, format="json")
+        self.client.patch("/api/status/bulk/", [
+            {"dog_report": self.bali[2].id, "rescued": True, "vaccinated": True},
+            {"dog_report": self.bali[1].id, "vaccinated": False},
+        ], format="json")
+        self.client.post("/api/dogs/bulk/", [
+            {"latitude": -8.6, "longitude": 115.2, "condition": "Lost"},
+        ], format="json")
+        self.assertRollupsMatchRebuild()
+
+        self.jakarta.condition = "Healthy"
+        self.jakarta.latitude = -8.65
+        self.jakarta.longitude = 115.22
+        self.jakarta.save()
+        self.bali[2].delete()
+        self.assertRollupsMatchRebuild()
+
+    def test_summary(self):
+        """Ensure the summary totals, rates and breakdowns come from a fixed number of queries."""
+        self.client.patch("/api/status/bulk/", [
+            {"dog_report": self.bali[0].id, "rescued": True},
+            {"dog_report": self.jakarta.id, "vaccinated": True},
+        ], format="json")
+
+        with self.assertNumQueries(3):
+            data = self.client.get(self.url).data
+        self.assertEqual(data["count"], 4)
+        self.assertEqual(data["rescue_rate"], 0.25)
+        self.assertEqual(data["by_condition"]["Injured"]["count"], 2)
+        self.assertEqual(data["by_condition"]["Injured"]["vaccinated"], 1)
+        self.assertEqual(sum(day["count"] for day in data["by_day"]), 4)
+        self.assertEqual([region["count"] for region in data["by_region"]], [3, 1])
+        self.assertEqual(data["by_region"][0]["cell"], geo.encode(-8.65, 115.22, stats.STATS_PRECISION))
+
+    def test_filters(self):
+        """Ensure bbox, condition and date filters narrow the summary."""
+        bali = self.client.get(self.url, {"bbox": "-9,114.5,-8,116", "condition": "Injured,Lost"}).data
+        self.assertEqual(bali["count"], 2)
+        day = self.jakarta.created_at.date()
+        data = self.client.get(self.url, {"since": day, "until": day}).data
+        self.assertEqual([row["day"] for row in data["by_day"]], [day])
+
+    def test_rejects_unknown_condition(self):
+        """Ensure unknown conditions are rejected."""
+        response = self.client.get(self.url, {"condition": "Sleepy"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CollectingSubscriber(events.EventFilter):
+    """
+    Event subscriber that keeps what it receives, for assertions.
+    """
+
+    def __init__(self, **filters):
+        super().__init__(**filters)
+        self.events = []
+
+    def deliver(self, event):
+        self.events.append(event)
+
+
+class EventStreamTests(APITestCase):
+    """
+    Tests for report events and the /api/events/ server-sent event stream.
+    """
+
+    def setUp(self):
+        """Use the process-wide event broker."""
+        self.broker = events.get_broker()
+
+    def subscribe(self, **filters):
+        """A collecting subscriber, unsubscribed after the test."""
+        subscriber = CollectingSubscriber(**filters)
+        self.broker.subscribe(subscriber)
+        self.addCleanup(self.broker.unsubscribe, subscriber)
+        return subscriber
+
+    def event(self, condition="Injured", latitude=-8.65, longitude=115.22):
+        return {"type": events.REPORT_CREATED, "latitude": latitude, "longitude": longitude,
+                "condition": condition, "data": {"condition": condition}}
+
+    def test_writes_publish_events_after_commit(self):
+        """Ensure report, comment and status writes publish events once committed."""
+        subscriber = self.subscribe()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/dogs/", {
+                "latitude": -8.65, "longitude": 115.22, "condition": "Lost"}, format="json")
+            report_id = response.data["id"]
+            self.assertEqual(subscriber.events, [])  # Nothing before the commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/comments/", {"dog_report": report_id, "text": "Seen again"}, format="json")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch("/api/status/bulk/", [{"dog_report": report_id, "rescued": True}], format="json")
+
+        self.assertEqual([event["type"] for event in subscriber.events],
+                         [events.REPORT_CREATED, events.COMMENT_CREATED, events.STATUS_UPDATED])
+        self.assertEqual(subscriber.events[0]["data"]["id"], report_id)
+        self.assertTrue(subscriber.events[2]["data"]["rescued"])
+
+    def test_filters_by_condition_and_bbox(self):
+        """Ensure subscribers only get events matching their filters."""
+        subscriber = self.subscribe(conditions=["Injured"], bbox=(-9, 115, -8, 116))
+        self.broker.publish(self.event("Healthy"))
+        self.broker.publish(self.event("Injured", latitude=-6.2, longitude=106.8))
+        self.broker.publish(self.event("Injured"))
+        self.assertEqual(len(subscriber.events), 1)
+
+    async def test_streams_matching_events_as_sse(self):
+        """Ensure the stream sends matching events in SSE format."""
+        response = await self.async_client.get("/api/events/", {"condition": "Injured"})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b"retry: 3000\n\n")
+
+        self.broker.publish(self.event("Healthy"))
+        self.broker.publish(self.event("Injured"))
+        chunk = (await anext(stream)).decode()
+        await stream.aclose()
+
+        self.assertIn("event: report.created\n", chunk)
+        self.assertIn('data: {"condition": "Injured"}', chunk)
+
+    async def test_replays_missed_events_after_reconnect(self):
+        """Ensure a reconnecting client gets the events after its Last-Event-ID."""
+        self.broker.publish(self.event("Injured"))
+        last_id = self.broker.since(0)[-1]["id"]
+        self.broker.publish(self.event("Lost"))
+
+        response = await self.async_client.get("/api/events/", headers={"Last-Event-ID": str(last_id)})
+        stream = aiter(response.streaming_content)
+        await anext(stream)  # retry
+        chunk = (await anext(stream)).decode()
+        await stream.aclose()
+        self.assertIn(f"id: {last_id + 1}\n", chunk)
+
+    @override_settings(EVENTS_MAX_PENDING=2)
+    async def test_slow_clients_are_told_to_reconnect(self):
+        """Ensure a client that falls behind gets an overflow event and is closed."""
+        response = await self.async_client.get("/api/events/")
+        stream = aiter(response.streaming_content)
+        await anext(stream)
+        for _ in range(3):
+            self.broker.publish(self.event())
+        chunks = [(await anext(stream)).decode() for _ in range(3)]
+        self.assertEqual(chunks[-1], "event: overflow\ndata: {}\n\n")
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+
+    def test_rejects_unknown_event_types(self):
+        """Ensure unknown event types are rejected."""
+        response = self.client.get("/api/events/", {"types": "report.deleted"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class SyncTests(APITestCase):
+    """
+    Tests for delta sync at /api/sync/.
+    """
+
+    url = "/api/sync/"
+
+    def setUp(self):
+        """Set up test data using factories."""
+        self.reports = DogReportFactory.create_batch(3)
+        self.comment = CommentFactory(dog_report=self.reports[0])
+
+    def sync(self, token=None, **params):
+        """Data of a successful sync from `token`."""
+        if token:
+            params["since"] = token
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        return response.json()
+
+    def test_initial_sync_returns_everything(self):
+        """Ensure a first sync returns every row and a token that yields nothing new."""
+        data = self.sync()
+        self.assertEqual([r["id"] for r in data["reports"]], [r.id for r in self.reports])
+        self.assertEqual({s["dog_report"] for s in data["statuses"]}, {r.id for r in self.reports})
+        self.assertEqual([c["id"] for c in data["comments"]], [self.comment.id])
+        self.assertEqual(data["deleted"], {"reports": [], "statuses": [], "comments": []})
+        self.assertFalse(data["has_more"])
+
+        again = self.sync(data["sync_token"])
+        self.assertEqual((again["reports"], again["statuses"], again["comments"]), ([], [], []))
+
+    def test_delta_contains_only_changes_and_deletions(self):
+        """Ensure a delta holds only changed rows and the ids of deleted ones."""
+        token = self.sync()["sync_token"]
+        self.client.patch(f"/api/status/{self.reports[1].status.id}/", {"rescued": True}, format="json")
+        self.client.patch("/api/status/bulk/", [{"dog_report": self.reports[2].id, "vaccinated": True}],
+                          format="json")
+        self.reports[0].description = "Limping near the market"
+        self.reports[0].save()
+        deleted_comment = self.comment.id
+        deleted_report = self.reports[2].id
+        deleted_status = self.reports[2].status.id
+        self.comment.delete()
+        self.reports[2].delete()
+
+        data = self.sync(token)
+        self.assertEqual([r["id"] for r in data["reports"]], [self.reports[0].id])
+        self.assertEqual([s["dog_report"] for s in data["statuses"]], [self.reports[1].id])
+        self.assertEqual(data["comments"], [])
+        self.assertEqual(data["deleted"], {
+            "reports": [deleted_report],
+            "statuses": [deleted_status],
+            "comments": [deleted_comment],
+        })
+
+    def test_pages_through_large_deltas(self):
+        """Ensure paging with has_more returns every row once, in order."""
+        DogReportFactory.create_batch(4)
+        token, seen = None, []
+        for _ in range(10):
+            data = self.sync(token, limit=2)
+            seen += [r["id"] for r in data["reports"]]
+            token = data["sync_token"]
+            if not data["has_more"]:
+                break
+        self.assertEqual(seen, list(DogReport.objects.order_by("updated_at", "id").values_list("id", flat=True)))
+
+    def test_query_count_does_not_grow_with_changes(self):
+        """Ensure a sync runs one query per kind however many rows changed."""
+        token = self.sync()["sync_token"]
+        CommentFactory.create_batch(5, dog_report=self.reports[1])
+        with CaptureQueriesContext(connection) as queries:
+            self.sync(token)
+        self.assertLessEqual(len(queries), 4)  # One keyset query per kind
+
+    def test_recent_rows_wait_for_the_next_sync(self):
+        """Ensure rows stamped inside the settle window are held back, not skipped."""
+        token = self.sync()["sync_token"]
+        late = DogReportFactory()
+        with override_settings(SYNC_SETTLE_SECONDS=60):
+            data = self.sync(token)
+            self.assertEqual(data["reports"], [])
+            later = timezone.now() + timedelta(seconds=61)
+            with mock.patch.object(sync.timezone, "now", return_value=later):
+                self.assertEqual([r["id"] for r in self.sync(data["sync_token"])["reports"]], [late.id])
+
+    def test_bad_and_expired_tokens(self):
+        """Ensure invalid tokens get a 400 and expired ones a 410."""
+        response = self.client.get(self.url, {"since": "not-a-token"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        issued = timezone.now() - timedelta(days=91)
+        response = self.client.get(self.url, {"since": sync.encode_token({}, issued)})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+    def test_prune_tombstones(self):
+        """Ensure only tombstones past the retention period are pruned."""
+        self.comment.delete()
+        Tombstone.objects.update(deleted_at=timezone.now() - timedelta(days=91))
+        self.reports[0].delete()
+        call_command("prune_tombstones", stdout=io.StringIO())
+        self.assertEqual(set(Tombstone.objects.values_list("kind", flat=True)),
+                         {Tombstone.REPORT, Tombstone.STATUS})
+
+
+GAZETTEER = """name,latitude,longitude,country
+Denpasar,-8.65,115.2167,ID
+Ubud,-8.5069,115.2625,ID
+Jakarta,-6.2146,106.8451,ID
+Suva,-18.1416,178.4419,FJ
+Taveuni,-16.85,-179.95,FJ
+"""
+
+
+class GeocodingTests(APITestCase):
+    """
+    Tests for offline reverse geocoding from a gazetteer.
+    """
+
+    def setUp(self):
+        """Point GEOCODER_GAZETTEER at a small CSV gazetteer."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, "places.csv")
+        with open(self.path, "w") as handle:
+            handle.write(GAZETTEER)
+        geocoder_settings = override_settings(GEOCODER_GAZETTEER=self.path)
+        geocoder_settings.enable()
+        self.addCleanup(geocoder_settings.disable)
+
+    def test_nearest_place(self):
+        """Ensure coordinates resolve to the nearest place within range, across the antimeridian too."""
+        self.assertEqual(geocoding.reverse(-8.66, 115.21), "Denpasar, ID")
+        self.assertEqual(geocoding.reverse(-8.52, 115.26), "Ubud, ID")
+        self.assertEqual(geocoding.reverse(-16.8, 179.99), "Taveuni, FJ")  # Across the antimeridian
+        self.assertIsNone(geocoding.reverse(0.0, 0.0))  # Nothing within GEOCODER_MAX_DISTANCE_KM
+        self.assertTrue(os.path.exists(f"{self.path}.idx"))  # Compiled once, memory-mapped afterwards
+
+    def test_grid_search_matches_brute_force(self):
+        """Ensure the grid index finds the same place as a linear scan."""
+        rng = random.Random(7)
+        places = [(f"P{i}", rng.uniform(-60, 60), rng.uniform(-180, 180)) for i in range(2000)]
+        gazetteer = geocoding.Gazetteer(geocoding.compile_index(places))
+        for _ in range(200):
+            latitude, longitude = rng.uniform(-60, 60), rng.uniform(-180, 180)
+            distance, label = min((geocoding._distance_km(latitude, longitude, lat, lon), label)
+                                  for label, lat, lon in places)
+            expected = label if distance < 300 else None
+            self.assertEqual(gazetteer.reverse(latitude, longitude, 300), expected)
+
+    def test_polar_points_stay_cheap(self):
+        """Ensure lookups near or beyond the poles scan whole rows instead of every grid cell."""
+        rng = random.Random(11)
+        places = [(f"P{i}", rng.uniform(-90, 90), rng.uniform(-180, 180)) for i in range(2000)]
+        places += [("North", 89.95, 10.0), ("South", -89.9, -170.0)]
+        gazetteer = geocoding.Gazetteer(geocoding.compile_index(places))
+        cell_places = geocoding.Gazetteer._cell_places
+        with mock.patch.object(geocoding.Gazetteer, "_cell_places", autospec=True,
+                               side_effect=cell_places) as scanned:
+            for latitude, longitude in [(89.99, -120.0), (-89.7, 45.0), (88.0, 179.9), (-87.5, 0.0)]:
+                distance, label = min((geocoding._distance_km(latitude, longitude, lat, lon), label)
+                                      for label, lat, lon in places)
+                expected = label if distance < 300 else None
+                self.assertEqual(gazetteer.reverse(latitude, longitude, 300), expected)
+        self.assertLess(scanned.call_count, 1000)  # Not the whole 180x360 grid
+        for latitude, longitude in [(91.0, 0.0), (-400.0, 10.0), (float("nan"), 0.0), (0.0, float("inf"))]:
+            self.assertIsNone(gazetteer.reverse(latitude, longitude, 300))
+
+    def test_geonames_dump(self):
+        """Ensure GeoNames dumps are read with their country codes."""
+        dump = os.path.join(os.path.dirname(self.path), "cities.txt")
+        with open(dump, "w") as handle:
+            handle.write("1645528\tDenpasar\tDenpasar\t\t-8.65\t115.21667\tP\tPPLA\tID\t\t02\n")
+        self.assertEqual([(name, round(lat, 2)) for name, lat, _ in geocoding.read_places(dump)],
+                         [("Denpasar, ID", -8.65)])
+
+    def test_new_reports_get_a_location(self):
+        """Ensure new and bulk created reports get a location unless they send one."""
+        response = self.client.post("/api/dogs/", {"latitude": -8.51, "longitude": 115.26, "condition": "Lost"})
+        self.assertEqual(response.data["location"], "Ubud, ID")
+        response = self.client.post("/api/dogs/", {"latitude": -8.51, "longitude": 115.26, "condition": "Lost",
+                                                   "location": "Monkey Forest"})
+        self.assertEqual(response.data["location"], "Monkey Forest")
+
+        response = self.client.post("/api/dogs/bulk/", [
+            {"latitude": -6.2, "longitude": 106.84, "condition": "Injured"},
+            {"latitude": 0.0, "longitude": 0.0, "condition": "Injured"},
+        ], format="json")
+        locations = DogReport.objects.filter(id__in=response.data["created"]).order_by("id")
+        self.assertEqual([report.location for report in locations], ["Jakarta, ID", None])
+
+    def test_backfill_command(self):
+        """Ensure geocode_reports fills empty locations and keeps existing ones."""
+        with override_settings(GEOCODER_GAZETTEER=""):
+            reports = [DogReportFactory(latitude=-8.65, longitude=115.22, location=None) for _ in range(3)]
+        kept = DogReportFactory(latitude=-8.65, longitude=115.22, location="Sanur beach")
+        call_command("geocode_reports", batch_size=2, stdout=io.StringIO())
+        for report in reports:
+            report.refresh_from_db()
+            self.assertEqual(report.location, "Denpasar, ID")
+        kept.refresh_from_db()
+        self.assertEqual(kept.location, "Sanur beach")
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTests(APITestCase):
+    """
+    The replica is a copy of the test database taken before any test data
+    exists. Nothing written afterwards reaches it, so a response listing no
+    reports was read from the replica.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Register a 'replica' alias backed by a copy of the empty test database."""
+        super().setUpClass()
+        # Registered after setUpClass so the test case doesn't block queries to it
+        cls.replica_dir = tempfile.mkdtemp()
+        path = os.path.join(cls.replica_dir, "replica.sqlite3")
+        connections["default"].ensure_connection()
+        target = sqlite3.connect(path)
+        connections["default"].connection.backup(target)
+        target.close()
+        connections.settings["replica"] = {**connections.settings["default"], "NAME": path}
+
+    @classmethod
+    def tearDownClass(cls):
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.settings["replica"]
+        shutil.rmtree(cls.replica_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        """Start with empty caches, a healthy replica and one report on the primary."""
+        cache.get_cache().clear()
+        db_router._unhealthy.clear()
+        self.report = DogReportFactory()
+
+    def listed_ids(self, url="/api/dogs/"):
+        """Ids listed by a successful GET of `url`."""
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item["id"] for item in response.json()]
+
+    def test_safe_requests_read_from_the_replica(self):
+        """Ensure list and detail reads are served by the replica."""
+        self.assertEqual(self.listed_ids(), [])
+        self.assertEqual(self.listed_ids("/api/status/"), [])
+        self.assertEqual(self.client.get(f"/api/dogs/{self.report.id}/").status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_writers_read_their_writes_from_the_primary(self):
+        """Ensure a client that just wrote reads from the primary, and others don't."""
+        response = self.client.post("/api/comments/", {"dog_report": self.report.id, "text": "Fed him"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.listed_ids("/api/comments/"), [response.data["id"]])
+        self.assertEqual(self.listed_ids(), [self.report.id])
+
+        other_client = self.client_class(REMOTE_ADDR="10.0.0.2")
+        self.assertEqual(other_client.get("/api/status/").json(), [])
+
+    def test_new_tokens_authenticate_against_the_primary(self):
+        """Ensure a token created after the replica snapshot authenticates a routed read."""
+        response = self.client.post("/api/register/", {"username": "newcomer", "email": "new@example.com",
+                                                       "password": "Secret123!"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        authentication.token_cache.clear()
+        response = self.client.get("/api/dogs/", headers={"Authorization": f"Token {response.data['token']}"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), [])  # Still served by the replica
+        router = db_router.ReplicaRouter()
+        with db_router.reading_from("replica"):
+            self.assertEqual(router.db_for_read(Token), "default")
+            self.assertEqual(router.db_for_read(User), "default")
+
+    def test_unhealthy_replica_falls_back_to_the_primary(self):
+        """Ensure a failing replica is skipped and the request retried on the primary."""
+        with mock.patch.object(connections["replica"], "ensure_connection", side_effect=OperationalError):
+            self.assertEqual(self.listed_ids(), [self.report.id])
+        self.assertEqual(db_router.healthy_replicas(), [])
+        self.assertEqual(self.listed_ids("/api/status/"), [self.report.status.id])
+
+    def test_writes_and_migrations_stay_on_the_primary(self):
+        """Ensure the router never writes to or migrates the replica."""
+        router = db_router.ReplicaRouter()
+        with db_router.reading_from("replica"):
+            self.assertEqual(router.db_for_read(DogReport), "replica")
+            self.assertEqual(router.db_for_write(DogReport), "default")
+        self.assertIsNone(router.db_for_read(DogReport))
+        self.assertFalse(router.allow_migrate("replica", "api"))
+        self.assertTrue(router.allow_migrate("default", "api"))
+
+    def test_replicas_require_a_shared_cache(self):
+        """Ensure the system check rejects replicas with a per-process pin cache."""
+        shared = {"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                              "LOCATION": self.replica_dir}}
+        self.assertEqual([error.id for error in db_router.check_pin_cache(None)], ["pawspotter.E001"])
+        with override_settings(CACHES=shared):
+            self.assertEqual(db_router.check_pin_cache(None), [])
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(db_router.check_pin_cache(None), [])
+
+
+class MediaURLTests(TestCase):
+    """
+    Tests for image URL building with S3 signing and custom domains.
+    """
+
+    credentials = {"bucket_name": "pawspotter", "access_key": "key", "secret_key": "secret",
+                   "region_name": "ap-southeast-2"}
+
+    def setUp(self):
+        """Start from an empty signed URL cache."""
+        media.signed_urls.clear()
+
+    def test_custom_domain_urls_are_formatted(self):
+        """Ensure custom domain URLs match storage.url() without calling it."""
+        storage = S3Storage(**self.credentials, custom_domain="cdn.example.com", querystring_auth=False,
+                            location="media")
+        for name in ["dog_images/abc.jpg", "dog images/ä b.jpg", "./dog_images//abc.jpg"]:
+            self.assertEqual(media.url(storage, name), storage.url(name))
+        with mock.patch.object(storage, "url") as storage_url:
+            self.assertEqual(media.url(storage, "dog_images/abc.jpg"),
+                             "https://cdn.example.com/media/dog_images/abc.jpg")
+        storage_url.assert_not_called()
+        self.assertIsNone(media.url(storage, ""))
+
+    def test_signed_urls_are_cached_for_part_of_their_lifetime(self):
+        """Ensure signed URLs are reused until their cache entry expires."""
+        storage = S3Storage(**self.credentials, custom_domain=None, querystring_auth=True)
+        with mock.patch.object(storage, "url", wraps=storage.url) as storage_url:
+            first = media.url(storage, "dog_images/abc.jpg")
+            self.assertEqual(media.url(storage, "dog_images/abc.jpg"), first)
+            self.assertIn("Signature=", first)
+            self.assertEqual(storage_url.call_count, 1)
+
+            storage.querystring_expire = 0  # Cached entries expire right away
+            media.url(storage, "dog_images/def.jpg")
+            media.url(storage, "dog_images/def.jpg")
+            self.assertEqual(storage_url.call_count, 3)
+
+    def test_cache_is_bounded(self):
+        """Ensure the URL cache drops its least recently used entries."""
+        url_cache = media.URLCache(maxsize=2)
+        for name in "abc":
+            url_cache.set(name, f"https://example.com/{name}", 60)
+        self.assertEqual([url_cache.get(name) for name in "abc"], [None, "https://example.com/b", "https://example.com/c"])
+
+
+class AsyncReadTests(APITestCase):
+    """The async read views answer exactly like the WSGI viewsets."""
+
+    def setUp(self):
+        """Set up test data using factories."""
+        self.reports = DogReportFactory.create_batch(3)
+        CommentFactory.create_batch(2, dog_report=self.reports[0])
+        self.user = UserFactory()
+        self.token = Token.objects.create(user=self.user)
+
+    async def assertSameResponse(self, path, params=None, **headers):
+        """The async twin of `path` answers with the WSGI view's status and data."""
+        expected = await sync_to_async(self.client.get)(path, params or {}, headers=headers)
+        response = await self.async_client.get(path.replace("/api/", "/api/async/"), params or {}, headers=headers)
+        self.assertEqual(response.status_code, expected.status_code)
+        # Only the next links differ, by their path
+        self.assertEqual(json.loads(response.content.decode().replace("/api/async/", "/api/")), expected.json())
+        return response
+
+    async def test_list_and_retrieve_match_the_viewsets(self):
+        """Ensure lists, pages, pins, sparse fields and details match the viewsets."""
+        report_id, comment_id = self.reports[0].id, await Comment.objects.values_list("id", flat=True).afirst()
+        await self.assertSameResponse("/api/dogs/")
+        await self.assertSameResponse("/api/dogs/", {"page_size": 2, "condition": "Lost"})
+        await self.assertSameResponse("/api/dogs/", {"mode": "pins", "page_size": 2})
+        await self.assertSameResponse("/api/dogs/", {"fields": "id,condition"})
+        await self.assertSameResponse(f"/api/dogs/{report_id}/", {"expand": "status,comments"})
+        await self.assertSameResponse("/api/comments/", {"dog_report": report_id})
+        await self.assertSameResponse(f"/api/comments/{comment_id}/")
+
+    async def test_errors_match_the_viewsets(self):
+        """Ensure 404s, bad filters, bad cursors and bad tokens match the viewsets."""
+        await self.assertSameResponse("/api/dogs/999999/")
+        await self.assertSameResponse("/api/dogs/", {"bbox": "nonsense"})
+        await self.assertSameResponse("/api/dogs/", {"cursor": "%%%"})
+        await self.assertSameResponse("/api/dogs/", HTTP_AUTHORIZATION="Token wrong")
+        response = await self.async_client.post("/api/async/dogs/", {})
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    async def test_errors_keep_the_negotiated_content_type(self):
+        """Ensure error responses are labelled with the negotiated type like the WSGI views."""
+        for path, params, headers in [
+            ("/api/dogs/999999/", {}, {}),
+            ("/api/dogs/", {"user": 999999}, {}),
+            ("/api/dogs/", {"bbox": "nonsense"}, {}),
+            ("/api/dogs/", {}, {"Authorization": "Token wrong"}),
+        ]:
+            expected = await sync_to_async(self.client.get)(path, params, headers=headers)
+            response = await self.async_client.get(path.replace("/api/", "/api/async/"), params, headers=headers)
+            self.assertGreaterEqual(response.status_code, 400)
+            self.assertEqual(response["Content-Type"], expected["Content-Type"])
+            self.assertEqual(response["Content-Type"], "application/json")
+        if renderers.msgpack is not None:
+            response = await self.async_client.get("/api/async/dogs/999999/",
+                                                   headers={"Accept": "application/msgpack"})
+            self.assertEqual(response["Content-Type"], "application/msgpack")
+            self.assertIn("detail", renderers.msgpack.unpackb(response.content))
+
+    def test_cached_tokens_authenticate_without_queries(self):
+        """Ensure a cached token authenticates without a database query."""
+        request = RequestFactory().get("/api/async/dogs/", HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        user, _ = async_to_sync(authentication.aauthenticate)(request)  # Loads the token into the cache
+        self.assertEqual(user, self.user)
+        with self.assertNumQueries(0):
+            user, token = async_to_sync(authentication.aauthenticate)(request)
+        self.assertEqual((user, token.key), (self.user, self.token.key))
+
+    async def test_asgi_requests_report_database_timings(self):
+        """Ensure ASGI requests to async views and to the sync viewsets still count their queries."""
+        for path in ("/api/async/dogs/", "/api/dogs/", "/api/status/"):
+            response = await self.async_client.get(path)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            queries = re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', response["Server-Timing"])
+            self.assertIsNotNone(queries, path)
+            self.assertGreater(int(queries.group(1)), 0)
+        self.assertEqual(connection.execute_wrappers, [])  # Removed once the response is done
+
+
+class RendererTests(APITestCase):
+    """The fast JSON renderer matches DRF's output; msgpack is negotiated like any other format."""
+
+    def setUp(self):
+        """Set up test data using factories and a payload with every tricky type."""
+        DogReportFactory.create_batch(3)
+        self.data = {
+            "created_at": timezone.now(),
+            "decimal": Decimal("1.50"),
+            "text": "line\u2028separator ä",
+            "items": [{"latitude": -8.6705123, "longitude": 115.2126, "id": 1}],
+        }
+
+    def test_json_matches_drf(self):
+        """Ensure the fast renderer's output is byte-identical to DRF's, with and without orjson."""
+        drf = JSONRenderer()
+        self.assertEqual(renderers.FastJSONRenderer().render(self.data), drf.render(self.data))
+        with mock.patch.object(renderers, "orjson", None):
+            self.assertEqual(renderers.FastJSONRenderer().render(self.data), drf.render(self.data))
+        indented = renderers.FastJSONRenderer().render(self.data, "application/json; indent=2")
+        self.assertEqual(indented, drf.render(self.data, "application/json; indent=2"))
+
+        expected = self.client.get("/api/dogs/", {"expand": "status"})
+        self.assertEqual(expected.content, drf.render(expected.data))
+
+    def test_json_parser_rejects_bad_bodies(self):
+        """Ensure malformed JSON bodies get a 400."""
+        response = self.client.post("/api/dogs/bulk/", b"[{", content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("JSON parse error", response.data["detail"])
+
+    @skipUnless(renderers.msgpack, "msgpack is not installed")
+    def test_msgpack_is_negotiated(self):
+        """Ensure Accept and ?format= select msgpack with the same data as JSON."""
+        expected = self.client.get("/api/dogs/", {"page_size": 2}).json()
+        for path in ("/api/dogs/", "/api/async/dogs/"):
+            response = self.client.get(path, {"page_size": 2}, HTTP_ACCEPT="application/msgpack")
+            self.assertEqual(response["Content-Type"], "application/msgpack")
+            data = renderers.msgpack.unpackb(response.content)
+            data["next"] = data["next"].replace("/api/async/", "/api/")
+            self.assertEqual(data, expected)
+        response = self.client.get("/api/dogs/", {"format": "msgpack"})
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(self.client.get("/api/dogs/")["Content-Type"], "application/json")  # Cached apart
+
+    @skipUnless(renderers.msgpack, "msgpack is not installed")
+    def test_msgpack_request_bodies(self):
+        """Ensure msgpack request bodies are parsed and malformed ones rejected."""
+        items = [{"latitude": -8.65, "longitude": 115.22, "condition": "Injured"}]
+        response = self.client.post("/api/dogs/bulk/", renderers.msgpack.packb(items),
+                                    content_type="application/msgpack")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post("/api/dogs/bulk/", b"\xc1", content_type="application/msgpack")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
 class DogStatusTests(APITestCase):
     """
     Tests for dog statuses using Factory Boy.
@@ -52,6 +1671,58 @@ class DogStatusTests(APITestCase):
         response = self.client.post("/api/status/", data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    def test_factory_applies_fields_to_the_existing_status(self):
+        """Ensure the factory updates the signal-created status instead of ignoring the given flags."""
+        for flags in ({"rescued": True, "vaccinated": False}, {"rescued": False, "vaccinated": True}):
+            DogStatusFactory(dog_report=self.dog_report, **flags)
+            status_row = DogStatus.objects.get(dog_report=self.dog_report)
+            self.assertEqual((status_row.rescued, status_row.vaccinated), (flags["rescued"], flags["vaccinated"]))
+        self.assertEqual(DogStatus.objects.filter(dog_report=self.dog_report).count(), 1)
+
+    def test_upsert_creates_and_updates(self):
+        """Ensure the upsert inserts a missing status and updates an existing one."""
+        DogStatus.objects.filter(dog_report=self.dog_report).delete()
+        data = {"dog_report": self.dog_report.id, "vaccinated": True}
+        response = self.client.post("/api/status/upsert/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["vaccinated"])
+        first_update = DogStatus.objects.get(dog_report=self.dog_report).updated_at
+
+        data = {"dog_report": self.dog_report.id, "rescued": True}
+        response = self.client.post("/api/status/upsert/", data, format="json")
+        status_row = DogStatus.objects.get(dog_report=self.dog_report)
+        self.assertTrue(status_row.vaccinated)  # Untouched fields keep their value
+        self.assertTrue(status_row.rescued)
+        self.assertGreater(status_row.updated_at, first_update)
+
+    def test_upsert_unknown_report(self):
+        """Ensure an upsert for a missing report is rejected."""
+        response = self.client.post("/api/status/upsert/", {"dog_report": 999999}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update_one_query_per_change_set(self):
+        """Ensure reports sharing a change set are updated together."""
+        reports = DogReportFactory.create_batch(4)
+        changes = [{"dog_report": report.id, "vaccinated": True} for report in reports[:3]]
+        changes.append({"dog_report": reports[3].id, "rescued": True, "additional_notes": "Adopted"})
+        changes.append({"dog_report": 999999, "vaccinated": True})
+        before = DogStatus.objects.get(dog_report=reports[0]).updated_at
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch("/api/status/bulk/", changes, format="json")
+        updates = [query for query in queries if query["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(response.data, {"updated": 4, "missing": [999999]})
+        self.assertEqual(DogStatus.objects.filter(dog_report__in=reports[:3], vaccinated=True).count(), 3)
+        self.assertEqual(DogStatus.objects.get(dog_report=reports[3]).additional_notes, "Adopted")
+        self.assertGreater(DogStatus.objects.get(dog_report=reports[0]).updated_at, before)
+
+    def test_bulk_update_rejects_duplicates(self):
+        """Ensure a report can only appear once per bulk update."""
+        changes = [{"dog_report": self.dog_report.id, "vaccinated": True},
+                   {"dog_report": self.dog_report.id, "vaccinated": False}]
+        response = self.client.patch("/api/status/bulk/", changes, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class CommentTests(APITestCase):
     """
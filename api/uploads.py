@@ -0,0 +1,103 @@
+import re
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+from .models import unique_filename
+
+ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'webp'}  # What plain Pillow can decode for the image pipeline
+
+_KEY_PATTERN = re.compile(r'^dog_reports/[0-9a-f]{32}\.[a-z]+$')
+_KEY_SALT = 'api.uploads.key'
+_POLICY_SALT = 'api.uploads.policy'
+
+KEY_USED_MESSAGE = "Image key has already been used."
+
+
+class UploadError(ValueError):
+    pass
+
+
+def is_s3(storage):
+    """True for django-storages' S3 backend (or anything exposing the same client)."""
+    return hasattr(storage, 'bucket_name') and hasattr(storage, 'connection')
+
+
+def new_key(filename):
+    """Reserves a unique_filename-style key for an upload of `filename`."""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension not in ALLOWED_EXTENSIONS:
+        raise UploadError(f"Unsupported image type, expected one of: {', '.join(sorted(ALLOWED_EXTENSIONS))}.")
+    return unique_filename(None, f"upload.{extension}")
+
+
+def sign_key(key):
+    """Token handed to the client; proves the key was issued by us."""
+    return signing.TimestampSigner(salt=_KEY_SALT).sign(key)
+
+
+def unsign_key(token):
+    """Returns the key of a token issued by sign_key, raising UploadError if invalid or expired."""
+    try:
+        key = signing.TimestampSigner(salt=_KEY_SALT).unsign(token, max_age=settings.IMAGE_UPLOAD_KEY_MAX_AGE)
+    except signing.BadSignature:
+        raise UploadError("Invalid or expired image key.")
+    if not _KEY_PATTERN.match(key):
+        raise UploadError("Invalid image key.")
+    return key
+
+
+def presigned_post(key, content_type, request, storage=default_storage):
+    """
+    Returns {"url", "fields"} for a browser-style multipart POST of the image.
+    With S3 the client talks to the bucket directly; any other storage gets a
+    signed policy for the local receiver at /api/dogs/upload/.
+    """
+    max_bytes = settings.IMAGE_UPLOAD_MAX_BYTES
+    expires_in = settings.IMAGE_UPLOAD_URL_EXPIRY
+    if is_s3(storage):
+        return storage.connection.meta.client.generate_presigned_post(
+            Bucket=storage.bucket_name,
+            Key=storage._normalize_name(key),
+            Fields={'Content-Type': content_type},
+            Conditions=[
+                {'Content-Type': content_type},
+                ['content-length-range', 1, max_bytes],
+            ],
+            ExpiresIn=expires_in,
+        )
+
+    policy = signing.dumps({'key': key, 'max_bytes': max_bytes}, salt=_POLICY_SALT)
+    return {
+        'url': request.build_absolute_uri(reverse('dogreport-upload')),
+        'fields': {'key': key, 'policy': policy},
+    }
+
+
+def store_local_upload(key, policy, upload, storage=default_storage):
+    """Saves a file posted to the local receiver after checking its signed policy."""
+    try:
+        policy = signing.loads(policy, salt=_POLICY_SALT, max_age=settings.IMAGE_UPLOAD_URL_EXPIRY)
+    except signing.BadSignature:
+        raise UploadError("Invalid or expired upload policy.")
+    if policy['key'] != key:
+        raise UploadError("Upload key does not match the policy.")
+    if upload.size > policy['max_bytes']:
+        raise UploadError("Image is too large.")
+    if storage.exists(key):
+        raise UploadError("Image has already been uploaded.")
+    return storage.save(key, upload)
+
+
+def check_uploaded(key, storage=default_storage):
+    """Cheap metadata check (a HEAD request on S3) that the object exists and fits the limit."""
+    try:
+        size = storage.size(key)
+    except (OSError, ClientError):  # FileNotFoundError locally, 404 from S3
+        raise UploadError("Image has not been uploaded yet.")
+    if size > settings.IMAGE_UPLOAD_MAX_BYTES:
+        raise UploadError("Image is too large.")
+    return key
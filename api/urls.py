@@ -1,6 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DogReportViewSet, RegisterView, LoginView, LogoutView, DogStatusViewSet, CommentViewSet
+from .views import (
+    DogReportViewSet, RegisterView, LoginView, LogoutView, DogStatusViewSet, CommentViewSet, StatsView, SyncView,
+    report_events, async_report_list, async_report_detail, async_comment_list, async_comment_detail,
+)
 
 
 router = DefaultRouter()
@@ -13,4 +16,12 @@ urlpatterns = [
     path("register/", RegisterView.as_view(), name="register"),
     path("login/", LoginView.as_view(), name="login"),
     path("logout/", LogoutView.as_view(), name="logout"),
+    path("stats/", StatsView.as_view(), name="stats"),
+    path("sync/", SyncView.as_view(), name="sync"),
+    path("events/", report_events, name="events"),  # Server-Sent Events, ASGI only
+    # Async read-only twins of the report and comment endpoints, for ASGI workers
+    path("async/dogs/", async_report_list, name="async-dogs-list"),
+    path("async/dogs/<int:pk>/", async_report_detail, name="async-dogs-detail"),
+    path("async/comments/", async_comment_list, name="async-comments-list"),
+    path("async/comments/<int:pk>/", async_comment_detail, name="async-comments-detail"),
 ]
\ No newline at end of file
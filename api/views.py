@@ -1,25 +1,60 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+
 from django.contrib.auth import authenticate
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, InterfaceError, OperationalError, transaction
+from django.db.models import Prefetch
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework import viewsets, permissions, generics, status
+from rest_framework.decorators import action
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
 from django.contrib.auth.hashers import make_password
+from rest_framework.request import Request
 from rest_framework.views import APIView
+from pawspotter_backend import db_router
+from pawspotter_backend.db_router import ReplicaReadMixin
 
 
 
+from . import cache, clusters, events, export, images, renderers, search, stats, sync, uploads
+from .authentication import aauthenticate, invalidate_token
+from .filters import DogReportFilter
+from .pagination import KeysetPagination
 from .models import DogReport, DogStatus, Comment
 from .serializers import (
     UserSerializer,
     RegisterSerializer,
     DogReportSerializer,
+    EXPANDABLE_FIELDS,
+    ExpandedDogReportSerializer,
+    PIN_FIELDS,
+    serialize_pins,
+    requested_fields,
+    ClusterQuerySerializer,
+    ReportClusterSerializer,
+    SearchQuerySerializer,
+    StatsQuerySerializer,
+    EventStreamQuerySerializer,
+    SyncQuerySerializer,
+    UploadRequestSerializer,
+    LocalUploadSerializer,
     DogStatusSerializer,
+    DogStatusChangeSerializer,
     CommentSerializer,
 )
 
@@ -74,9 +109,10 @@ class LoginView(ObtainAuthToken):
     Returns a token and user details on successful authentication.
     """
     def post(self, request, *args, **kwargs):
-        response = super().post(request, *args, **kwargs)
-        token = Token.objects.get(key=response.data["token"])
-        user = token.user
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data["user"]
+        token, created = Token.objects.get_or_create(user=user)
         return Response({
             "token": token.key,
             "user": UserSerializer(user).data  # Returns structured user details
@@ -90,6 +126,7 @@ class LogoutView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
+        invalidate_token(request.auth.key)  # Drop the cached identity right away
         request.auth.delete()  # Deletes the token from the database
         return Response({"message": "Logged out successfully."}, status=200)
 
@@ -98,18 +135,85 @@ class LogoutView(APIView):
 # Dog Report API View
 # ------------------------------
 
-class DogReportViewSet(viewsets.ModelViewSet):
+class DogReportViewSet(ReplicaReadMixin, cache.CachedResponseMixin, viewsets.ModelViewSet):
     """
     API view for managing dog reports.
     Allows users to create, view, update, and delete reports.
     """
-    queryset = DogReport.objects.all().order_by('-created_at')
+    cache_scope = cache.REPORTS
+    queryset = DogReport.objects.all().order_by('-created_at', '-id')
     serializer_class = DogReportSerializer
     permission_classes = [permissions.AllowAny]
-    parser_classes = (MultiPartParser, FormParser)
+    pagination_class = KeysetPagination
+    parser_classes = (MultiPartParser, FormParser, *renderers.DATA_PARSERS)  # JSON/msgpack for image_key uploads
 
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['condition', 'user', 'created_at']
+    filterset_class = DogReportFilter  # condition(__in), user, created_at ranges, bbox, near/radius
+
+    comment_page_size = 20  # Comments embedded by ?expand=comments
+
+    def get_expand(self):
+        """Related objects requested with ?expand= on the detail view."""
+        if self.action != 'retrieve':
+            return set()
+        return (requested_fields(self.request, 'expand') or set()) & EXPANDABLE_FIELDS
+
+    def get_queryset(self):
+        """
+        Joins the status and prefetches one page of comments (with their users)
+        for ?expand=, or only loads the columns needed for ?fields= sparse
+        fieldsets. created_at is always kept for pagination.
+        """
+        queryset = super().get_queryset()
+        expand = self.get_expand()
+        if expand:
+            if 'status' in expand:
+                queryset = queryset.select_related('status')
+            if 'comments' in expand:
+                queryset = queryset.prefetch_related(Prefetch(
+                    'comments',
+                    queryset=Comment.objects.select_related('user')
+                    .order_by('-created_at', '-id')[:self.comment_page_size + 1],
+                    to_attr='comment_page',
+                ))
+            return queryset
+
+        requested = requested_fields(self.request)
+        if requested:
+            model_fields = {field.name for field in DogReport._meta.concrete_fields}
+            columns = requested & model_fields
+            if 'thumbnails' in requested:
+                columns |= {'image', 'image_variants'}
+            queryset = queryset.only('created_at', *columns)
+        return queryset
+
+    def get_serializer_class(self):
+        if self.get_expand():
+            return ExpandedDogReportSerializer
+        return super().get_serializer_class()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand'] = self.get_expand()
+        context['comment_page_size'] = self.comment_page_size
+        return context
+
+    def list(self, request, *args, **kwargs):
+        """
+        ?mode=pins returns compact map pins (id, latitude, longitude, condition,
+        created_at) built from values_list rows instead of model instances.
+        """
+        if request.query_params.get('mode') != 'pins':
+            return super().list(request, *args, **kwargs)
+        # The cache key covers the query string, so pins get their own entry and ETag
+        return self.cached_response(self.list_pins, request, *args, **kwargs)
+
+    def list_pins(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).values_list(*PIN_FIELDS, named=True)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serialize_pins(page))
+        return Response(serialize_pins(queryset))
 
     def perform_create(self, serializer):
         """
@@ -128,45 +232,401 @@ class DogReportViewSet(viewsets.ModelViewSet):
                 except User.DoesNotExist:
                     return Response({"error": "User not found."}, status=400)
 
-        serializer.save(user=user)  # Save report with user (or None if anonymous)
+        try:
+            with transaction.atomic():
+                serializer.save(user=user)  # Save report with user (or None if anonymous)
+        except IntegrityError:
+            # A concurrent request created a report from the same image_key
+            raise ValidationError({"image_key": [uploads.KEY_USED_MESSAGE]})
+
+    bulk_max_items = 1000
+    bulk_chunk_size = 250
+
+    @action(detail=False, methods=['post'], parser_classes=renderers.DATA_PARSERS)
+    def bulk(self, request):
+        """
+        Creates many reports from a JSON array in one transaction.
+        Reports and their statuses are inserted with bulk_create in chunks;
+        invalid items are skipped and reported by index.
+        """
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({"error": "Expected a non-empty JSON array."}, status=400)
+        if len(items) > self.bulk_max_items:
+            return Response({"error": f"At most {self.bulk_max_items} reports per request."}, status=400)
+
+        # One serializer validates every item, so its fields are only built once
+        serializer = self.get_serializer()
+        reports, errors, image_keys = [], [], set()
+        for index, item in enumerate(items):
+            try:
+                data = serializer.run_validation(item)
+            except ValidationError as exc:
+                errors.append({"index": index, "errors": exc.detail})
+                continue
+            if data.get('image'):
+                if data['image'] in image_keys:
+                    errors.append({"index": index, "errors": {"image_key": [uploads.KEY_USED_MESSAGE]}})
+                    continue
+                image_keys.add(data['image'])
+            if request.user.is_authenticated:
+                data['user'] = request.user
+            report = DogReport(**data)
+            report.sync_geohash()  # bulk_create bypasses save()
+            report.fill_location()
+            reports.append(report)
+
+        if not reports:
+            return Response({"created": [], "errors": errors}, status=400)
+
+        try:
+            with transaction.atomic():
+                for start in range(0, len(reports), self.bulk_chunk_size):
+                    chunk = reports[start:start + self.bulk_chunk_size]
+                    DogReport.objects.bulk_create(chunk)
+                    # The create_dog_status signal doesn't fire for bulk_create
+                    DogStatus.objects.bulk_create([DogStatus(dog_report=report) for report in chunk])
+                clusters.apply_reports(reports)
+                search.index_reports([report.id for report in reports])
+                stats.apply_reports(reports)
+                for report in reports:
+                    events.report_created(report)
+                    if report.image:
+                        images.enqueue(report.id)
+                cache.invalidate(cache.REPORTS)
+        except IntegrityError:
+            # A concurrent request created a report from one of the image keys
+            return Response({"error": uploads.KEY_USED_MESSAGE}, status=400)
+
+        return Response({"created": [report.id for report in reports], "errors": errors}, status=201)
+
+    @action(detail=False, methods=['post'], url_path='upload-url')
+    def upload_url(self, request):
+        """
+        Step one of a direct upload: reserves a key and returns a presigned POST.
+        The client uploads the image straight to storage, then creates the report
+        with the returned image_key instead of a multipart file.
+        """
+        query = UploadRequestSerializer(data=request.data)
+        query.is_valid(raise_exception=True)
+        key = query.validated_data['filename']
+        return Response({
+            "image_key": uploads.sign_key(key),
+            "upload": uploads.presigned_post(key, query.validated_data['content_type'], request),
+            "expires_in": settings.IMAGE_UPLOAD_URL_EXPIRY,
+        }, status=201)
+
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser])
+    def upload(self, request):
+        """
+        Receives presigned uploads when the storage is not S3 (local development
+        with FileSystemStorage). With S3 the bucket plays this role.
+        """
+        if uploads.is_s3(default_storage):
+            return Response({"error": "Upload directly to storage."}, status=404)
+        body = LocalUploadSerializer(data=request.data)
+        body.is_valid(raise_exception=True)
+        try:
+            uploads.store_local_upload(body.validated_data['key'], body.validated_data['policy'],
+                                       body.validated_data['file'])
+        except uploads.UploadError as exc:
+            return Response({"error": str(exc)}, status=400)
+        return Response(status=204)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Streams every report matching the list filters as NDJSON (default) or
+        CSV (?output=csv), with status fields joined in the same query.
+        Rows are fetched in chunks, so memory stays flat regardless of size.
+        Gzipped on the fly when the client accepts it.
+        """
+        output = request.query_params.get('output', 'ndjson')
+        if output not in export.EXPORT_FORMATS:
+            return Response({"error": f"Unsupported output, expected one of: {', '.join(export.EXPORT_FORMATS)}."},
+                            status=400)
+
+        queryset = self.filter_queryset(DogReport.objects.order_by('id'))
+        lines = export.ndjson_lines if output == 'ndjson' else export.csv_lines
+        chunks = lines(export.export_rows(queryset))
+
+        use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+        if use_gzip:
+            chunks = export.gzipped(chunks)
+        response = StreamingHttpResponse(chunks, content_type=export.EXPORT_FORMATS[output])
+        response['Content-Disposition'] = f'attachment; filename="dog_reports.{output}"'
+        if use_gzip:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+
+    @action(detail=False, methods=['get'])
+    def clusters(self, request):
+        """
+        Returns map clusters for ?bbox=south,west,north,east&zoom=N.
+        Served from the ReportCluster rollups, never from the reports table.
+        """
+        query = ClusterQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        precision, rows = clusters.clusters_in_bbox(*query.validated_data['bbox'],
+                                                    zoom=query.validated_data['zoom'])
+        return Response({
+            "zoom": query.validated_data['zoom'],
+            "precision": precision,
+            "clusters": ReportClusterSerializer(rows, many=True).data,
+        })
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Full-text search: ?q=limping brown dog near market.
+        Matches location, description and comments through the api.search
+        index and returns reports best match first, ?page=N&page_size=M.
+        """
+        query = SearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        page, page_size = query.validated_data['page'], query.validated_data['page_size']
+
+        # One extra id tells whether there is a next page
+        ids = search.ranked_ids(query.validated_data['q'], limit=page_size + 1, offset=(page - 1) * page_size)
+        reports = self.get_queryset().in_bulk(ids[:page_size])
+        results = [reports[pk] for pk in ids[:page_size] if pk in reports]
+
+        next_url = None
+        if len(ids) > page_size:
+            next_url = replace_query_param(request.build_absolute_uri(), 'page', page + 1)
+        return Response({
+            "next": next_url,
+            "results": self.get_serializer(results, many=True).data,
+        })
 
 
 # ------------------------------
 # Dog Status API View
 # ------------------------------
 
-class DogStatusViewSet(viewsets.ModelViewSet):
+class DogStatusViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """
     API view for managing dog statuses.
     """
     queryset = DogStatus.objects.all()
     serializer_class = DogStatusSerializer
+    bulk_max_items = 1000
 
     def perform_create(self, serializer):
         """
         Ensures that each dog report has only one status.
+        Relies on the unique constraint instead of a separate exists() query,
+        which also covers concurrent requests.
         """
-        dog_report = serializer.validated_data.get("dog_report")
-
-        if DogStatus.objects.filter(dog_report=dog_report).exists():
+        try:
+            with transaction.atomic():
+                return serializer.save()
+        except IntegrityError:
             raise ValidationError({"error": "Status already exists for this dog report."})
-        
-        return serializer.save()  
-    
 
+    @action(detail=False, methods=['post', 'put'])
+    def upsert(self, request):
+        """
+        Creates or updates the status of a dog report in one
+        INSERT ... ON CONFLICT (dog_report) DO UPDATE statement.
+        """
+        change = DogStatusChangeSerializer(data=request.data)
+        change.is_valid(raise_exception=True)
+        values = dict(change.validated_data)
+        dog_report_id = values.pop('dog_report')
+
+        try:
+            with transaction.atomic():
+                # Locked until commit, so a concurrent upsert can't apply the same delta again.
+                # Every report gets its status row on creation, so there is a row to lock.
+                previous = DogStatus.objects.select_for_update().filter(dog_report_id=dog_report_id).values_list(
+                    'rescued', 'vaccinated').first() or (False, False)
+                DogStatus.objects.bulk_create(
+                    [DogStatus(dog_report_id=dog_report_id, **values)],
+                    update_conflicts=True,
+                    unique_fields=['dog_report'],
+                    update_fields=[*values, 'updated_at'],
+                )
+                # The join doubles as the existence check: FK constraints are
+                # deferred until commit, so a bad id wouldn't fail the INSERT
+                instance = DogStatus.objects.select_related('dog_report').get(dog_report_id=dog_report_id)
+                report = instance.dog_report
+                stats.apply_status_change(report.created_at, report.condition, report.geohash,
+                                          previous, (instance.rescued, instance.vaccinated))
+                events.status_updated(instance, (report.latitude, report.longitude, report.condition))
+        except (IntegrityError, DogStatus.DoesNotExist):
+            raise ValidationError({"dog_report": ["Dog report not found."]})
+
+        cache.invalidate(cache.REPORTS)  # bulk_create doesn't send post_save
+        return Response(DogStatusSerializer(instance).data)
+
+    @action(detail=False, methods=['patch'])
+    def bulk(self, request):
+        """
+        Applies a list of status changes, e.g. after a vaccination day.
+        Reports sharing the same change set are updated with a single UPDATE.
+        """
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({"error": "Expected a non-empty JSON array."}, status=400)
+        if len(items) > self.bulk_max_items:
+            return Response({"error": f"At most {self.bulk_max_items} changes per request."}, status=400)
+
+        changes = DogStatusChangeSerializer(data=items, many=True)
+        changes.is_valid(raise_exception=True)
+
+        groups = {}
+        seen = set()
+        for change in changes.validated_data:
+            values = dict(change)
+            dog_report_id = values.pop('dog_report')
+            if dog_report_id in seen:
+                raise ValidationError({"error": f"Dog report {dog_report_id} appears more than once."})
+            if not values:
+                raise ValidationError({"error": f"No changes given for dog report {dog_report_id}."})
+            seen.add(dog_report_id)
+            groups.setdefault(tuple(sorted(values.items())), []).append(dog_report_id)
+
+        updated = 0
+        now = timezone.now()  # update() skips auto_now
+        with transaction.atomic():
+            for values, dog_report_ids in groups.items():
+                updated += stats.update_statuses(DogStatus.objects.filter(dog_report_id__in=dog_report_ids),
+                                                 **dict(values), updated_at=now)
+            events.statuses_updated(DogStatus.objects.filter(dog_report_id__in=seen))
+        missing = []
+        if updated < len(seen):
+            found = set(DogStatus.objects.filter(dog_report_id__in=seen).values_list('dog_report_id', flat=True))
+            missing = sorted(seen - found)
+
+        cache.invalidate(cache.REPORTS)  # update() doesn't send post_save
+        return Response({"updated": updated, "missing": missing})
+
+
+# ------------------------------
+# Statistics API View
+# ------------------------------
+
+class StatsView(APIView):
+    """
+    Dashboard statistics: report counts by condition, rescue and vaccination
+    rates, and trends per day and per region. Served from the ReportStat
+    rollups, never from the reports table.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        query = StatsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        return Response(stats.summarize(
+            since=query.validated_data.get('since'),
+            until=query.validated_data.get('until'),
+            conditions=query.validated_data.get('condition'),
+            bbox=query.validated_data.get('bbox'),
+            regions=query.validated_data['regions'],
+        ))
+
+
+# ------------------------------
+# Delta Sync API View
+# ------------------------------
+
+class SyncView(APIView):
+    """
+    Everything that changed since the client's last sync: created or updated
+    reports, statuses and comments, and the ids of deleted ones. Pass the
+    returned sync_token as ?since= next time; while has_more is true, call
+    again straight away.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        query = SyncQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        try:
+            changes, token, has_more = sync.changes(
+                query.validated_data.get('since'), limit=query.validated_data['limit'])
+        except sync.SyncTokenExpired as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_410_GONE)
+        except sync.SyncTokenError as exc:
+            raise ValidationError({'since': [str(exc)]})
+        context = {'request': request}
+        return Response({
+            'reports': DogReportSerializer(changes['reports'], many=True, context=context).data,
+            'statuses': DogStatusSerializer(changes['statuses'], many=True, context=context).data,
+            'comments': CommentSerializer(changes['comments'], many=True, context=context).data,
+            'deleted': changes['deleted'],
+            'sync_token': token,
+            'has_more': has_more,
+        })
+
+
+# ------------------------------
+# Live Events Stream
+# ------------------------------
+
+async def report_events(request):
+    """
+    Server-Sent Events stream of new reports, status changes and comments,
+    filtered by ?types=, ?condition= and ?bbox=. Needs the ASGI application:
+    an idle stream is a parked coroutine, not a worker thread. Streams end
+    after EVENTS_MAX_STREAM_SECONDS; EventSource reconnects with
+    Last-Event-ID and receives what it missed from the broker's replay buffer.
+    """
+    query = EventStreamQuerySerializer(data=request.GET)
+    if not query.is_valid():
+        return JsonResponse(query.errors, status=400)
+    filters = {
+        'types': query.validated_data.get('types'),
+        'conditions': query.validated_data.get('condition'),
+        'bbox': query.validated_data.get('bbox'),
+    }
+    try:
+        last_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_id = None
+
+    broker = events.get_broker()
+    subscription = events.Subscription(broker, max_pending=settings.EVENTS_MAX_PENDING, **filters)
+
+    async def stream():
+        with subscription:
+            yield "retry: 3000\n\n"
+            if last_id is not None:
+                for event in broker.since(last_id):
+                    if subscription.matches(event):
+                        yield events.format_sse(event)
+            deadline = time.monotonic() + settings.EVENTS_MAX_STREAM_SECONDS
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    event = await subscription.get(timeout=min(settings.EVENTS_KEEPALIVE_SECONDS, remaining))
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"  # Also lets proxies know the connection is alive
+                    continue
+                yield events.format_sse(event)
+                if event['type'] == events.OVERFLOW:
+                    break
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+    return response
 
 
 # ------------------------------
 # User Comments API View
 # ------------------------------
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ReplicaReadMixin, cache.CachedResponseMixin, viewsets.ModelViewSet):
     """
     API view for managing comments on dog reports.
     Users (or anonymous) can leave comments related to a report.
     """
+    cache_scope = cache.COMMENTS
     serializer_class = CommentSerializer
     permission_classes = [permissions.AllowAny]  # Allows both logged-in & anonymous users
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """
@@ -174,11 +634,12 @@ class CommentViewSet(viewsets.ModelViewSet):
         Otherwise, returns all comments sorted by newest first.
         """
         dog_report_id = self.request.query_params.get('dog_report', None)
+        queryset = Comment.objects.select_related('user')  # get_user reads the username
 
         if dog_report_id is not None:
-            return Comment.objects.filter(dog_report=dog_report_id).order_by('-created_at')
+            return queryset.filter(dog_report=dog_report_id).order_by('-created_at', '-id')
 
-        return Comment.objects.all().order_by('-created_at')
+        return queryset.order_by('-created_at', '-id')
 
     def perform_create(self, serializer):
         """
@@ -187,4 +648,106 @@ class CommentViewSet(viewsets.ModelViewSet):
         """
         user = self.request.user if self.request.user.is_authenticated else None
 
-        serializer.save(user=user)
\ No newline at end of file
+        serializer.save(user=user)
+
+
+# ------------------------------
+# Async Read API Views
+# ------------------------------
+# list/retrieve of the report and comment viewsets as async views for ASGI
+# workers: a reader waiting on the database is a parked coroutine instead of
+# a blocked worker. The viewsets still build the querysets and serialize, so
+# responses match the WSGI endpoints (filters, ?fields=, ?expand=, ?mode=pins,
+# keyset pages) and negotiate JSON or msgpack the same way; the response
+# cache is not used.
+
+async def _async_read(viewset_class, request, pk=None):
+    if request.method not in ('GET', 'HEAD'):
+        return JsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+    view = viewset_class(
+        action='list' if pk is None else 'retrieve',
+        args=(), kwargs={} if pk is None else {'pk': pk}, format_kwarg=None,
+    )
+    view.request = Request(request, authenticators=view.get_authenticators())
+    renderer, media_type = renderers.FastJSONRenderer(), 'application/json'
+    try:
+        renderer, media_type = _negotiate(view)
+        view.request.user, view.request.auth = await aauthenticate(request)
+        view.check_permissions(view.request)
+        alias = db_router.choose_replica(request)
+        try:
+            with db_router.reading_from(alias):
+                data = await (_async_list(view) if pk is None else _async_retrieve(view, pk))
+        except (OperationalError, InterfaceError):
+            if alias is None:
+                raise
+            # Safe requests can simply run again, on the primary
+            await sync_to_async(db_router.mark_unhealthy)(alias)
+            data = await (_async_list(view) if pk is None else _async_retrieve(view, pk))
+    except (APIException, Http404) as exc:
+        response = view.handle_exception(exc)  # Same status codes and headers as the WSGI views
+        data, status_code, headers = response.data, response.status_code, response.items()
+    else:
+        status_code, headers = 200, ()
+    response = HttpResponse(renderer.render(data, media_type), content_type=media_type, status=status_code)
+    for name, value in headers:
+        if name.lower() != 'content-type':  # The unrendered Response still has Django's text/html default
+            response[name] = value
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+def _negotiate(view):
+    # The browsable API needs the full DRF response cycle, so it is left out
+    candidates = [renderer for renderer in view.get_renderers() if renderer.format != 'api']
+    return view.get_content_negotiator().select_renderer(view.request, candidates, view.format_kwarg)
+
+
+async def _filtered_queryset(view):
+    # Validating filters can query the database (?user= looks the user up)
+    return await sync_to_async(lambda: view.filter_queryset(view.get_queryset()))()
+
+
+async def _async_list(view):
+    queryset = await _filtered_queryset(view)
+    pins = isinstance(view, DogReportViewSet) and view.request.query_params.get('mode') == 'pins'
+    if pins:
+        queryset = queryset.values_list(*PIN_FIELDS, named=True)
+    page = await view.paginator.apaginate_queryset(queryset, view.request, view)
+    if page is None:
+        rows = [row async for row in queryset.aiterator(chunk_size=500)]
+    else:
+        rows = page
+    data = serialize_pins(rows) if pins else view.get_serializer(rows, many=True).data
+    if page is None:
+        return data
+    return view.paginator.get_paginated_response(data).data
+
+
+async def _async_retrieve(view, pk):
+    queryset = await _filtered_queryset(view)
+    try:
+        instance = await queryset.aget(pk=pk)
+    except queryset.model.DoesNotExist:
+        raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+    return view.get_serializer(instance).data
+
+
+async def async_report_list(request):
+    """GET /api/dogs/ served by an async view."""
+    return await _async_read(DogReportViewSet, request)
+
+
+async def async_report_detail(request, pk):
+    """GET /api/dogs/<pk>/ served by an async view."""
+    return await _async_read(DogReportViewSet, request, pk)
+
+
+async def async_comment_list(request):
+    """GET /api/comments/ served by an async view."""
+    return await _async_read(CommentViewSet, request)
+
+
+async def async_comment_detail(request, pk):
+    """GET /api/comments/<pk>/ served by an async view."""
+    return await _async_read(CommentViewSet, request, pk)
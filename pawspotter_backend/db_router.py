@@ -0,0 +1,157 @@
+"""
+Read replica routing.
+
+Views mixing in ReplicaReadMixin run their safe (GET/HEAD/OPTIONS)
+requests against one of the DATABASE_REPLICAS; every other query, and every
+write, goes to the primary ("default"). Replicas lag behind the primary, so:
+
+* a client that wrote through one of these views reads from the primary for
+  DATABASE_REPLICA_LAG_SECONDS afterwards (read-your-writes). Clients are
+  told apart by their Authorization header or session cookie, else their IP.
+  The pin is kept in the default cache, so every worker only sees it when
+  that cache is shared between processes; check_pin_cache refuses to start
+  with replicas and a per-process cache;
+* a replica whose connection fails is skipped for REPLICA_RETRY_SECONDS and
+  the request is retried on the primary;
+* users, sessions and tokens are always read from the primary: a client
+  that just registered or logged in authenticates with rows the replicas
+  may not have yet, and those requests come from a different identity.
+"""
+import contextvars
+import hashlib
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, InterfaceError, OperationalError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+# How long a replica that failed stays out of rotation
+REPLICA_RETRY_SECONDS = 30
+
+# Apps whose models are read from the primary even during routed requests
+PRIMARY_ONLY_APPS = frozenset({"auth", "authtoken", "sessions"})
+
+_read_alias = contextvars.ContextVar("read_alias", default=None)
+_unhealthy = {}  # alias -> time.monotonic() after which it is tried again
+_unhealthy_lock = threading.Lock()
+
+
+class ReplicaRouter:
+    """Sends reads to the replica picked for the current request, everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # Replicas hold the same rows as the primary
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        return db not in settings.DATABASE_REPLICAS
+
+
+def current_read_alias():
+    """The replica serving the current request's reads, or None for the primary."""
+    return _read_alias.get()
+
+
+@contextmanager
+def reading_from(alias):
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def healthy_replicas():
+    now = time.monotonic()
+    with _unhealthy_lock:
+        return [alias for alias in settings.DATABASE_REPLICAS if _unhealthy.get(alias, 0) <= now]
+
+
+def mark_unhealthy(alias):
+    with _unhealthy_lock:
+        _unhealthy[alias] = time.monotonic() + REPLICA_RETRY_SECONDS
+    try:
+        connections[alias].close()
+    except Exception:  # Closing a broken connection may fail too
+        pass
+
+
+def client_key(request):
+    identity = (request.META.get("HTTP_AUTHORIZATION")
+                or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+                or request.META.get("REMOTE_ADDR", ""))
+    return "db:pinned:" + hashlib.sha256(identity.encode()).hexdigest()
+
+
+def pin_to_primary(request):
+    cache.set(client_key(request), True, settings.DATABASE_REPLICA_LAG_SECONDS)
+
+
+def is_pinned(request):
+    return bool(cache.get(client_key(request)))
+
+
+# Cache backends that keep entries inside one process (or not at all)
+PER_PROCESS_CACHES = frozenset({
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+})
+
+
+def check_pin_cache(app_configs, **kwargs):
+    """System check: read-your-writes pins need a cache every worker shares."""
+    backend = settings.CACHES["default"]["BACKEND"]
+    if settings.DATABASE_REPLICAS and backend in PER_PROCESS_CACHES:
+        return [checks.Error(
+            f"DATABASE_REPLICAS are configured but the default cache ({backend}) is not "
+            "shared between worker processes.",
+            hint="Point CACHE_BACKEND/CACHE_LOCATION at Redis or Memcached, otherwise a client "
+                 "can read its own write back from a lagging replica on another worker.",
+            id="pawspotter.E001",
+        )]
+    return []
+
+
+def choose_replica(request):
+    """Replica for a safe request, or None when it has to read from the primary."""
+    if not settings.DATABASE_REPLICAS:
+        return None
+    replicas = healthy_replicas()
+    if not replicas or is_pinned(request):
+        return None
+    return random.choice(replicas)
+
+
+class ReplicaReadMixin:
+    """Routes a view's safe requests to a replica and pins writing clients to the primary."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code < 400 and settings.DATABASE_REPLICAS:
+                pin_to_primary(request)
+            return response
+
+        alias = choose_replica(request)
+        if alias is not None:
+            try:
+                with reading_from(alias):
+                    connections[alias].ensure_connection()
+                    return super().dispatch(request, *args, **kwargs)
+            except (OperationalError, InterfaceError):
+                # Safe requests can simply run again, on the primary
+                mark_unhealthy(alias)
+        return super().dispatch(request, *args, **kwargs)
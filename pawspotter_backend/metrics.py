@@ -0,0 +1,257 @@
+"""
+Per-request performance instrumentation.
+
+RequestMetricsMiddleware times every request and, through
+connection.execute_wrapper, every SQL query it runs. Code can time its own
+sections with ``span("serialize")``. Each response gets a Server-Timing
+header, per-route histograms are exposed in Prometheus text format at
+/metrics, and requests slower than SLOW_REQUEST_THRESHOLD_MS are logged
+together with their slowest queries.
+
+Histograms live in process memory, so every worker exposes its own.
+"""
+import bisect
+import contextvars
+import hmac
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger("pawspotter.slow_requests")
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+MAX_RECORDED_QUERIES = 200  # Per request, for the slow-request log
+SLOW_LOG_QUERIES = 10
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """Timings collected while one request is handled."""
+
+    def __init__(self, tracks_queries=True):
+        self.started = time.perf_counter()
+        self.tracks_queries = tracks_queries
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self.queries = []  # (seconds, sql), capped at MAX_RECORDED_QUERIES
+        self.spans = {}  # name -> seconds
+        self.wrappers = ExitStack()  # execute_wrapper()s installed for the request
+        self._depth = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.query_count += 1
+            self.query_seconds += elapsed
+            if len(self.queries) < MAX_RECORDED_QUERIES:
+                self.queries.append((elapsed, sql))
+
+    def server_timing(self, total):
+        entries = []
+        if self.tracks_queries:
+            entries.append(f'db;dur={self.query_seconds * 1000:.1f};desc="{self.query_count} queries"')
+        entries += [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.spans.items()]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+@contextmanager
+def span(name):
+    """Adds the time spent in the block to the current request's `name` timing.
+    Nested spans of the same name only count once."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    depth = metrics._depth.get(name, 0)
+    metrics._depth[name] = depth + 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._depth[name] = depth
+        if depth == 0:
+            metrics.spans[name] = metrics.spans.get(name, 0.0) + time.perf_counter() - start
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):  # Larger values only show up in +Inf
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for label_values, values in series:
+            labels = ",".join(f'{label}="{_escape(value)}"' for label, value in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {values[-1]}')
+            lines.append(f"{self.name}_sum{{{labels}}} {values[-2]}")
+            lines.append(f"{self.name}_count{{{labels}}} {values[-1]}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+ROUTE_LABELS = ("route", "method", "status")
+
+REQUEST_SECONDS = Histogram(
+    "pawspotter_request_duration_seconds", "Wall time of the request.", ROUTE_LABELS, DURATION_BUCKETS)
+DB_SECONDS = Histogram(
+    "pawspotter_request_db_seconds", "Time spent in SQL queries.", ROUTE_LABELS, DURATION_BUCKETS)
+DB_QUERIES = Histogram(
+    "pawspotter_request_db_queries", "SQL queries run by the request.", ROUTE_LABELS, QUERY_COUNT_BUCKETS)
+SERIALIZE_SECONDS = Histogram(
+    "pawspotter_request_serialize_seconds", "Time spent serializing the response.", ROUTE_LABELS, DURATION_BUCKETS)
+
+HISTOGRAMS = [REQUEST_SECONDS, DB_SECONDS, DB_QUERIES, SERIALIZE_SECONDS]
+
+
+def route_name(request):
+    """Low-cardinality label for the matched view, e.g. 'dogreport-list'."""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    return match.view_name or match._func_path
+
+
+class RequestMetricsMiddleware:
+    """
+    Records timings of every request; see the module docstring.
+
+    Async capable, so ASGI requests to async views stay on the event loop.
+    Database connections are per thread, and under ASGI a request's sync
+    views and sync_to_async database calls run on a thread of their own, so
+    process_view() wraps the connections from there. Queries that run
+    before the view is resolved, or on other threads, aren't counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.METRICS_ENABLED or request.path == "/metrics":
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.record(request, response, metrics)
+
+    async def __acall__(self, request):
+        if not settings.METRICS_ENABLED or request.path == "/metrics":
+            return await self.get_response(request)
+
+        metrics = RequestMetrics(tracks_queries=False)
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+            metrics.wrappers.close()  # The view is done with the connections
+        return self.record(request, response, metrics)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Under ASGI, Django runs this sync hook on the request's sync thread
+        metrics = _current.get()
+        if metrics is not None and not metrics.tracks_queries:
+            metrics.tracks_queries = True
+            for connection in connections.all():
+                metrics.wrappers.enter_context(connection.execute_wrapper(metrics))
+        return None
+
+    def record(self, request, response, metrics):
+        total = time.perf_counter() - metrics.started
+        response["Server-Timing"] = metrics.server_timing(total)
+        labels = (route_name(request), request.method, str(response.status_code))
+        REQUEST_SECONDS.observe(labels, total)
+        if metrics.tracks_queries:
+            DB_SECONDS.observe(labels, metrics.query_seconds)
+            DB_QUERIES.observe(labels, metrics.query_count)
+        SERIALIZE_SECONDS.observe(labels, metrics.spans.get("serialize", 0.0))
+
+        if total * 1000 >= settings.SLOW_REQUEST_THRESHOLD_MS:
+            log_slow_request(request, response, metrics, total)
+        return response
+
+
+def log_slow_request(request, response, metrics, total):
+    slowest = sorted(metrics.queries, key=lambda query: query[0], reverse=True)[:SLOW_LOG_QUERIES]
+    logger.warning(
+        "Slow request: %s %s -> %s in %.1f ms (%d queries, %.1f ms SQL)\n%s",
+        request.method, request.get_full_path(), response.status_code, total * 1000,
+        metrics.query_count, metrics.query_seconds * 1000,
+        "\n".join(f"  {seconds * 1000:8.1f} ms  {sql}" for seconds, sql in slowest),
+    )
+
+
+def can_read_metrics(request):
+    """Anyone when METRICS_PUBLIC is set, otherwise staff users and holders of METRICS_TOKEN."""
+    if settings.METRICS_PUBLIC:
+        return True
+    if settings.METRICS_TOKEN and hmac.compare_digest(
+            request.headers.get("Authorization", "").encode(), f"Bearer {settings.METRICS_TOKEN}".encode()):
+        return True
+    user = getattr(request, "user", None)
+    return bool(user is not None and user.is_active and user.is_staff)
+
+
+def metrics_view(request):
+    """Prometheus text exposition of the request histograms."""
+    if not can_read_metrics(request):
+        return HttpResponseForbidden()
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.expose()
+    return HttpResponse("\n".join(lines) + "\n", content_type="text/plain; version=0.0.4; charset=utf-8")
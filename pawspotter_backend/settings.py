@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 from pathlib import Path
+import importlib.util
 import os
 import dj_database_url
 
@@ -47,22 +48,45 @@ INSTALLED_APPS = [
 
 ]
 
+MSGPACK_AVAILABLE = importlib.util.find_spec('msgpack') is not None
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',  # Default for built-in login
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',  # TokenAuthentication without the per-request query
         'rest_framework.authentication.BasicAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
-
+    # JSON through orjson when installed; application/msgpack when msgpack is (api.renderers)
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        *(['api.renderers.MessagePackRenderer'] if MSGPACK_AVAILABLE else []),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.FastJSONParser',
+        *(['api.renderers.MessagePackParser'] if MSGPACK_AVAILABLE else []),
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# In-process token -> user cache used by api.authentication.CachedTokenAuthentication.
+# Other workers see a revoked token once its entry expires.
+TOKEN_AUTH_CACHE_SIZE = 10000
+TOKEN_AUTH_CACHE_TTL = 60  # seconds
+
+# Report and comment listings use keyset pagination (api.pagination.KeysetPagination).
+# While enabled, clients that send neither ?cursor= nor ?page_size= get a bare list.
+LEGACY_BARE_LIST_RESPONSES = os.getenv("LEGACY_BARE_LIST_RESPONSES", "true").lower() == "true"
+
 # Allow authentication headers in a production environment
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 
 MIDDLEWARE = [
+    'pawspotter_backend.metrics.RequestMetricsMiddleware',  # First, so it times everything below
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'pawspotter_backend.middleware.AsyncWhiteNoiseMiddleware',  # WhiteNoise that keeps ASGI requests async
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -71,6 +95,15 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Request instrumentation (pawspotter_backend.metrics): Server-Timing header,
+# per-route histograms at /metrics and a log of slow requests with their SQL.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# /metrics is served to staff users and to scrapers sending "Authorization: Bearer <METRICS_TOKEN>";
+# METRICS_PUBLIC=true opens it to anyone
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "false").lower() == "true"
+SLOW_REQUEST_THRESHOLD_MS = float(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "500"))
+
 STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 
 ROOT_URLCONF = 'pawspotter_backend.urls'
@@ -101,6 +134,63 @@ DATABASES = {
     "default": dj_database_url.config(default="sqlite:///db.sqlite3")
 }
 
+# Read replicas: each URL in the comma separated DATABASE_REPLICA_URLS becomes
+# an alias replica1, replica2, ... Safe requests to the report, status and
+# comment APIs read from them (pawspotter_backend.db_router); writes and every
+# other view use "default". Tests run against the primary only.
+_replica_urls = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+DATABASES.update({
+    f"replica{index}": {**dj_database_url.parse(url), "TEST": {"MIRROR": "default"}}
+    for index, url in enumerate(_replica_urls, 1)
+})
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["pawspotter_backend.db_router.ReplicaRouter"]
+# Upper bound of the replication lag: clients read from the primary this long
+# after a write, and responses read from a replica are cached no longer than this
+DATABASE_REPLICA_LAG_SECONDS = int(os.getenv("DATABASE_REPLICA_LAG_SECONDS", "5"))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (e.g. Redis or Memcached) when running more than one worker process,
+# otherwise invalidations only reach the worker that handled the write. With
+# DATABASE_REPLICAS a shared backend is required: read-your-writes pins are
+# kept here, and the pawspotter.E001 check refuses to start without one.
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", "pawspotter"),
+    }
+}
+
+# Cached list/retrieve responses of the report and comment APIs (api.cache)
+API_RESPONSE_CACHE_ALIAS = "default"
+API_RESPONSE_CACHE_TIMEOUT = 300  # seconds
+
+
+# Live event stream at /api/events/ (api.events), served under ASGI.
+# The in-process broker only reaches clients connected to the same process.
+EVENTS_BROKER = os.getenv("EVENTS_BROKER", "api.events.InProcessBroker")
+EVENTS_KEEPALIVE_SECONDS = 15
+EVENTS_MAX_STREAM_SECONDS = 300  # Clients reconnect with Last-Event-ID and get the missed events
+EVENTS_MAX_PENDING = 100  # Undelivered events per client before it is told to reconnect
+
+# Delta sync at /api/sync/ (api.sync). Tombstones of deleted rows are kept for
+# the retention period (prune_tombstones); older sync tokens get 410 Gone.
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", "90"))
+# Rows younger than this wait for the next sync, so transactions still running
+# (bulk ingests included) commit first. On PostgreSQL the oldest running write
+# transaction holds rows back too; elsewhere keep this above the longest write.
+SYNC_SETTLE_SECONDS = int(os.getenv("SYNC_SETTLE_SECONDS", "60"))
+
+# Offline reverse geocoding of new reports' location (api.geocoding). Point it
+# at a GeoNames dump (e.g. cities1000.txt) or a name,latitude,longitude[,country]
+# CSV; a compiled <file>.idx is written next to it. Empty disables geocoding.
+GEOCODER_GAZETTEER = os.getenv("GEOCODER_GAZETTEER", "")
+GEOCODER_MAX_DISTANCE_KM = 50  # Reports farther than this from any place keep an empty location
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -150,6 +240,16 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
 
+# Thumbnail/WebP generation for uploaded report images (api.images):
+# "thread" (in-process pool), "db" (ImageJob queue + process_image_jobs) or "sync"
+IMAGE_PIPELINE_BACKEND = os.getenv("IMAGE_PIPELINE_BACKEND", "thread")
+IMAGE_PIPELINE_WORKERS = int(os.getenv("IMAGE_PIPELINE_WORKERS", "2"))
+
+# Direct-to-storage uploads (api.uploads)
+IMAGE_UPLOAD_MAX_BYTES = 15 * 1024 * 1024
+IMAGE_UPLOAD_URL_EXPIRY = 15 * 60  # seconds a presigned POST stays valid
+IMAGE_UPLOAD_KEY_MAX_AGE = 24 * 60 * 60  # seconds an image_key can be used to create a report
+
 AWS_STORAGE_BUCKET_NAME = os.getenv("AWS_STORAGE_BUCKET_NAME")
 AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")